@@ -2,9 +2,6 @@
 This package (main) contains app factory and all relevant inits - config, logging etc.
 """
 import os
-import logging
-from logging.handlers import RotatingFileHandler
-from flask.logging import default_handler
 from flask import Flask
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
@@ -12,7 +9,24 @@ from typing import Optional, Any, Mapping
 from app.db import db
 from app.db.usermodel import User
 from app.db.stockmodel import Stock
+from app.db.pricemodel import PriceBar
+from app.db.leasemodel import FetchLease
+from app.db.quotamodel import ApiQuota
+from app.db.unknowntickermodel import UnknownTicker
+from app.marketdata.client import av_client
+from app.marketdata.calendar import trading_calendar
+from app.marketdata.quota import quota
+from app.marketdata.refresh import refresh_pool
+from app.marketdata.unknown import unknown_tickers
 from app.restapi import restapi as restapi_blueprint
+from app.restapi.cache import response_cache
+from app.cli import warm_cache_command, import_history_command
+from app.indicators import memo as indicator_memo
+from app.search import symbol_index
+from app.security import password_hasher
+from app.logs import init_logging
+from app import metrics
+from app.restapi import profiling
 
 
 def create_app(custom_config: Optional[Mapping[str, Any]] = None) -> Flask:
@@ -32,38 +46,24 @@ def create_app(custom_config: Optional[Mapping[str, Any]] = None) -> Flask:
     else:
         app.config.from_mapping(custom_config)
 
-    # setup & activate custom logging
-    log_handler = RotatingFileHandler(
-        os.path.join('instance', 'logs', ''.join(['sd_', os.environ.get('FLASK_ENV', 'undefined'), '.log'])),
-        maxBytes=2 ** 14,
-        backupCount=5
-    )
-    log_formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(filename)s:%(lineno)d]')
-    log_handler.setFormatter(log_formatter)
-    match app.config['LOGLEVEL']:
-        case 'critical':
-            log_handler.setLevel(logging.CRITICAL)
-        case 'error':
-            log_handler.setLevel(logging.ERROR)
-        case 'warning':
-            log_handler.setLevel(logging.WARNING)
-        case 'debug':
-            log_handler.setLevel(logging.DEBUG)
-        case 'info':
-            log_handler.setLevel(logging.INFO)
-        case _:
-            log_handler.setLevel(logging.CRITICAL)  # only minimum logging when environment is undefined
-    app.logger.addHandler(log_handler)
-    app.logger.removeHandler(default_handler)
+    # setup & activate custom logging - queued, written by background thread
+    init_logging(app)
 
     # database-related init
     db.init_app(app)
 
+    # background refresh of stale stocks
+    refresh_pool.init_app(app)
+
     # security init
     jwt = JWTManager(app)
+    password_hasher.init_app(app)
 
     # register blueprints & RESTful
     app.register_blueprint(restapi_blueprint)
+    profiling.init_app(app)
+    response_cache.init_app(app)
+    indicator_memo.init_app(app)
 
     # cross-origin
     # todo remember about production settings - this is temporary & unlocks all routes
@@ -72,7 +72,21 @@ def create_app(custom_config: Optional[Mapping[str, Any]] = None) -> Flask:
     # AlphaVantage settings
     app.config['ALPHA_VANTAGE_API_KEY'] = os.environ.get('ALPHA_VANTAGE_API_KEY')  # Todo move to config file maybe??
     app.config['ALPHA_VANTAGE_URL_BASE'] = os.environ.get('ALPHA_VANTAGE_URL_BASE',
-                                                          'https://www.alphavantage.co/query=?')
+                                                          'https://www.alphavantage.co/query?')
+    av_client.init_app(app)
+    quota.init_app(app)
+    trading_calendar.init_app(app)
+    unknown_tickers.init_app(app)
+
+    # ticker search index - loaded at startup, refreshed in background
+    symbol_index.init_app(app)
+
+    # Prometheus metrics
+    metrics.init_app(app)
+
+    # CLI commands
+    app.cli.add_command(warm_cache_command)
+    app.cli.add_command(import_history_command)
 
     # configure shell context
     @app.shell_context_processor
@@ -80,7 +94,11 @@ def create_app(custom_config: Optional[Mapping[str, Any]] = None) -> Flask:
         return {
             'db': db,
             'User': User,
-            'Stock': Stock
+            'Stock': Stock,
+            'PriceBar': PriceBar,
+            'FetchLease': FetchLease,
+            'ApiQuota': ApiQuota,
+            'UnknownTicker': UnknownTicker
         }
 
     app.logger.info(f'Application started with env: {os.environ.get("FLASK_ENV")}')
@@ -0,0 +1,156 @@
+"""
+Flask CLI commands - maintenance jobs run outside of request handling.
+"""
+import datetime
+import json
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Tuple, Iterator
+
+import click
+from flask import Flask, current_app
+from flask.cli import with_appcontext
+
+from app.db import db
+from app.db.stockmodel import Stock, is_valid_ticker
+from app.db.pricemodel import PriceBar, PriceHistory
+from app.marketdata.quota import background_priority
+from app.marketdata.refresh import refresh_stock
+
+
+def _warm_ticker(app: Flask, ticker: str, force: bool) -> str:
+    """
+    Worker thread body of warm-cache - refresh_stock() with pushed app context & background priority.
+    """
+    with app.app_context(), background_priority():
+        try:
+            return refresh_stock(ticker, force=force)
+        finally:
+            db.session.remove()
+
+
+@click.command('warm-cache')
+@click.option('--tickers', help='Comma separated tickers, defaults to WARM_CACHE_TICKERS or all stocks in DB.')
+@click.option('--workers', type=int, help='Concurrent refreshes, defaults to WARM_CACHE_WORKERS.')
+@click.option('--force', is_flag=True, help='Refresh stocks even if cached data is fresh.')
+@with_appcontext
+def warm_cache_command(tickers: Optional[str], workers: Optional[int], force: bool) -> None:
+    """
+    Pre-fetch stock data after market close, so dashboard traffic is served from cache.
+    Upstream calls are scheduled with background priority - paced by the API quota, leaving a reserve for users.
+    """
+    if tickers:
+        ticker_list = [ticker.strip() for ticker in tickers.split(',') if ticker.strip()]
+    else:
+        ticker_list = current_app.config['WARM_CACHE_TICKERS'] or \
+            [ticker for ticker, in db.session.query(Stock.ticker).order_by(Stock.ticker)]
+    ticker_list = list(dict.fromkeys(ticker_list))
+    db.session.remove()
+    if not ticker_list:
+        click.echo('Nothing to warm up.')
+        return
+
+    app = current_app._get_current_object()
+    outcomes = {}
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers or app.config['WARM_CACHE_WORKERS']) as executor:
+        futures = {executor.submit(_warm_ticker, app, ticker, force): ticker for ticker in ticker_list}
+        for done, future in enumerate(as_completed(futures), start=1):
+            outcome = future.result()
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            click.echo(f'[{done}/{len(ticker_list)}] {futures[future]}: {outcome}')
+
+    summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+    click.echo(f'Warm-up finished in {time.monotonic() - started:.1f}s: {summary}')
+
+
+def _dump_files(paths: Tuple[pathlib.Path, ...]) -> Iterator[pathlib.Path]:
+    """
+    Expand directories to the CSV & JSON files they contain, sorted by name.
+    """
+    for path in paths:
+        if path.is_dir():
+            yield from sorted(child for child in path.iterdir() if child.suffix.lower() in ('.csv', '.json'))
+        else:
+            yield path
+
+
+def _read_dump(path: pathlib.Path) -> Tuple[str, PriceHistory]:
+    """
+    Parse a local AlphaVantage TIME_SERIES_DAILY dump - JSON response or CSV export.
+    Ticker is taken from JSON metadata, or from the file name (e.g. IBM.csv) for CSV.
+    :return: (ticker, history) tuple.
+    Raises ValueError if the file cannot be parsed or the ticker is malformed.
+    """
+    with path.open(newline='') as file:
+        try:
+            if path.suffix.lower() == '.json':
+                payload = json.load(file)
+                ticker = payload.get('Meta Data', {}).get('2. Symbol', path.stem)
+                history = PriceHistory.from_alphavantage(payload)
+            else:
+                ticker, history = path.stem, PriceHistory.from_csv(file)
+        except (KeyError, TypeError, AttributeError, json.JSONDecodeError) as e:
+            raise ValueError('Unsupported file format', str(e))
+    ticker = ticker.strip().upper()
+    if not is_valid_ticker(ticker):
+        raise ValueError('Incorrect ticker format')
+    return ticker, history
+
+
+def _bumped_cache_time(stock: Stock) -> datetime.datetime:
+    """
+    New last_cache_time of an existing stock whose bars were replaced - a later value, fresh only if it was fresh.
+    Moved by at least a second, so Last-Modified of the responses changes too.
+    """
+    if stock.is_timeseries_cached():
+        return max(datetime.datetime.utcnow(), stock.last_cache_time + datetime.timedelta(seconds=1))
+    return stock.last_cache_time + datetime.timedelta(seconds=1)
+
+
+@click.command('import-history')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, path_type=pathlib.Path))
+@click.option('--batch-size', type=int, default=5000, show_default=True,
+              help='Bars per COPY or insert statement.')
+@with_appcontext
+def import_history_command(paths: Tuple[pathlib.Path, ...], batch_size: int) -> None:
+    """
+    Import daily price history from local AlphaVantage dumps (CSV or JSON files, or directories of them).
+    Stocks missing in DB are created, imported bars replace stored bars in the same date range.
+    Each file is committed separately - on Postgres its bars are streamed with COPY.
+    New stocks get last_cache_time set before their last imported bar & no overview_cache_time, so company data
+    is fetched (with compact price history only) on the first request. Existing stocks get last_cache_time moved
+    forward without changing their freshness, so memoized indicators & cached responses are rebuilt.
+    """
+    files = list(_dump_files(paths))
+    imported_stocks = imported_bars = 0
+    started = time.monotonic()
+    for number, path in enumerate(files, start=1):
+        try:
+            ticker, history = _read_dump(path)
+        except (ValueError, OSError) as e:
+            click.echo(f'[{number}/{len(files)}] {path.name}: failed ({e.args[0]})')
+            continue
+        if not len(history):
+            click.echo(f'[{number}/{len(files)}] {ticker}: skipped (no bars)')
+            continue
+
+        stock = Stock.get_by_ticker(ticker)
+        if stock is None:
+            stock = Stock(ticker)
+            last_date = history.last_date
+            stock.last_cache_time = datetime.datetime(last_date.year, last_date.month, last_date.day)
+            db.session.add(stock)
+            db.session.flush()
+        elif stock.last_cache_time is not None:
+            stock.last_cache_time = _bumped_cache_time(stock)
+        PriceBar.merge_history(stock.id, history, batch_size)
+        db.session.commit()
+
+        imported_stocks += 1
+        imported_bars += len(history)
+        click.echo(f'[{number}/{len(files)}] {ticker}: {len(history)} bars')
+
+    click.echo(f'Import finished in {time.monotonic() - started:.1f}s: '
+               f'{imported_bars} bars of {imported_stocks} stocks')
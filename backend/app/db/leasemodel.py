@@ -0,0 +1,64 @@
+"""
+ORM for fetch leases.
+A lease row marks that one worker process is fetching a ticker from AlphaVantage, so other workers wait for its
+result instead of spending API quota on the same call.
+"""
+import datetime
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+
+
+class FetchLease(db.Model):
+
+    __tablename__ = 'fetch_leases'
+
+    ticker = db.Column(db.String(10), primary_key=True)
+    owner = db.Column(db.String(32), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def acquire(cls, ticker: str, owner: str, ttl: float) -> bool:
+        """
+        Try to take the lease for ticker. Expired leases (crashed owner) are taken over.
+        Commits immediately so the lease is visible to other workers.
+        :param ticker: Ticker in string format.
+        :param owner: Unique owner id.
+        :param ttl: Lease lifetime in seconds.
+        :return: True if lease was acquired.
+        """
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=ttl)
+        try:
+            db.session.add(cls(ticker=ticker, owner=owner, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+        taken_over = cls.query.filter(cls.ticker == ticker, cls.expires_at < now) \
+            .update({'owner': owner, 'expires_at': expires_at}, synchronize_session=False)
+        db.session.commit()
+        return taken_over == 1
+
+    @classmethod
+    def release(cls, ticker: str, owner: str) -> None:
+        """
+        Drop the lease if it is still held by owner.
+        :param ticker: Ticker in string format.
+        :param owner: Unique owner id.
+        :return: None
+        """
+        cls.query.filter_by(ticker=ticker, owner=owner).delete(synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def is_held(cls, ticker: str) -> bool:
+        """
+        :param ticker: Ticker in string format.
+        :return: True if there is an unexpired lease for ticker.
+        """
+        now = datetime.datetime.utcnow()
+        return db.session.query(cls.query.filter(cls.ticker == ticker, cls.expires_at >= now).exists()).scalar()
+
+    def __repr__(self):
+        return f'<FetchLease ticker:{self.ticker} owner: {self.owner}>'
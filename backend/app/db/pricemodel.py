@@ -0,0 +1,356 @@
+"""
+ORM for daily price history.
+Each trading day is stored as one typed row per (stock, date). For computation the rows are loaded into
+PriceHistory - a columnar container of NumPy arrays sorted by date.
+"""
+import csv
+import datetime
+import io
+from typing import Optional, Mapping, Any, Sequence, Dict, Iterator, Iterable, TextIO
+
+import numpy as np
+from sqlalchemy import select, func
+
+from . import db
+
+
+class PriceBar(db.Model):
+
+    __tablename__ = 'price_bars'
+
+    stock_id = db.Column(db.Integer, db.ForeignKey('stocks.id', ondelete='CASCADE'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.BIGINT, nullable=False)
+
+    @classmethod
+    def replace_history(cls, stock_id: int, history: 'PriceHistory') -> None:
+        """
+        Replace all stored bars of a stock with contents of history. Changes are not committed.
+        :param stock_id: Stock primary key.
+        :param history: PriceHistory instance.
+        :return: None
+        """
+        db.session.query(cls).filter_by(stock_id=stock_id).delete(synchronize_session=False)
+        if len(history):
+            db.session.execute(cls.__table__.insert(), history.rows(stock_id))
+
+    @classmethod
+    def merge_history(cls, stock_id: int, history: 'PriceHistory', batch_size: int = 5000) -> None:
+        """
+        Store bars of history, replacing stored bars within its date range. Changes are not committed.
+        On Postgres the bars are streamed with COPY, other backends get batched multi-row inserts. Either way at most
+        batch_size bars are serialized at once.
+        :param stock_id: Stock primary key.
+        :param history: PriceHistory instance.
+        :param batch_size: Bars per COPY or insert statement.
+        :return: None
+        """
+        if not len(history):
+            return
+        db.session.query(cls).filter(cls.stock_id == stock_id,
+                                     cls.date.between(history.dates[0].item(), history.last_date)) \
+            .delete(synchronize_session=False)
+        connection = db.session.connection()
+        for chunk in history.chunks(batch_size):
+            if connection.dialect.name == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows((stock_id, *row.values()) for row in chunk.records())
+                buffer.seek(0)
+                with connection.connection.cursor() as cursor:
+                    cursor.copy_expert(f'COPY {cls.__tablename__} (stock_id, date, open, high, low, close, volume) '
+                                       f'FROM STDIN WITH (FORMAT csv)', buffer)
+            else:
+                db.session.execute(cls.__table__.insert(), chunk.rows(stock_id))
+
+    @classmethod
+    def last_date(cls, stock_id: Optional[int]) -> Optional[datetime.date]:
+        """
+        :param stock_id: Stock primary key.
+        :return: Date of the most recent stored bar or None if there are no bars.
+        """
+        if stock_id is None:
+            return None
+        return db.session.query(func.max(cls.date)).filter(cls.stock_id == stock_id).scalar()
+
+    def __repr__(self):
+        return f'<PriceBar stock_id:{self.stock_id} date: {self.date}>'
+
+
+class PriceHistory(object):
+    """
+    Columnar representation of daily OHLCV bars.
+    Dates are datetime64[D], prices float64 and volume int64. All arrays are sorted by date ascending.
+    """
+    price_fields = ('open', 'high', 'low', 'close')
+    av_keys = ('1. open', '2. high', '3. low', '4. close', '5. volume')  # TIME_SERIES_DAILY bar keys
+    resolutions = ('daily', 'weekly', 'monthly')
+
+    def __init__(self, dates: np.ndarray, open: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray) -> None:
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def empty(cls) -> 'PriceHistory':
+        """
+        Build a history containing no bars.
+        :return: PriceHistory instance.
+        """
+        prices = [np.empty(0, dtype=np.float64) for _ in cls.price_fields]
+        return cls(np.empty(0, dtype='datetime64[D]'), *prices, np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_alphavantage(cls, payload: Mapping[str, Any]) -> 'PriceHistory':
+        """
+        Parse a TIME_SERIES_DAILY response into typed arrays.
+        Raises ValueError if the response has no bars, e.g. an unrecognized notice instead of the series - it must
+        never replace stored bars.
+        :param payload: Deserialized API response.
+        :return: PriceHistory instance.
+        """
+        series = payload.get('Time Series (Daily)')
+        if not series:
+            raise ValueError('Time series missing in API response', ', '.join(payload))
+        dates = sorted(series)
+        values = np.array([[series[date][key] for key in cls.av_keys] for date in dates])
+        return cls(
+            np.array(dates, dtype='datetime64[D]'),
+            values[:, 0].astype(np.float64),
+            values[:, 1].astype(np.float64),
+            values[:, 2].astype(np.float64),
+            values[:, 3].astype(np.float64),
+            values[:, 4].astype(np.float64).astype(np.int64)
+        )
+
+    @classmethod
+    def from_csv(cls, file: TextIO) -> 'PriceHistory':
+        """
+        Parse daily prices in AlphaVantage CSV format (datatype=csv) - timestamp, open, high, low, close & volume
+        columns, any additional columns are ignored.
+        :param file: Text file object.
+        :return: PriceHistory instance.
+        """
+        rows = sorted(
+            (row['timestamp'], row['open'], row['high'], row['low'], row['close'], row['volume'])
+            for row in csv.DictReader(file)
+        )
+        if not rows:
+            return cls.empty()
+        dates, *values = zip(*rows)
+        return cls(
+            np.array(dates, dtype='datetime64[D]'),
+            *(np.array(column, dtype=np.float64) for column in values[:4]),
+            np.array(values[4], dtype=np.float64).astype(np.int64)
+        )
+
+    @classmethod
+    def load(cls, stock_id: Optional[int], start: Optional[datetime.date] = None,
+             end: Optional[datetime.date] = None) -> 'PriceHistory':
+        """
+        Load stored bars of a stock from DB, optionally restricted to [start, end] date range.
+        :param stock_id: Stock primary key. Returns empty history if None (stock not saved yet).
+        :param start: First date to include.
+        :param end: Last date to include.
+        :return: PriceHistory instance.
+        """
+        if stock_id is None:
+            return cls.empty()
+        return cls.load_many([stock_id], start, end)[stock_id]
+
+    @classmethod
+    def load_many(cls, stock_ids: Sequence[int], start: Optional[datetime.date] = None,
+                  end: Optional[datetime.date] = None) -> Dict[int, 'PriceHistory']:
+        """
+        Load stored bars of several stocks with a single query, optionally restricted to [start, end] date range.
+        :param stock_ids: Stock primary keys.
+        :param start: First date to include.
+        :param end: Last date to include.
+        :return: Dict of PriceHistory instances by stock id - empty history for stocks without bars.
+        """
+        histories = {stock_id: cls.empty() for stock_id in stock_ids}
+        if not stock_ids:
+            return histories
+        rows = db.session.execute(cls._query(stock_ids, start, end)).all()
+        if not rows:
+            return histories
+        ids = np.array([row[0] for row in rows])
+        history = cls._from_rows(rows)
+        starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+        ends = np.concatenate((starts[1:], [len(ids)]))
+        for lo, hi in zip(starts.tolist(), ends.tolist()):
+            histories[int(ids[lo])] = history._range(lo, hi)
+        return histories
+
+    @classmethod
+    def stream(cls, stock_id: Optional[int], start: Optional[datetime.date] = None,
+               end: Optional[datetime.date] = None, size: int = 500) -> Iterator['PriceHistory']:
+        """
+        Load stored bars of a stock in consecutive chunks, fetched from DB as they are consumed (server-side cursor
+        where supported) - memory use is bounded by chunk size instead of history length.
+        :param stock_id: Stock primary key. Nothing is yielded if None (stock not saved yet).
+        :param start: First date to include.
+        :param end: Last date to include.
+        :param size: Maximum number of bars per chunk.
+        :return: Iterator of non-empty PriceHistory instances.
+        """
+        if stock_id is None:
+            return
+        result = db.session.execute(cls._query([stock_id], start, end).execution_options(stream_results=True))
+        for rows in result.partitions(size):
+            yield cls._from_rows(rows)
+
+    @staticmethod
+    def _query(stock_ids: Sequence[int], start: Optional[datetime.date], end: Optional[datetime.date]):
+        """
+        :return: Select of (stock_id, date, open, high, low, close, volume) rows ordered by stock & date.
+        """
+        table = PriceBar.__table__
+        query = select(table.c.stock_id, table.c.date, table.c.open, table.c.high, table.c.low, table.c.close,
+                       table.c.volume).where(table.c.stock_id.in_(list(stock_ids)))
+        if start:
+            query = query.where(table.c.date >= start)
+        if end:
+            query = query.where(table.c.date <= end)
+        return query.order_by(table.c.stock_id, table.c.date)
+
+    @classmethod
+    def _from_rows(cls, rows: Sequence[Sequence[Any]]) -> 'PriceHistory':
+        """
+        Build history from (stock_id, date, open, high, low, close, volume) rows of a single stock.
+        """
+        _, dates, opens, highs, lows, closes, volumes = zip(*rows)
+        return cls(
+            np.array(dates, dtype='datetime64[D]'),
+            np.array(opens, dtype=np.float64),
+            np.array(highs, dtype=np.float64),
+            np.array(lows, dtype=np.float64),
+            np.array(closes, dtype=np.float64),
+            np.array(volumes, dtype=np.int64)
+        )
+
+    def slice(self, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> 'PriceHistory':
+        """
+        Select bars within [start, end] date range. Returns views - no data is copied.
+        :param start: First date to include.
+        :param end: Last date to include.
+        :return: PriceHistory instance.
+        """
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left') if start else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right') if end else len(self)
+        return PriceHistory(self.dates[lo:hi], self.open[lo:hi], self.high[lo:hi], self.low[lo:hi],
+                            self.close[lo:hi], self.volume[lo:hi])
+
+    def resample(self, resolution: str) -> 'PriceHistory':
+        """
+        Aggregate daily bars into weekly (Monday-Sunday) or monthly OHLCV bars.
+        Each aggregated bar is labelled with the date of the last trading day it contains.
+        :param resolution: One of PriceHistory.resolutions.
+        :return: PriceHistory instance, self for daily resolution.
+        """
+        if resolution not in self.resolutions:
+            raise ValueError('Unsupported resolution', resolution)
+        if resolution == 'daily' or not len(self):
+            return self
+        periods = self._periods(resolution)
+        starts = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+        ends = np.concatenate((starts[1:], [len(self)])) - 1
+        return PriceHistory(
+            self.dates[ends],
+            self.open[starts],
+            np.maximum.reduceat(self.high, starts),
+            np.minimum.reduceat(self.low, starts),
+            self.close[ends],
+            np.add.reduceat(self.volume, starts)
+        )
+
+    def _periods(self, resolution: str) -> np.ndarray:
+        """
+        :return: Non-decreasing period number of each bar - weeks starting on Monday or months.
+        """
+        if resolution == 'weekly':
+            days = self.dates.astype(np.int64)
+            return days - (days + 3) % 7  # 1970-01-01 is a Thursday - shift to Monday
+        return self.dates.astype('datetime64[M]').astype(np.int64)
+
+    @classmethod
+    def resample_chunks(cls, chunks: Iterable['PriceHistory'], resolution: str) -> Iterator['PriceHistory']:
+        """
+        Resample consecutive chunks of daily bars, e.g. from stream(). Daily bars of the last period of a chunk
+        are carried over to the next one, so periods split between chunks are aggregated once.
+        :param chunks: Consecutive daily histories.
+        :param resolution: One of PriceHistory.resolutions.
+        :return: Iterator of resampled PriceHistory instances.
+        """
+        if resolution == 'daily':
+            yield from chunks
+            return
+        carry = cls.empty()
+        for chunk in chunks:
+            if len(carry):
+                chunk = cls(*(np.concatenate((getattr(carry, field), getattr(chunk, field)))
+                              for field in ('dates', *cls.price_fields, 'volume')))
+            periods = chunk._periods(resolution)
+            split = int(np.searchsorted(periods, periods[-1], side='left'))
+            if split:
+                yield chunk._range(0, split).resample(resolution)
+            carry = chunk._range(split, len(chunk))
+        if len(carry):
+            yield carry.resample(resolution)
+
+    def _range(self, lo: int, hi: int) -> 'PriceHistory':
+        """
+        :return: Bars lo to hi - 1 as views, no data is copied.
+        """
+        return PriceHistory(self.dates[lo:hi], self.open[lo:hi], self.high[lo:hi], self.low[lo:hi],
+                            self.close[lo:hi], self.volume[lo:hi])
+
+    def chunks(self, size: int) -> Iterator['PriceHistory']:
+        """
+        Split into consecutive histories of at most size bars. Returns views - no data is copied.
+        :param size: Maximum number of bars per chunk.
+        :return: Iterator of non-empty PriceHistory instances.
+        """
+        for lo in range(0, len(self), size):
+            yield self._range(lo, lo + size)
+
+    @property
+    def last_date(self) -> Optional[datetime.date]:
+        """
+        :return: Date of the most recent bar or None if history is empty.
+        """
+        return self.dates[-1].item() if len(self) else None
+
+    def rows(self, stock_id: int) -> list:
+        """
+        Convert to a list of PriceBar column mappings, suitable for bulk insert.
+        :param stock_id: Stock primary key.
+        :return: List of dicts.
+        """
+        return [
+            {'stock_id': stock_id, 'date': date, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for date, o, h, l, c, v in zip(self.dates.tolist(), self.open.tolist(), self.high.tolist(),
+                                           self.low.tolist(), self.close.tolist(), self.volume.tolist())
+        ]
+
+    def records(self) -> list:
+        """
+        Convert to a list of JSON-serializable bars.
+        :return: List of dicts with ISO formatted dates & numeric values.
+        """
+        return [
+            {'date': date, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for date, o, h, l, c, v in zip(self.dates.astype(str).tolist(), self.open.tolist(),
+                                           self.high.tolist(), self.low.tolist(), self.close.tolist(),
+                                           self.volume.tolist())
+        ]
@@ -0,0 +1,17 @@
+"""
+ORM for AlphaVantage API quota.
+Each row is a token bucket (e.g. per-minute & per-day call budget) shared by all worker processes.
+"""
+from . import db
+
+
+class ApiQuota(db.Model):
+
+    __tablename__ = 'api_quota'
+
+    name = db.Column(db.String(16), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)  # calls currently available
+    updated_at = db.Column(db.DateTime, nullable=False)  # last refill time
+
+    def __repr__(self):
+        return f'<ApiQuota name:{self.name} tokens: {self.tokens}>'
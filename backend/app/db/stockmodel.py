@@ -5,16 +5,50 @@ DES example: https://www.alphavantage.co/query?function=OVERVIEW&symbol=IBM&apik
 TS example:
 """
 import datetime
-import os
-import json
-from urllib import request, error
 
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import validates
-from typing import Optional, Any
+from typing import Optional, Any, Sequence, Dict
 
 from . import db
+from .pricemodel import PriceBar, PriceHistory
+from app.marketdata.client import av_client
+from app.marketdata.calendar import trading_calendar
+from app import indicators
+from app.indicators import Spec
+
+
+def _float_or_none(value: Any) -> Optional[float]:
+    """
+    AlphaVantage reports unavailable figures as 'None' or '-' strings.
+    :param value: Raw response value.
+    :return: Float value or None if not available.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_valid_ticker(ticker: str) -> bool:
+    """
+    Ticker format rule shared by Stock validation & checks done before any DB or API access.
+    :param ticker: Ticker in string format.
+    :return: True if ticker is 1-10 characters long.
+    """
+    return 1 <= len(ticker) <= 10
+
+
+def _naive_utc(moment: datetime.datetime) -> datetime.datetime:
+    """
+    DB drivers return naive or aware datetimes depending on backend - normalize to naive UTC.
+    :param moment: Naive UTC or timezone-aware datetime.
+    :return: Naive UTC datetime.
+    """
+    if moment.tzinfo:
+        return moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment
 
 
 class Stock(db.Model):
@@ -23,7 +57,6 @@ class Stock(db.Model):
 
     # API-derived fields
     id = db.Column(db.Integer, primary_key=True)
-    timeseries = db.Column(db.JSON)  # full timeseries data as JSON
     ticker = db.Column(db.String(10), unique=True)
     name = db.Column(db.String(100))
     description = db.Column(db.Text)
@@ -38,10 +71,13 @@ class Stock(db.Model):
     high_52w = db.Column(db.Float)
     low_52w = db.Column(db.Float)
     eps = db.Column(db.JSON)  # format: {"fiscalDateEnding": "2022-06-30", "reportedEPS": "1.5"}
-    last_cache_time = db.Column(db.DateTime)  # last API update time
+    last_cache_time = db.Column(db.DateTime)  # last TIME_SERIES_DAILY API update time
+    overview_cache_time = db.Column(db.DateTime)  # last OVERVIEW API update time
 
-    # computed fields
-    # placeholder
+    # daily price bars are stored separately - see pricemodel.PriceBar
+    price_bars = db.relationship(PriceBar, lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+
+    # computed fields - technical indicators, see indicators()
 
     def __init__(self, ticker: str) -> None:
         self.ticker = ticker
@@ -55,10 +91,19 @@ class Stock(db.Model):
         :param value: Value of 'ticker' - automatically provided.
         :return: value if validated, raise ValueError otherwise.
         """
-        if len(value) < 1 or len(value) > 10:
+        if not is_valid_ticker(value):
             return ValueError('Incorrect ticker format')
         return value
 
+    @classmethod
+    def get_by_tickers(cls, tickers: Sequence[str]) -> Dict[str, 'Stock']:
+        """
+        Find several Stock instances in DB with a single query.
+        :param tickers: Tickers in string format.
+        :return: Dict of found Stock instances by ticker.
+        """
+        return {stock.ticker: stock for stock in cls.query.filter(cls.ticker.in_(list(tickers))).all()}
+
     @classmethod
     def get_by_ticker(cls, ticker: str) -> Optional['Stock']:
         """
@@ -76,8 +121,22 @@ class Stock(db.Model):
         db.session.add(self)
         db.session.commit()
 
-    def json(self) -> dict:
-        return {
+    def json(self, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None,
+             resolution: str = 'daily', history: Optional[PriceHistory] = None,
+             indicators: Sequence[Spec] = (), timeseries: bool = True) -> dict:
+        """
+        Full stock representation.
+        :param start: First date of timeseries to include, optional.
+        :param end: Last date of timeseries to include, optional.
+        :param resolution: Timeseries resolution - daily, weekly or monthly.
+        :param history: Preloaded price history already limited to start & end, loaded from DB if not provided.
+        :param indicators: Parsed indicator specs - if provided, 'indicators' field is included.
+        :param timeseries: Whether to include 'timeseries' field - False when it is streamed separately.
+        :return: Dict ready for serialization.
+        """
+        if history is None and timeseries:
+            history = self.history(start, end)
+        representation = {
             'id': self.id,
             'ticker': self.ticker,
             'name': self.name,
@@ -94,64 +153,96 @@ class Stock(db.Model):
             'low_52w': self.low_52w,
             'eps': '',  # placeholder
             'last_cache_time': self.last_cache_time.strftime('%Y-%m-%d:%H-%M-%S'),
-            'timeseries': self.timeseries
+            'overview_cache_time': self.overview_cache_time.strftime('%Y-%m-%d:%H-%M-%S')
+            if self.overview_cache_time else None,
         }
+        if timeseries:
+            representation['timeseries'] = history.resample(resolution).records()
+        if indicators:
+            representation['indicators'] = self.indicators(indicators, start, end, resolution)
+        return representation
+
+    def indicators(self, specs: Sequence[Spec], start: Optional[datetime.date] = None,
+                   end: Optional[datetime.date] = None, resolution: str = 'daily') -> dict:
+        """
+        Technical indicators over stored price history, memoized until the history is updated.
+        :param specs: Parsed indicator specs, see app.indicators.
+        :param start: First date to include, optional.
+        :param end: Last date to include, optional.
+        :param resolution: Resolution of bars indicators are computed over.
+        :return: Dict of indicator values aligned with timeseries bars, by spec.
+        """
+        return indicators.compute(self.ticker, self.last_cache_time, self.history, specs, resolution, start, end)
+
+    def history(self, start: Optional[datetime.date] = None,
+                end: Optional[datetime.date] = None) -> PriceHistory:
+        """
+        Load stored daily price bars as NumPy arrays.
+        :param start: First date to include, optional.
+        :param end: Last date to include, optional.
+        :return: PriceHistory instance, empty if the stock has no saved bars.
+        """
+        return PriceHistory.load(self.id, start, end)
 
     def is_cached(self) -> bool:
         """
-        Verifies if data in DB cache is fresh.
-        True if last_cache_time is at most yesterday 21:15 UTC (US exchange closing time + 15).
+        Verifies if data in DB cache is fresh - both price history & company data.
         :return: False if data is not cached.
         """
-        prev_day = (datetime.datetime.utcnow() - datetime.timedelta(days=1)).date()
-        closing_datetime = datetime.datetime(prev_day.year, prev_day.month, prev_day.day, hour=21, minute=15, second=0)
-        return self.last_cache_time > closing_datetime
+        return self.is_timeseries_cached() and self.is_overview_cached()
+
+    def is_timeseries_cached(self) -> bool:
+        """
+        Verifies if price history is fresh.
+        True if last_cache_time is after the latest trading session close (+ data delay) - data fetched on Friday
+        evening stays fresh over the weekend & exchange holidays.
+        :return: False if price history is not cached.
+        """
+        return self.last_cache_time is not None and self.is_fresh(self.last_cache_time)
+
+    def is_overview_cached(self) -> bool:
+        """
+        Verifies if company data is fresh - fetched less than OVERVIEW_TTL ago. Needs app context.
+        :return: False if company data is not cached.
+        """
+        return self.overview_cache_time is not None and self.is_overview_fresh(self.overview_cache_time)
+
+    @staticmethod
+    def is_fresh(cache_time: datetime.datetime, now: Optional[datetime.datetime] = None) -> bool:
+        """
+        Price history freshness rule behind is_timeseries_cached(), usable without loading the stock from DB.
+        :param cache_time: Time of last API update, naive UTC or timezone-aware.
+        :param now: Time of the check, naive UTC, defaults to current time.
+        :return: True if cache_time is after the latest data update according to trading calendar.
+        """
+        return _naive_utc(cache_time) > trading_calendar.last_data_update(now)
+
+    @staticmethod
+    def is_overview_fresh(cache_time: datetime.datetime, now: Optional[datetime.datetime] = None) -> bool:
+        """
+        Company data freshness rule behind is_overview_cached(). Needs app context.
+        :param cache_time: Time of last API update, naive UTC or timezone-aware.
+        :param now: Time of the check, naive UTC, defaults to current time.
+        :return: True if cache_time is less than OVERVIEW_TTL old.
+        """
+        age = (now or datetime.datetime.utcnow()) - _naive_utc(cache_time)
+        return age < datetime.timedelta(seconds=current_app.config['OVERVIEW_TTL'])
 
     def get_timeseries_data(self):
         """
-        Queries AlphaVantage for price data via TIME_SERIES_DAILY API call.
+        Queries AlphaVantage for full price history via TIME_SERIES_DAILY API call & replaces stored bars.
         Needs access to API key stored in app config - available only in app context.
         :return: todo proper return
         """
         key = current_app.config['ALPHA_VANTAGE_API_KEY']
         if key:  # otherwise - offline mode
-            query_string = current_app.config['ALPHA_VANTAGE_URL_BASE'] + 'function=TIME_SERIES_DAILY'
-            query_string += '&symbol=' + self.ticker
-            query_string += '&apikey=' + key
-
             try:
-                # todo remove hardcoded message to config
-                overload_message = "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per " \
-                                   "minute and 500 calls per day. Please visit https://www.alphavantage.co/premium/ " \
-                                   "if you would like to target a higher API call frequency. "
-
-                query_response = request.urlopen(query_string)
-                query_response_unpacked = json.loads(query_response.read())
-
-                if 'Note' in query_response_unpacked and overload_message in query_response_unpacked['Note']:
-                    raise ValueError('API call limit exceeded')
-
-                if 'Error Message' in query_response_unpacked:
-                    raise ValueError('Generic API error', query_response_unpacked['Error Message'])
-
-                if not query_response_unpacked:
-                    raise ValueError('API response empty')  # todo verify with pytest monkeypatch
-
-                self.timeseries = query_response_unpacked
-                self.last_cache_time = datetime.datetime.now(datetime.timezone.utc)
-
+                self._apply_timeseries(av_client.query('TIME_SERIES_DAILY', self.ticker, outputsize='full'))
                 self.save()
 
             except ValueError as e:
-                if e.args[0] == 'API response empty':
-                    current_app.logger.error(f'AV API provided empty response for {self.ticker}')
-                    raise e  # bubble up
-                if e.args[0] == 'API call limit exceeded':
-                    current_app.logger.info(f'AV API call limit exceeded')
-                    raise e  # bubble up
-                if e.args[0] == 'Generic API error':
-                    current_app.logger.error(f'AV API returned error response for {self.ticker}')
-                    raise e  # bubble up
+                self._log_api_error(e)
+                raise e  # bubble up
 
             except SQLAlchemyError as e:
                 current_app.logger.error(f'SQLAlchemyError for {self.ticker} while saving data from API response')
@@ -167,56 +258,13 @@ class Stock(db.Model):
         """
         key = current_app.config['ALPHA_VANTAGE_API_KEY']
         if key:
-            query_string = current_app.config['ALPHA_VANTAGE_URL_BASE'] + 'function=OVERVIEW'
-            query_string += '&symbol=' + self.ticker
-            query_string += '&apikey=' + key
-
             try:
-                # todo remove hardcoded message to config
-                overload_message = "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per " \
-                                   "minute and 500 calls per day. Please visit https://www.alphavantage.co/premium/ " \
-                                   "if you would like to target a higher API call frequency. "
-
-                query_response = request.urlopen(query_string)
-                query_response_unpacked = json.loads(query_response.read())
-
-                if 'Note' in query_response_unpacked and overload_message in query_response_unpacked['Note']:
-                    raise ValueError('API call limit exceeded')
-
-                if 'Error Message' in query_response_unpacked:
-                    raise ValueError('Generic API error', query_response_unpacked['Error Message'])
-
-                if not query_response_unpacked:
-                    raise ValueError('API response empty')
-
-                # parsing the response and populating fields
-
-                self.name = query_response_unpacked['Name']
-                self.description = query_response_unpacked['Description']
-                self.exchange = query_response_unpacked['Exchange']
-                self.sector = query_response_unpacked['Sector'].lower().title()
-                self.industry = query_response_unpacked['Industry'].lower().title()
-                self.market_cap = query_response_unpacked['MarketCapitalization']
-                self.no_shares = query_response_unpacked['SharesOutstanding']
-                self.trail_pe_ratio = float(query_response_unpacked['TrailingPE'])
-                self.fwd_pe_ratio = float(query_response_unpacked['ForwardPE'])
-                self.d_yield = float(query_response_unpacked['DividendYield'])
-                self.high_52w = float(query_response_unpacked['52WeekHigh'])
-                self.low_52w = float(query_response_unpacked['52WeekLow'])
-                self.eps = {'eps': 'eps'}  # todo eps
-
+                self._apply_overview(av_client.query('OVERVIEW', self.ticker))
                 self.save()
 
             except ValueError as e:
-                if e.args[0] == 'API response empty':
-                    current_app.logger.error(f'AV API provided empty response for {self.ticker}')
-                    raise e  # bubble up
-                if e.args[0] == 'API call limit exceeded':
-                    current_app.logger.info(f'AV API call limit exceeded')
-                    raise e  # bubble up
-                if e.args[0] == 'Generic API error':
-                    current_app.logger.error(f'AV API returned error response for {self.ticker}')
-                    raise e  # bubble up
+                self._log_api_error(e)
+                raise e  # bubble up
 
             except SQLAlchemyError as e:
                 current_app.logger.error(f'SQLAlchemyError for {self.ticker} while saving data from API response')
@@ -224,5 +272,127 @@ class Stock(db.Model):
 
         # todo add error handling if offline mode - currently this method exits silently
 
+    def stale_calls(self, full: bool = False, force: bool = False,
+                    last_date: Optional[datetime.date] = None) -> list:
+        """
+        API calls refresh() starts with - one per stale dataset.
+        A follow-up full history call may be needed on top of them, if the compact window leaves a gap.
+        :param full: Force full history re-fetch.
+        :param force: Request both datasets even if fresh.
+        :param last_date: Date of the last stored bar - full history is requested if None.
+        :return: List of (function, symbol, additional query parameters) tuples.
+        """
+        calls = []
+        if full or force or not self.is_timeseries_cached():
+            calls.append(('TIME_SERIES_DAILY', self.ticker, {'outputsize': 'compact' if last_date else 'full'}))
+        if force or not self.is_overview_cached():
+            calls.append(('OVERVIEW', self.ticker, {}))
+        return calls
+
+    def refresh(self, full: bool = False, force: bool = False) -> None:
+        """
+        Queries AlphaVantage for stale price & company data concurrently (TIME_SERIES_DAILY & OVERVIEW API calls)
+        and saves them in a single commit. Nothing is saved unless all calls succeed.
+        Each dataset has its own cache lifetime - fresh ones are not requested, see is_timeseries_cached()
+        & is_overview_cached().
+        Price history is refreshed incrementally - only the compact window (latest 100 bars) is requested and bars
+        newer than the last stored one are appended. Full history is requested for stocks without stored bars,
+        on demand, or when the compact window does not reach back to the last stored bar (gap).
+        Needs access to API key stored in app config - available only in app context.
+        :param full: Force full history re-fetch.
+        :param force: Request both datasets even if fresh.
+        :return: None
+        """
+        key = current_app.config['ALPHA_VANTAGE_API_KEY']
+        if key:
+            try:
+                last_date = None if full else PriceBar.last_date(self.id)
+                calls = self.stale_calls(full, force, last_date)
+                if not calls:
+                    return
+                responses = dict(zip([function for function, _, _ in calls], av_client.query_concurrent(calls)))
+
+                timeseries = responses.get('TIME_SERIES_DAILY')
+                if timeseries is not None:
+                    if last_date is None:
+                        self._apply_timeseries(timeseries)
+                    elif not self._merge_timeseries(timeseries, last_date):
+                        current_app.logger.info(f'Gap in price history of {self.ticker}, requesting full history')
+                        self._apply_timeseries(av_client.query('TIME_SERIES_DAILY', self.ticker, outputsize='full'))
+                if 'OVERVIEW' in responses:
+                    self._apply_overview(responses['OVERVIEW'])
+                self.save()
+
+            except ValueError as e:
+                self._log_api_error(e)
+                raise e  # bubble up
+
+            except SQLAlchemyError as e:
+                current_app.logger.error(f'SQLAlchemyError for {self.ticker} while saving data from API response')
+                raise e  # bubble up
+
+    def _apply_timeseries(self, query_response_unpacked: dict) -> None:
+        """
+        Replace stored price bars with TIME_SERIES_DAILY response content. Changes are not committed.
+        :param query_response_unpacked: Deserialized API response.
+        :return: None
+        """
+        history = PriceHistory.from_alphavantage(query_response_unpacked)
+        self.last_cache_time = datetime.datetime.now(datetime.timezone.utc)
 
+        db.session.add(self)
+        db.session.flush()  # assigns id for new instances
+        PriceBar.replace_history(self.id, history)
 
+    def _merge_timeseries(self, query_response_unpacked: dict, last_date: datetime.date) -> bool:
+        """
+        Store bars from last_date onward from TIME_SERIES_DAILY response. Changes are not committed.
+        The bar of last_date is overwritten too - it may have been stored unfinished, during its trading session.
+        :param query_response_unpacked: Deserialized API response, usually the compact window.
+        :param last_date: Date of the last stored bar.
+        :return: False if response does not reach back to last_date (gap) - nothing is merged then.
+        """
+        history = PriceHistory.from_alphavantage(query_response_unpacked)
+        if len(history) and history.dates[0].item() > last_date:
+            return False
+        self.last_cache_time = datetime.datetime.now(datetime.timezone.utc)
+        PriceBar.merge_history(self.id, history.slice(start=last_date))
+        return True
+
+    def _apply_overview(self, query_response_unpacked: dict) -> None:
+        """
+        Populate company data fields with OVERVIEW response content. Changes are not committed.
+        :param query_response_unpacked: Deserialized API response.
+        :return: None
+        """
+        self.name = query_response_unpacked['Name']
+        self.description = query_response_unpacked['Description']
+        self.exchange = query_response_unpacked['Exchange']
+        self.sector = query_response_unpacked['Sector'].lower().title()
+        self.industry = query_response_unpacked['Industry'].lower().title()
+        self.market_cap = query_response_unpacked['MarketCapitalization']
+        self.no_shares = query_response_unpacked['SharesOutstanding']
+        self.trail_pe_ratio = _float_or_none(query_response_unpacked['TrailingPE'])
+        self.fwd_pe_ratio = _float_or_none(query_response_unpacked['ForwardPE'])
+        self.d_yield = _float_or_none(query_response_unpacked['DividendYield'])
+        self.high_52w = _float_or_none(query_response_unpacked['52WeekHigh'])
+        self.low_52w = _float_or_none(query_response_unpacked['52WeekLow'])
+        self.eps = {'eps': 'eps'}  # todo eps
+        self.overview_cache_time = datetime.datetime.now(datetime.timezone.utc)
+
+    def _log_api_error(self, e: ValueError) -> None:
+        """
+        Log ValueError raised by AlphaVantage client.
+        :param e: ValueError instance.
+        :return: None
+        """
+        if e.args[0] == 'API response empty':
+            current_app.logger.error(f'AV API provided empty response for {self.ticker}')
+        if e.args[0] == 'API call limit exceeded':
+            current_app.logger.info(f'AV API call limit exceeded')
+        if e.args[0] == 'Generic API error':
+            current_app.logger.error(f'AV API returned error response for {self.ticker}')
+        if e.args[0] == 'API request failed':
+            current_app.logger.error(f'AV API request failed for {self.ticker}: {e.args[1]}')
+        if e.args[0] == 'Time series missing in API response':
+            current_app.logger.error(f'AV API response without time series for {self.ticker}: {e.args[1]}')
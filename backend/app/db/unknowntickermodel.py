@@ -0,0 +1,52 @@
+"""
+ORM for negative cache entries.
+A row marks a ticker AlphaVantage had no data for - it is not requested upstream again until the row expires.
+Rows are shared by worker processes, see marketdata.unknown for the in-memory front.
+"""
+import datetime
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+
+
+class UnknownTicker(db.Model):
+
+    __tablename__ = 'unknown_tickers'
+
+    ticker = db.Column(db.String(10), primary_key=True)  # upper-case
+    reason = db.Column(db.String(200))
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def remember(cls, ticker: str, reason: str, expires_at: datetime.datetime) -> None:
+        """
+        Insert or extend the entry for ticker. Commits immediately so the entry is visible to other workers.
+        :param ticker: Upper-case ticker.
+        :param reason: Upstream error message.
+        :param expires_at: Naive UTC expiry time.
+        :return: None
+        """
+        reason = reason[:200]
+        try:
+            db.session.add(cls(ticker=ticker, reason=reason, expires_at=expires_at))
+            db.session.commit()
+            return
+        except IntegrityError:
+            db.session.rollback()
+        cls.query.filter_by(ticker=ticker).update({'reason': reason, 'expires_at': expires_at},
+                                                  synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def expiry(cls, ticker: str) -> Optional[datetime.datetime]:
+        """
+        :param ticker: Upper-case ticker.
+        :return: Expiry time of an unexpired entry for ticker, None if there is none.
+        """
+        return db.session.query(cls.expires_at) \
+            .filter(cls.ticker == ticker, cls.expires_at > datetime.datetime.utcnow()).scalar()
+
+    def __repr__(self):
+        return f'<UnknownTicker ticker:{self.ticker} expires_at: {self.expires_at}>'
@@ -5,7 +5,8 @@ import datetime
 from . import db
 from sqlalchemy.orm import validates
 from typing import Optional
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
+from app.security import password_hasher
 
 
 class User(db.Model):
@@ -55,11 +56,12 @@ class User(db.Model):
 
     def password_correct(self, password: str) -> bool:
         """
-        Check plaintext password against hashed password in database.
+        Check plaintext password against hashed password in database. Hashing runs on the bounded hashing pool.
         :param password: Password string.
         :return: Boolean value.
+        Raises ValueError if the hashing pool is saturated.
         """
-        return check_password_hash(self.password, password)
+        return password_hasher.check(self.password, password)
 
     @validates('username')
     def validate_username(self, key, value):
@@ -0,0 +1,249 @@
+"""
+Technical indicators computed with NumPy over stored price history.
+Indicators are requested as specs - name with optional colon separated parameters, e.g. sma:50 or macd:12:26:9.
+Results are computed over the full history (so moving windows are warmed up at the start of any date range)
+and memoized per (ticker, last_cache_time, resolution, spec) - weekly & monthly ones also per range end, see compute().
+"""
+import datetime
+import math
+import threading
+from collections import OrderedDict
+from typing import Tuple, Dict, Optional, Sequence, Callable, Union, Hashable
+
+import numpy as np
+from flask import Flask
+
+from app.db.pricemodel import PriceHistory
+
+Spec = Tuple[str, Tuple[float, ...]]
+Values = Union[np.ndarray, Dict[str, np.ndarray]]
+
+TRADING_DAYS = 252  # annualization factor of volatility
+
+
+def _window_view(x: np.ndarray, window: int) -> np.ndarray:
+    return np.lib.stride_tricks.sliding_window_view(x, window) if len(x) >= window else np.empty((0, window))
+
+
+def sma(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Simple moving average. First window - 1 values are NaN.
+    """
+    result = np.full(len(x), np.nan)
+    if len(x) >= window:
+        sums = np.cumsum(np.concatenate(([0.0], x)))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def _ewm(x: np.ndarray, alpha: float, window: int) -> np.ndarray:
+    """
+    Exponentially weighted mean seeded with SMA of the first window values (first non-NaN values of x).
+    The recurrence is inherently sequential - it runs over a plain list, which is the fastest option without
+    compiled extensions.
+    """
+    result = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < window:
+        return result
+    first = valid[0]
+    seed = first + window - 1
+    value = float(np.mean(x[first:seed + 1]))
+    values = [value]
+    for item in x[seed + 1:].tolist():
+        value += alpha * (item - value)
+        values.append(value)
+    result[seed:] = values
+    return result
+
+
+def ema(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Exponential moving average with alpha = 2 / (window + 1).
+    """
+    return _ewm(x, 2.0 / (window + 1), window)
+
+
+def rsi(history: PriceHistory, window: int = 14) -> np.ndarray:
+    """
+    Relative strength index with Wilder smoothing of gains & losses. Flat series (no gains nor losses) yield 50.
+    """
+    change = np.diff(history.close, prepend=np.nan)
+    gain = _ewm(np.clip(change, 0, None), 1.0 / window, window)
+    loss = _ewm(np.clip(-change, 0, None), 1.0 / window, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100.0 - 100.0 / (1.0 + gain / loss))
+
+
+def macd(history: PriceHistory, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """
+    Moving average convergence divergence - MACD line, signal line & histogram.
+    """
+    line = ema(history.close, fast) - ema(history.close, slow)
+    signal_line = _ewm(line, 2.0 / (signal + 1), signal)
+    return {'macd': line, 'signal': signal_line, 'histogram': line - signal_line}
+
+
+def bbands(history: PriceHistory, window: int = 20, width: float = 2.0) -> Dict[str, np.ndarray]:
+    """
+    Bollinger bands - SMA with bands width standard deviations apart.
+    """
+    middle = sma(history.close, window)
+    deviation = np.full(len(history), np.nan)
+    deviation[window - 1:] = _window_view(history.close, window).std(axis=1)
+    return {'upper': middle + width * deviation, 'middle': middle, 'lower': middle - width * deviation}
+
+
+def volatility(history: PriceHistory, window: int = 20) -> np.ndarray:
+    """
+    Annualized rolling standard deviation of daily log returns.
+    """
+    log_returns = np.diff(np.log(history.close), prepend=np.nan)
+    result = np.full(len(history), np.nan)
+    result[window:] = _window_view(log_returns[1:], window).std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS)
+    return result
+
+
+def returns(history: PriceHistory) -> np.ndarray:
+    """
+    Simple close-to-close returns.
+    """
+    return np.diff(history.close, prepend=np.nan) / np.concatenate(([np.nan], history.close[:-1]))
+
+
+def _sma(history: PriceHistory, window: int = 20) -> np.ndarray:
+    return sma(history.close, window)
+
+
+def _ema(history: PriceHistory, window: int = 20) -> np.ndarray:
+    return ema(history.close, window)
+
+
+# indicator name: (function, number of parameters)
+INDICATORS: Dict[str, Tuple[Callable[..., Values], int]] = {
+    'sma': (_sma, 1),
+    'ema': (_ema, 1),
+    'rsi': (rsi, 1),
+    'macd': (macd, 3),
+    'bbands': (bbands, 2),
+    'volatility': (volatility, 1),
+    'returns': (returns, 0)
+}
+
+
+def parse_spec(spec: str) -> Spec:
+    """
+    Parse indicator spec, e.g. 'sma:50' or 'bbands:20:2.5'. Window parameters must be positive integers.
+    :param spec: Spec string.
+    :return: (name, params) tuple.
+    """
+    name, *raw_params = spec.strip().lower().split(':')
+    if name not in INDICATORS:
+        raise ValueError(f'Unknown indicator: {name}')
+    if len(raw_params) > INDICATORS[name][1]:
+        raise ValueError(f'Too many parameters for {name}')
+    params = []
+    for position, raw in enumerate(raw_params):
+        value = float(raw)
+        integer = not (name == 'bbands' and position == 1)  # only band width may be fractional
+        if not math.isfinite(value) or value <= 0 or (integer and not value.is_integer()):
+            raise ValueError(f'Invalid parameter for {name}: {raw}')
+        params.append(int(value) if integer else value)
+    return name, tuple(params)
+
+
+def parse_specs(value: str) -> Tuple[Spec, ...]:
+    """
+    Parse comma separated indicator specs - request parser type.
+    :param value: Raw query parameter.
+    :return: Tuple of unique (name, params) tuples.
+    """
+    return tuple(dict.fromkeys(parse_spec(spec) for spec in value.split(',') if spec.strip()))
+
+
+def spec_label(spec: Spec) -> str:
+    """
+    :return: Normalized spec string, used as response key.
+    """
+    return ':'.join([spec[0], *map(str, spec[1])])
+
+
+class IndicatorMemo(object):
+    """
+    LRU of computed indicator values with the dates they are aligned to, limited to max_entries
+    (INDICATOR_MEMO_SIZE config setting).
+    """
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Tuple[np.ndarray, Values]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.max_entries = app.config['INDICATOR_MEMO_SIZE']
+        self.clear()
+
+    def get(self, key: Hashable) -> Optional[Tuple[np.ndarray, Values]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: Tuple[np.ndarray, Values]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+memo = IndicatorMemo()
+
+
+def _to_json(values: np.ndarray) -> list:
+    """
+    :return: List of floats with NaN (not available) replaced by None.
+    """
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def compute(ticker: str, cache_time: datetime.datetime, load: Callable[[], PriceHistory], specs: Sequence[Spec],
+            resolution: str = 'daily', start: Optional[datetime.date] = None,
+            end: Optional[datetime.date] = None) -> Dict[str, Union[list, Dict[str, list]]]:
+    """
+    Compute (or take memoized) indicators & limit them to [start, end] date range.
+    Weekly & monthly bars are resampled from daily bars up to end, as Stock.json() does - a range ending mid-period
+    gets a partial last bar labelled with end, so values stay aligned with the returned bars.
+    :param ticker: Stock ticker - memo key.
+    :param cache_time: Stock last_cache_time - memo key, changes whenever price history is updated.
+    :param load: Loads full daily history of the stock, called only on memo miss.
+    :param specs: Parsed indicator specs.
+    :param resolution: Resolution of bars indicators are computed over.
+    :param start: First date to include.
+    :param end: Last date to include.
+    :return: JSON-serializable dict of values aligned with timeseries bars, by spec label.
+    """
+    history = None
+    results = {}
+    period_end = end if resolution != 'daily' else None
+    for spec in specs:
+        key = (ticker, cache_time, resolution, period_end, spec)
+        entry = memo.get(key)
+        if entry is None:
+            if history is None:
+                history = load().slice(end=period_end).resample(resolution)
+            function, _ = INDICATORS[spec[0]]
+            entry = (history.dates, function(history, *spec[1]))
+            memo.put(key, entry)
+        dates, values = entry
+        lo = np.searchsorted(dates, np.datetime64(start, 'D'), side='left') if start else 0
+        hi = np.searchsorted(dates, np.datetime64(end, 'D'), side='right') if end else len(dates)
+        if isinstance(values, dict):
+            results[spec_label(spec)] = {name: _to_json(series[lo:hi]) for name, series in values.items()}
+        else:
+            results[spec_label(spec)] = _to_json(values[lo:hi])
+    return results
@@ -0,0 +1,119 @@
+"""
+Non-blocking logging pipeline.
+Request threads only put records on an in-memory queue - formatting, file writes & rotation happen on a background
+listener thread. Besides the application log, each request gets one JSON line in the access log with its duration
+and cache status (set by endpoints in g.cache_status).
+"""
+import os
+import json
+import queue
+import atexit
+import logging
+import datetime
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from flask import Flask, Response, g, request
+from flask.logging import default_handler
+
+ACCESS_LOGGER = 'app.access'
+
+LEVELS = {
+    'critical': logging.CRITICAL,
+    'error': logging.ERROR,
+    'warning': logging.WARNING,
+    'info': logging.INFO,
+    'debug': logging.DEBUG
+}
+
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener() -> None:
+    """
+    Flush queued records & stop the listener thread - on exit or before the pipeline is rebuilt.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def init_logging(app: Flask) -> None:
+    """
+    Route app & access loggers through a queue to rotating files in LOG_DIR (instance/logs by default), written by
+    a listener thread.
+    Rotation is configured by LOG_MAX_BYTES & LOG_BACKUP_COUNT, app log level by LOGLEVEL (CRITICAL if unknown),
+    access log is enabled by ACCESS_LOG.
+    :param app: Flask app instance.
+    :return: None
+    """
+    global _listener
+    _stop_listener()
+
+    env = os.environ.get('FLASK_ENV', 'undefined')
+    log_dir = app.config.get('LOG_DIR') or os.path.join(app.instance_path, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+
+    app_handler = RotatingFileHandler(os.path.join(log_dir, f'sd_{env}.log'),
+                                      maxBytes=app.config['LOG_MAX_BYTES'], backupCount=app.config['LOG_BACKUP_COUNT'])
+    app_handler.setFormatter(
+        logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(filename)s:%(lineno)d]')
+    )
+    app_handler.setLevel(LEVELS.get(app.config['LOGLEVEL'], logging.CRITICAL))
+    app_handler.addFilter(lambda record: record.name != ACCESS_LOGGER)
+
+    access_handler = RotatingFileHandler(os.path.join(log_dir, f'access_{env}.log'),
+                                         maxBytes=app.config['LOG_MAX_BYTES'],
+                                         backupCount=app.config['LOG_BACKUP_COUNT'])
+    access_handler.setFormatter(logging.Formatter('%(message)s'))
+    access_handler.addFilter(logging.Filter(ACCESS_LOGGER))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, app_handler, access_handler, respect_handler_level=True)
+    _listener.start()
+    app.extensions['log_listener'] = _listener
+
+    # loggers are process-wide - replace handlers left by previously created apps
+    for handler in [default_handler, *app.logger.handlers]:
+        if handler is default_handler or isinstance(handler, QueueHandler):
+            app.logger.removeHandler(handler)
+    app.logger.addHandler(QueueHandler(log_queue))
+
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    access_logger.handlers = [QueueHandler(log_queue)]
+    access_logger.propagate = False
+    access_logger.setLevel(logging.INFO if app.config['ACCESS_LOG'] else logging.CRITICAL)
+
+    app.before_request(_start_timer)
+    app.after_request(_log_access)
+
+
+def _start_timer() -> None:
+    g.request_started = time.perf_counter()
+    g.cache_status = None  # g outlives the request if app context was pushed by caller (CLI, tests)
+
+
+def _log_access(response: Response) -> Response:
+    """
+    Write one access log line per request. Duration of streamed responses covers the time until the body starts.
+    """
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    if access_logger.isEnabledFor(logging.INFO):
+        started = g.get('request_started')
+        access_logger.info(json.dumps({
+            'time': datetime.datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'method': request.method,
+            'path': request.path,
+            'query': request.query_string.decode(errors='replace'),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2) if started else None,
+            'bytes': response.content_length,
+            'cache': g.get('cache_status'),
+            'remote_addr': request.remote_addr
+        }))
+    return response
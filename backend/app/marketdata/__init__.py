@@ -0,0 +1,3 @@
+"""
+This package contains AlphaVantage market data handling - fetching, refreshing & scheduling of upstream calls.
+"""
@@ -0,0 +1,177 @@
+"""
+US equity trading calendar (NYSE rules) with a precomputed session table.
+Daily bars only change after a session closes - weekends, exchange holidays & the hours before the close
+never bring new data. Session closes (16:00 New York time, 13:00 on early-close days, DST handled by zoneinfo)
+are precomputed per calendar day, so the latest completed close before any moment is found in O(1).
+"""
+import datetime
+import threading
+from typing import Optional, List
+from zoneinfo import ZoneInfo
+
+from flask import Flask
+
+EXCHANGE_TZ = ZoneInfo('America/New_York')
+REGULAR_CLOSE = datetime.time(16, 0)
+EARLY_CLOSE = datetime.time(13, 0)
+
+# unscheduled full-day closures (national days of mourning, weather)
+SPECIAL_CLOSURES = {
+    datetime.date(2001, 9, 11), datetime.date(2001, 9, 12), datetime.date(2001, 9, 13), datetime.date(2001, 9, 14),
+    datetime.date(2004, 6, 11), datetime.date(2007, 1, 2), datetime.date(2012, 10, 29), datetime.date(2012, 10, 30),
+    datetime.date(2018, 12, 5), datetime.date(2025, 1, 9)
+}
+
+
+def _easter(year: int) -> datetime.date:
+    """
+    Gregorian Easter Sunday (anonymous Gregorian algorithm).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    weekday = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * weekday) // 451
+    month, day = divmod(h + weekday - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> datetime.date:
+    """
+    n-th given weekday (0 = Monday) of a month, n = -1 for the last one.
+    """
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: datetime.date) -> datetime.date:
+    """
+    Holiday falling on Saturday is observed on Friday, on Sunday on Monday.
+    """
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    if day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def holidays(year: int) -> set:
+    """
+    :return: Full-day exchange holidays of a year.
+    """
+    days = {
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - datetime.timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(datetime.date(year, 7, 4)),  # Independence Day
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(datetime.date(year, 12, 25)),  # Christmas
+    }
+    new_year = datetime.date(year, 1, 1)
+    if new_year.weekday() != 5:  # Saturday New Year is not observed on the previous Friday
+        days.add(_observed(new_year))
+    if year >= 1998:
+        days.add(_nth_weekday(year, 1, 0, 3))  # Martin Luther King Jr. Day
+    if year >= 2022:
+        days.add(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    return days | {day for day in SPECIAL_CLOSURES if day.year == year}
+
+
+def early_closes(year: int) -> set:
+    """
+    :return: Sessions closing at 13:00 - July 3rd, day after Thanksgiving & Christmas Eve (when trading days).
+    """
+    return {
+        datetime.date(year, 7, 3),
+        _nth_weekday(year, 11, 3, 4) + datetime.timedelta(days=1),
+        datetime.date(year, 12, 24)
+    }
+
+
+class TradingCalendar(object):
+    """
+    Session close table for [first_year, last_year], built on first use. Moments outside of the range are clamped.
+    Data delay - time between session close & availability of its daily bar upstream - is set by
+    MARKET_DATA_DELAY config setting.
+    """
+    def __init__(self, first_year: int = 1990, last_year: int = 2100, delay: int = 15 * 60) -> None:
+        self.first_year = first_year
+        self.last_year = last_year
+        self.delay = delay  # seconds
+        self._origin: Optional[int] = None  # UTC timestamp of the first day of table
+        self._closes: List[int] = []  # UTC timestamp of session close by day index, 0 if no session
+        self._latest_before: List[int] = []  # latest session close before the day starts, by day index
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.delay = app.config['MARKET_DATA_DELAY']
+        app.extensions['trading_calendar'] = self
+
+    def _build(self) -> None:
+        with self._lock:
+            if self._origin is not None:
+                return
+            first = datetime.date(self.first_year, 1, 1)
+            closed, early = set(), set()
+            for year in range(self.first_year, self.last_year + 1):
+                closed |= holidays(year)
+                early |= early_closes(year)
+            closes, latest_before, latest = [], [], 0
+            for offset in range((datetime.date(self.last_year, 12, 31) - first).days + 1):
+                day = first + datetime.timedelta(days=offset)
+                latest_before.append(latest)
+                if day.weekday() < 5 and day not in closed:
+                    close_time = EARLY_CLOSE if day in early else REGULAR_CLOSE
+                    latest = int(datetime.datetime.combine(day, close_time, tzinfo=EXCHANGE_TZ).timestamp())
+                    closes.append(latest)
+                else:
+                    closes.append(0)
+            self._closes, self._latest_before = closes, latest_before
+            self._origin = int(datetime.datetime.combine(first, datetime.time(), tzinfo=datetime.timezone.utc)
+                               .timestamp())
+
+    def is_session(self, day: datetime.date) -> bool:
+        """
+        :return: True if the exchange trades on given day.
+        """
+        self._build()
+        index = (day - datetime.date(self.first_year, 1, 1)).days
+        return 0 <= index < len(self._closes) and self._closes[index] != 0
+
+    def latest_close(self, moment: datetime.datetime) -> datetime.datetime:
+        """
+        Latest session close at or before moment - O(1) table lookup.
+        Session closes fall on the same calendar day in UTC & New York time, so the UTC day indexes the table.
+        :param moment: Naive UTC or timezone-aware datetime.
+        :return: Naive UTC datetime.
+        """
+        self._build()
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        timestamp = int(moment.timestamp())
+        index = min(max((timestamp - self._origin) // 86400, 0), len(self._closes) - 1)
+        close = self._closes[index]
+        if not close or close > timestamp:
+            close = self._latest_before[index]
+        return datetime.datetime.utcfromtimestamp(close)
+
+    def last_data_update(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """
+        Moment the newest available daily bar appeared upstream - latest close, for which delay already passed,
+        plus the delay. Data fetched after this moment cannot be refreshed with new bars before the next close.
+        :param now: Naive UTC or timezone-aware datetime, defaults to current time.
+        :return: Naive UTC datetime.
+        """
+        now = now or datetime.datetime.utcnow()
+        delay = datetime.timedelta(seconds=self.delay)
+        return self.latest_close(now - delay) + delay
+
+
+trading_calendar = TradingCalendar()
@@ -0,0 +1,154 @@
+"""
+AlphaVantage HTTP client.
+All upstream calls go through a single pool of persistent keep-alive connections with connect/read timeouts
+and retries (exponential backoff) on transient network & server errors.
+"""
+import json
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from typing import Optional, Any, Sequence, Tuple, List, Mapping
+
+import urllib3
+from urllib3.exceptions import HTTPError
+from flask import Flask, current_app
+
+from app.marketdata.quota import quota
+from app.metrics import observe_upstream_call
+
+
+class AlphaVantageClient(object):
+    """
+    Pooled client for AlphaVantage query API.
+    Base URL & API key are read from app config on each call, pool settings on init_app().
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        self._pool: Optional[urllib3.PoolManager] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Create connection pool configured by ALPHA_VANTAGE_* config settings.
+        FETCH_LEASE_TTL & FETCH_WAIT_TIMEOUT left unset are derived from the worst-case call duration.
+        :param app: Flask app instance.
+        :return: None
+        """
+        if self._pool:
+            self._pool.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=app.config['ALPHA_VANTAGE_POOL_SIZE'],
+                                            thread_name_prefix='av-client')
+        self._pool = urllib3.PoolManager(
+            maxsize=app.config['ALPHA_VANTAGE_POOL_SIZE'],
+            timeout=urllib3.Timeout(connect=app.config['ALPHA_VANTAGE_CONNECT_TIMEOUT'],
+                                    read=app.config['ALPHA_VANTAGE_READ_TIMEOUT']),
+            retries=urllib3.Retry(total=app.config['ALPHA_VANTAGE_RETRIES'],
+                                  backoff_factor=app.config['ALPHA_VANTAGE_BACKOFF'],
+                                  status_forcelist=self.retry_statuses,
+                                  allowed_methods=['GET'],
+                                  raise_on_status=False)
+        )
+        # a fetch makes up to two sequential calls - concurrent ones & full history after a gap,
+        # the latter might wait for quota with background priority
+        fetch_budget = 2 * self.call_budget(app.config)
+        if app.config['FETCH_LEASE_TTL'] is None:
+            app.config['FETCH_LEASE_TTL'] = fetch_budget + app.config['ALPHA_VANTAGE_QUOTA_MAX_WAIT']
+        if app.config['FETCH_WAIT_TIMEOUT'] is None:
+            app.config['FETCH_WAIT_TIMEOUT'] = fetch_budget
+        app.extensions['alphavantage'] = self
+
+    @staticmethod
+    def call_budget(config: Mapping[str, Any]) -> float:
+        """
+        Worst-case duration of a single upstream call - every attempt hitting connect & read timeouts,
+        plus backoff between retries.
+        :param config: App config.
+        :return: Duration in seconds.
+        """
+        retries = config['ALPHA_VANTAGE_RETRIES']
+        attempt = config['ALPHA_VANTAGE_CONNECT_TIMEOUT'] + config['ALPHA_VANTAGE_READ_TIMEOUT']
+        backoff = sum(config['ALPHA_VANTAGE_BACKOFF'] * 2 ** (retry - 1) for retry in range(1, retries + 1))
+        return (retries + 1) * attempt + backoff
+
+    def open(self, url: str) -> urllib3.HTTPResponse:
+        """
+        Send GET request without preloading the body - response is read as a stream.
+        :param url: Full query URL.
+        :return: File-like HTTP response. Connection returns to pool once the body is fully read.
+        """
+        return self._pool.request('GET', url, preload_content=False)
+
+    def query_concurrent(self, calls: Sequence[Tuple[str, str, Mapping[str, str]]]) -> List[dict]:
+        """
+        Call several API functions at once, each on its own pooled connection. Needs app context.
+        Quota for all calls is acquired up front, so either all of them are sent or none.
+        :param calls: Sequence of (function, symbol, additional query parameters) tuples.
+        :return: Deserialized responses in order of calls.
+        Raises ValueError as query() does - the first failed call in order of calls is reported.
+        """
+        if not quota.acquire(len(calls)):
+            raise ValueError('API call limit exceeded')
+        app = current_app._get_current_object()
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, self._query_in_app, app, function, symbol, params)
+            for function, symbol, params in calls
+        ]
+        return [future.result() for future in futures]
+
+    def _query_in_app(self, app: Flask, function: str, symbol: str, params: Mapping[str, str]) -> dict:
+        """
+        Worker thread body of query_concurrent() - query with pushed app context, quota already acquired.
+        """
+        with app.app_context():
+            return self.query(function, symbol, admit=False, **params)
+
+    def query(self, function: str, symbol: str, admit: bool = True, **params: str) -> dict:
+        """
+        Call AlphaVantage API function & validate the response. Needs app context.
+        :param function: API function, e.g. TIME_SERIES_DAILY or OVERVIEW.
+        :param symbol: Ticker in string format.
+        :param admit: Whether the call has to be admitted by quota scheduler - False if caller already did that.
+        :param params: Additional query parameters, e.g. outputsize.
+        :return: Deserialized response.
+        Raises ValueError when the request fails, API call limit is exceeded (or the call is not admitted by quota
+        scheduler), API returns error or empty response.
+        """
+        if admit and not quota.acquire():
+            raise ValueError('API call limit exceeded')
+
+        query_string = current_app.config['ALPHA_VANTAGE_URL_BASE'] + urlencode(
+            dict(function=function, symbol=symbol, **params, apikey=current_app.config['ALPHA_VANTAGE_API_KEY'])
+        )
+
+        started = time.perf_counter()
+        try:
+            query_response_unpacked: Any = json.load(self.open(query_string))
+        except (HTTPError, OSError, json.JSONDecodeError) as e:
+            observe_upstream_call(function, 'failed', time.perf_counter() - started)
+            raise ValueError('API request failed', str(e))
+        duration = time.perf_counter() - started
+
+        if 'Note' in query_response_unpacked and \
+                current_app.config['ALPHA_VANTAGE_OVERLOAD_MESSAGE'] in query_response_unpacked['Note']:
+            observe_upstream_call(function, 'limit', duration)
+            raise ValueError('API call limit exceeded')
+
+        if 'Error Message' in query_response_unpacked:
+            observe_upstream_call(function, 'error', duration)
+            raise ValueError('Generic API error', query_response_unpacked['Error Message'])
+
+        if not query_response_unpacked:
+            observe_upstream_call(function, 'error', duration)
+            raise ValueError('API response empty')
+
+        observe_upstream_call(function, 'ok', duration)
+        return query_response_unpacked
+
+
+av_client = AlphaVantageClient()
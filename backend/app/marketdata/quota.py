@@ -0,0 +1,176 @@
+"""
+Quota-aware scheduling of AlphaVantage calls.
+Every upstream call must be admitted by the scheduler first. Budgets are token buckets stored in DB, so all worker
+processes share them. User-facing (interactive) calls are admitted or rejected immediately, background calls leave
+a reserve for interactive ones and wait for tokens instead.
+"""
+import datetime
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Iterator
+
+from flask import Flask, current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.db import db
+from app.db.quotamodel import ApiQuota
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority: ContextVar[str] = ContextVar('quota_priority', default=INTERACTIVE)
+_prepaid: ContextVar[int] = ContextVar('quota_prepaid', default=0)  # calls admitted by QuotaScheduler.admitted()
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """
+    Upstream calls made inside this block are scheduled with background priority.
+    """
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaScheduler(object):
+    """
+    Admits upstream calls against token buckets configured by ALPHA_VANTAGE_QUOTA setting.
+    Format: {bucket name: (calls, period in seconds, calls reserved for interactive priority)}.
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions['quota'] = self
+
+    def acquire(self, cost: int = 1) -> bool:
+        """
+        Take cost tokens from every bucket. Priority is taken from current context. Needs app context.
+        Interactive calls never wait. Background calls wait until tokens above the reserve are available,
+        at most ALPHA_VANTAGE_QUOTA_MAX_WAIT seconds.
+        Calls admitted up front by admitted() are used first.
+        :param cost: Number of upstream calls to admit.
+        :return: True if calls were admitted, False if rejected.
+        """
+        prepaid = _prepaid.get()
+        if prepaid >= cost:
+            _prepaid.set(prepaid - cost)
+            return True
+        background = _priority.get() == BACKGROUND
+        deadline = time.monotonic() + (current_app.config['ALPHA_VANTAGE_QUOTA_MAX_WAIT'] if background else 0)
+        while True:
+            wait = self._take(cost, background)
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                current_app.logger.info(f'AV API call rejected by quota scheduler ({_priority.get()} priority)')
+                return False
+            time.sleep(wait)
+
+    @contextmanager
+    def admitted(self, cost: int) -> Iterator[bool]:
+        """
+        Admit cost calls before the work needing them starts, e.g. before a fetch lease is taken, so the wait for
+        quota does not happen while holding it. Calls made inside the block use the admitted ones first,
+        unused ones are returned to the buckets on exit. Needs app context.
+        :param cost: Number of upstream calls to admit.
+        :return: Context manager yielding True if calls were admitted, False if rejected.
+        """
+        if not self.acquire(cost):
+            yield False
+            return
+        token = _prepaid.set(cost)
+        try:
+            yield True
+        finally:
+            unused = _prepaid.get()
+            _prepaid.reset(token)
+            if unused:
+                self.release(unused)
+
+    def release(self, cost: int) -> None:
+        """
+        Return tokens of calls admitted but not made to every bucket. Needs app context.
+        :param cost: Number of unused calls.
+        :return: None
+        """
+        buckets = current_app.config['ALPHA_VANTAGE_QUOTA']
+        table = ApiQuota.__table__
+        now = datetime.datetime.utcnow()
+        with db.engine.begin() as conn:
+            for row in conn.execute(select(table).where(table.c.name.in_(list(buckets))).with_for_update()).all():
+                calls, period, _ = buckets[row.name]
+                tokens = min(float(calls), self._refill(row.tokens, row.updated_at, now, calls, period) + cost)
+                conn.execute(update(table).where(table.c.name == row.name).values(tokens=tokens, updated_at=now))
+
+    def remaining(self) -> Dict[str, float]:
+        """
+        :return: Currently available calls per bucket, refill included.
+        """
+        now = datetime.datetime.utcnow()
+        buckets = current_app.config['ALPHA_VANTAGE_QUOTA']
+        table = ApiQuota.__table__
+        with db.engine.connect() as conn:
+            rows = {row.name: row for row in conn.execute(select(table).where(table.c.name.in_(list(buckets))))}
+        return {
+            name: self._refill(rows[name].tokens, rows[name].updated_at, now, calls, period) if name in rows else calls
+            for name, (calls, period, _) in buckets.items()
+        }
+
+    @staticmethod
+    def _refill(tokens: float, updated_at: datetime.datetime, now: datetime.datetime,
+                calls: int, period: float) -> float:
+        """
+        :return: Tokens available at now - bucket refills continuously at calls / period per second.
+        """
+        return min(float(calls), tokens + (now - updated_at).total_seconds() * calls / period)
+
+    def _take(self, cost: int, background: bool) -> float:
+        """
+        Single attempt to take tokens, in a transaction of its own with bucket rows locked.
+        :return: 0 if tokens were taken, otherwise seconds until enough tokens are expected to be available.
+        """
+        buckets = current_app.config['ALPHA_VANTAGE_QUOTA']
+        table = ApiQuota.__table__
+        now = datetime.datetime.utcnow()
+        wait = 0.0
+        with db.engine.begin() as conn:
+            rows = conn.execute(select(table).where(table.c.name.in_(list(buckets))).with_for_update()).all()
+            missing = set(buckets) - {row.name for row in rows}
+            if not missing:
+                available = {}
+                for row in rows:
+                    calls, period, reserve = buckets[row.name]
+                    available[row.name] = self._refill(row.tokens, row.updated_at, now, calls, period)
+                    needed = cost + (reserve if background else 0)
+                    if available[row.name] < needed:
+                        wait = max(wait, (needed - available[row.name]) * period / calls if calls else float('inf'))
+                for name, tokens in available.items():
+                    conn.execute(update(table).where(table.c.name == name)
+                                 .values(tokens=tokens if wait else tokens - cost, updated_at=now))
+        if missing:
+            self._create_buckets({name: buckets[name] for name in missing})
+            return self._take(cost, background)
+        return wait
+
+    @staticmethod
+    def _create_buckets(buckets: dict) -> None:
+        """
+        Create bucket rows, full.
+        """
+        table = ApiQuota.__table__
+        for name, (calls, _, _) in buckets.items():
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(table.insert().values(name=name, tokens=float(calls),
+                                                       updated_at=datetime.datetime.utcnow()))
+            except IntegrityError:
+                pass  # created concurrently by another worker
+
+
+quota = QuotaScheduler()
@@ -0,0 +1,132 @@
+"""
+Background refresh of stale stocks.
+Stale data is served to the client immediately while the refresh runs in a worker pool (stale-while-revalidate).
+"""
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Dict
+
+from flask import Flask, current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import db
+from app.db.stockmodel import Stock
+from app.db.leasemodel import FetchLease
+from app.marketdata.quota import background_priority, quota
+from app.marketdata.unknown import unknown_tickers
+
+
+class RefreshPool(object):
+    """
+    Thread pool refreshing cached stocks from AlphaVantage. Upstream calls are scheduled with background priority.
+    Each ticker is queued at most once - repeated submissions return the pending Future.
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Create worker pool sized by REFRESH_WORKERS config setting.
+        :param app: Flask app instance.
+        :return: None
+        """
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=app.config.get('REFRESH_WORKERS', 2),
+                                            thread_name_prefix='stock-refresh')
+        app.extensions['refresh_pool'] = self
+
+    def submit(self, ticker: str) -> Future:
+        """
+        Queue refresh of a ticker. Needs app context.
+        :param ticker: Ticker in string format.
+        :return: Future resolving to True if stock was refreshed.
+        """
+        with self._lock:
+            if ticker in self._pending:
+                return self._pending[ticker]
+            future = self._executor.submit(self._refresh, current_app._get_current_object(), ticker)
+            self._pending[ticker] = future
+            return future
+
+    def pending(self, ticker: str) -> Optional[Future]:
+        """
+        :param ticker: Ticker in string format.
+        :return: Future of queued or running refresh, None if there is none.
+        """
+        with self._lock:
+            return self._pending.get(ticker)
+
+    def _refresh(self, app: Flask, ticker: str) -> bool:
+        """
+        Worker body - refresh_stock() with pushed app context & background priority.
+        :param app: Flask app instance, used to push app context in worker thread.
+        :param ticker: Ticker in string format.
+        :return: True if stock was refreshed.
+        """
+        with app.app_context(), background_priority():
+            try:
+                return refresh_stock(ticker, only_existing=True) == 'refreshed'
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._pending.pop(ticker, None)
+
+
+def refresh_stock(ticker: str, force: bool = False, only_existing: bool = False) -> str:
+    """
+    Fetch fresh data for a stale or missing stock & save it, holding the ticker's fetch lease. Needs app context.
+    Quota for the calls is admitted before the lease is taken, so waiting for quota does not hold the lease.
+    Missing tickers known to be invalid are not requested, invalid symbols reported by the API are remembered.
+    Errors are logged and swallowed, stale data stays in DB.
+    :param ticker: Ticker in string format.
+    :param force: Refresh even if cached data is fresh.
+    :param only_existing: Skip tickers missing in DB.
+    :return: Outcome - 'refreshed', 'skipped' (fresh or missing), 'unknown' (invalid symbol), 'busy' (fetched by
+    another worker) or 'failed'.
+    """
+    owner = uuid.uuid4().hex
+    try:
+        stock = Stock.get_by_ticker(ticker)
+        if _skip_refresh(stock, force, only_existing):
+            return 'skipped'
+        if stock is None and unknown_tickers.is_unknown(ticker):
+            return 'unknown'
+        with quota.admitted(len((stock or Stock(ticker)).stale_calls(force=force))) as admitted:
+            if not admitted:
+                raise ValueError('API call limit exceeded')
+            if not FetchLease.acquire(ticker, owner, current_app.config['FETCH_LEASE_TTL']):
+                return 'busy'
+            db.session.expire_all()  # another worker might have refreshed the stock meanwhile
+            stock = Stock.get_by_ticker(ticker)
+            if _skip_refresh(stock, force, only_existing):
+                return 'skipped'
+            (stock or Stock(ticker)).refresh(force=force)
+        current_app.logger.debug(f'Refresh finished for {ticker}')
+        return 'refreshed'
+    except ValueError as e:
+        current_app.logger.warning(f'Refresh failed for {ticker}: {e.args[0]}')
+        if unknown_tickers.add_if_invalid(ticker, e):
+            return 'unknown'
+        return 'failed'
+    except SQLAlchemyError:
+        current_app.logger.error(f'SQLAlchemyError during refresh of {ticker}')
+        return 'failed'
+    finally:
+        db.session.rollback()
+        FetchLease.release(ticker, owner)
+
+
+def _skip_refresh(stock: Optional[Stock], force: bool, only_existing: bool) -> bool:
+    """
+    :return: True if stock is missing & only existing ones are refreshed, or if its data is fresh.
+    """
+    return (not stock and only_existing) or (stock is not None and not force and stock.is_cached())
+
+
+refresh_pool = RefreshPool()
@@ -0,0 +1,104 @@
+"""
+Request coalescing for cache misses.
+Concurrent misses on the same ticker result in a single AlphaVantage fetch - coalesced in-process with SingleFlight
+and across worker processes with a FetchLease row.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Optional, Callable, Any, Dict
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import db
+from app.db.stockmodel import Stock
+from app.db.leasemodel import FetchLease
+from app.marketdata.unknown import unknown_tickers
+
+
+class SingleFlight(object):
+    """
+    Only the first caller for a key (leader) runs the function. Callers arriving while it runs wait for the leader
+    and share its result or exception.
+    """
+    def __init__(self) -> None:
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run fn once per key at a time.
+        :param key: Coalescing key.
+        :param fn: Function to run.
+        :param timeout: Maximum wait of non-leader callers in seconds, raises TimeoutError when exceeded.
+        :return: Result of fn.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result(timeout)
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+flights = SingleFlight()
+
+
+def fetch_missing_stock(ticker: str) -> Optional[Stock]:
+    """
+    Fetch a stock not yet present in DB from AlphaVantage. Needs app context.
+    Concurrent calls for the same ticker share a single upstream fetch. Tickers known to have no upstream data
+    are not requested, see unknown.UnknownTickerCache.
+    ValueError raised by Stock API methods bubbles up to every waiting caller in this process.
+    :param ticker: Ticker in string format.
+    :return: Saved Stock instance or None if it could not be fetched.
+    """
+    if unknown_tickers.is_unknown(ticker):
+        current_app.logger.debug(f'Unknown ticker {ticker} not requested upstream')
+        return None
+    try:
+        flights.do(ticker, lambda: _fetch_with_lease(ticker), timeout=current_app.config['FETCH_WAIT_TIMEOUT'])
+    except FutureTimeoutError:
+        current_app.logger.warning(f'Timed out waiting for fetch of {ticker}')
+        return None
+    return Stock.get_by_ticker(ticker)
+
+
+def _fetch_with_lease(ticker: str) -> None:
+    """
+    Fetch & save ticker data if this process wins the lease, otherwise wait until the lease holder finishes.
+    :param ticker: Ticker in string format.
+    :return: None
+    """
+    owner = uuid.uuid4().hex
+    if FetchLease.acquire(ticker, owner, current_app.config['FETCH_LEASE_TTL']):
+        try:
+            if Stock.get_by_ticker(ticker) is None:  # another worker might have finished in the meantime
+                Stock(ticker).refresh()
+        except ValueError as e:
+            unknown_tickers.add_if_invalid(ticker, e)
+            raise e
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise e
+        finally:
+            FetchLease.release(ticker, owner)
+    else:
+        current_app.logger.debug(f'Waiting for fetch of {ticker} in another worker')
+        deadline = time.monotonic() + current_app.config['FETCH_WAIT_TIMEOUT']
+        while FetchLease.is_held(ticker) and time.monotonic() < deadline:
+            time.sleep(current_app.config['FETCH_POLL_INTERVAL'])
@@ -0,0 +1,107 @@
+"""
+Negative cache for tickers AlphaVantage has no data for.
+Typos & bots requesting non-existent symbols would otherwise cost two upstream calls each time. Tickers the API
+answered with an error are remembered in the unknown_tickers table for UNKNOWN_TICKER_TTL seconds, with an
+in-memory LRU in front of it, so repeated misses are answered without DB or API access.
+With TICKER_LISTING_VALIDATION set, tickers missing in the local listing (SYMBOL_LISTING_FILE) & in DB are rejected
+before any upstream call.
+"""
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask
+
+from app.db import db
+from app.db.stockmodel import is_valid_ticker
+from app.db.unknowntickermodel import UnknownTicker
+from app.search import symbol_index
+
+
+class UnknownTickerCache(object):
+    """
+    Negative cache - in-memory LRU of unknown tickers (max_entries, UNKNOWN_TICKER_MEMORY_SIZE config setting)
+    backed by UnknownTicker rows shared by worker processes.
+    """
+    def __init__(self, ttl: float = 24 * 60 * 60, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.validate_listing = False
+        self._entries: 'OrderedDict[str, float]' = OrderedDict()  # upper-case ticker: expiry timestamp
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        self.ttl = app.config['UNKNOWN_TICKER_TTL']
+        self.max_entries = app.config['UNKNOWN_TICKER_MEMORY_SIZE']
+        self.validate_listing = app.config['TICKER_LISTING_VALIDATION']
+        self.clear()
+        app.extensions['unknown_tickers'] = self
+
+    def _remember(self, symbol: str, expires: float) -> None:
+        with self._lock:
+            self._entries[symbol] = expires
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, ticker: str, reason: str) -> None:
+        """
+        Remember ticker as unknown for ttl seconds. Needs app context.
+        :param ticker: Ticker in string format.
+        :param reason: Upstream error message.
+        :return: None
+        """
+        symbol = ticker.upper()
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+        UnknownTicker.remember(symbol, reason, expires_at)
+        self._remember(symbol, time.time() + self.ttl)
+
+    def add_if_invalid(self, ticker: str, error: ValueError) -> bool:
+        """
+        Remember ticker as unknown if error raised by its fetch means the symbol is invalid. Pending changes of the
+        DB session are rolled back first. Needs app context.
+        Invalid symbol is reported as generic error - unlike invalid API key, it will not go away on retry.
+        :param ticker: Ticker in string format.
+        :param error: ValueError raised by AlphaVantage client.
+        :return: True if ticker was remembered as unknown.
+        """
+        if error.args[0] != 'Generic API error' or 'apikey' in str(error.args[1]).lower():
+            return False
+        db.session.rollback()
+        self.add(ticker, str(error.args[1]))
+        return True
+
+    def is_unknown(self, ticker: str) -> bool:
+        """
+        Check ticker before requesting it upstream - memory first, then listing (if enabled) & DB. Needs app context.
+        :param ticker: Ticker in string format.
+        :return: True if ticker should not be requested from AlphaVantage.
+        """
+        if not is_valid_ticker(ticker):
+            return True
+        symbol = ticker.upper()
+        with self._lock:
+            expires = self._entries.get(symbol)
+            if expires is not None:
+                if expires > time.time():
+                    self._entries.move_to_end(symbol)
+                    return True
+                del self._entries[symbol]
+
+        if self.validate_listing and symbol_index.listing_file:
+            if symbol not in symbol_index:
+                return True
+
+        expires_at = UnknownTicker.expiry(symbol)
+        if expires_at is None:
+            return False
+        self._remember(symbol, expires_at.replace(tzinfo=datetime.timezone.utc).timestamp())
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+unknown_tickers = UnknownTickerCache()
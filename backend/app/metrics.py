@@ -0,0 +1,127 @@
+"""
+Prometheus metrics - request latency, stock cache outcomes, AlphaVantage calls, API quota & DB query time.
+Exposed at GET /metrics in Prometheus text format. Under multi-process servers (gunicorn etc.) set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers - each worker writes its samples there
+and the endpoint aggregates all of them, whichever worker serves the scrape.
+"""
+import os
+import time
+
+from flask import Flask, Response, g, request
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.db import db
+from app.marketdata.quota import quota
+
+REQUEST_LATENCY = Histogram(
+    'stockdash_request_duration_seconds', 'HTTP request latency by route', ['method', 'route', 'status']
+)
+STOCK_RESPONSES = Counter(
+    'stockdash_stock_responses_total', 'Stock responses by cache outcome', ['outcome']
+)
+UPSTREAM_CALLS = Counter(
+    'stockdash_upstream_calls_total', 'AlphaVantage calls by API function & result', ['function', 'result']
+)
+UPSTREAM_LATENCY = Histogram(
+    'stockdash_upstream_duration_seconds', 'AlphaVantage call latency by API function', ['function'],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+)
+QUOTA_REMAINING = Gauge(
+    'stockdash_quota_remaining', 'Available AlphaVantage calls by quota bucket', ['bucket'],
+    multiprocess_mode='mostrecent'
+)
+DB_QUERY_LATENCY = Histogram(
+    'stockdash_db_query_duration_seconds', 'DB statement execution time',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _observe_query_time(conn, cursor, statement, parameters, context, executemany) -> None:
+    DB_QUERY_LATENCY.observe(time.perf_counter() - conn.info['query_started'].pop())
+
+
+def _discard_query_timer(context) -> None:
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+def observe_upstream_call(function: str, result: str, duration: float) -> None:
+    """
+    Record a finished AlphaVantage call.
+    :param function: API function, e.g. TIME_SERIES_DAILY.
+    :param result: ok, limit (call limit exceeded), error (API error or empty response) or failed (network).
+    :param duration: Call duration in seconds.
+    """
+    UPSTREAM_CALLS.labels(function, result).inc()
+    UPSTREAM_LATENCY.labels(function).observe(duration)
+
+
+def observe_stock_response(outcome: str) -> None:
+    """
+    Record a stock response served outside of the per-request cache status, e.g. each stock of a bulk request.
+    :param outcome: Response status, e.g. cached-fresh or api-fresh.
+    """
+    STOCK_RESPONSES.labels(outcome).inc()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Time statements executed by engine, once per engine.
+    :param engine: SQLAlchemy engine.
+    :return: None
+    """
+    listeners = (('before_cursor_execute', _start_query_timer), ('after_cursor_execute', _observe_query_time),
+                 ('handle_error', _discard_query_timer))
+    for name, listener in listeners:
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Register request & DB query instrumentation and GET /metrics endpoint, if METRICS_ENABLED.
+    :param app: Flask app instance.
+    :return: None
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    instrument_engine(db.get_engine(app))
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def _start_timer() -> None:
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response: Response) -> Response:
+    started = g.get('metrics_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    if g.get('cache_status'):
+        STOCK_RESPONSES.labels(g.cache_status).inc()
+    return response
+
+
+def metrics_view() -> Response:
+    """
+    GET /metrics endpoint - all metrics in Prometheus text format, aggregated over worker processes
+    in multi-process mode. Quota gauge is updated from DB on each scrape.
+    """
+    for bucket, tokens in quota.remaining().items():
+        QUOTA_REMAINING.labels(bucket).set(tokens)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
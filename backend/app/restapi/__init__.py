@@ -18,9 +18,13 @@ def log_restapi_request() -> None:
 
 
 # importing resources
-from app.restapi.user_res import UserLogin
-from app.restapi.stock_res import StockResource
+from app.restapi.user_res import UserLogin, TokenRefresh
+from app.restapi.stock_res import StockResource, StockListResource
+from app.restapi.search_res import SearchResource
 
 api.add_resource(UserLogin, '/login')
+api.add_resource(TokenRefresh, '/refresh')
 api.add_resource(StockResource, '/stock/<string:ticker>')
+api.add_resource(StockListResource, '/stocks')
+api.add_resource(SearchResource, '/search')
 
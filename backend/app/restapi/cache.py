@@ -0,0 +1,118 @@
+"""
+In-process cache of serialized REST responses.
+Fresh stock responses are kept as ready-to-send JSON bytes in a size-bounded LRU, so repeated requests skip DB
+queries & serialization. Cached responses carry ETag & Last-Modified headers for conditional requests (304).
+Entries are also dropped after RESPONSE_CACHE_MAX_AGE seconds, so DB changes made by other processes (e.g. a history
+import) are picked up.
+"""
+import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Hashable, NamedTuple, Callable
+
+from flask import Flask, Response, request
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime.datetime  # naive UTC, price history update time
+    mimetype: str = 'application/json'
+    stored_at: float = 0.0  # time.monotonic() of put
+    overview_modified: Optional[datetime.datetime] = None  # naive UTC, company data update time
+
+
+class ResponseCache(object):
+    """
+    LRU of serialized responses, bounded by total body size (RESPONSE_CACHE_MAX_BYTES config setting).
+    Entries are dropped on access once they fail the validity check provided by caller or get older than max_age
+    (RESPONSE_CACHE_MAX_AGE config setting, None for no limit).
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        self.max_bytes = 0
+        self.max_age: Optional[float] = None
+        self._entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.max_bytes = app.config['RESPONSE_CACHE_MAX_BYTES']
+        self.max_age = app.config['RESPONSE_CACHE_MAX_AGE']
+        self.clear()
+        app.extensions['response_cache'] = self
+
+    def get(self, key: Hashable, valid: Callable[[CachedResponse], bool]) -> Optional[CachedResponse]:
+        """
+        :param key: Cache key.
+        :param valid: Called with the entry - invalid entries are evicted, as well as expired ones.
+        :return: CachedResponse or None if there is no valid entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expired = self.max_age is not None and time.monotonic() - entry.stored_at > self.max_age
+            if expired or not valid(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, body: bytes, last_modified: datetime.datetime, mimetype: str = 'application/json',
+            overview_modified: Optional[datetime.datetime] = None) -> CachedResponse:
+        """
+        Store serialized response, evicting least recently used entries above the size limit.
+        Bodies larger than the whole cache are not stored.
+        :param key: Cache key.
+        :param body: Serialized response.
+        :param last_modified: Time the underlying price history was last updated.
+        :param mimetype: Mimetype of body.
+        :param overview_modified: Time the underlying company data was last updated.
+        :return: CachedResponse instance.
+        """
+        entry = CachedResponse(body, hashlib.sha1(body).hexdigest(), last_modified, mimetype, time.monotonic(),
+                               overview_modified)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._size -= len(entry.body)
+
+
+def conditional_response(entry: CachedResponse) -> Response:
+    """
+    Build response with validators, answered with 304 if the client already has this version.
+    Needs request context.
+    :param entry: CachedResponse instance.
+    :return: Flask Response.
+    """
+    response = Response(entry.body, mimetype=entry.mimetype)
+    response.vary.add('Accept')
+    response.set_etag(entry.etag)
+    last_modified = max(entry.last_modified, entry.overview_modified or entry.last_modified)
+    response.last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    return response.make_conditional(request)
+
+
+response_cache = ResponseCache()
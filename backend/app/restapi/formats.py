@@ -0,0 +1,86 @@
+"""
+Binary representations of stock data, selected by Accept header.
+MessagePack & Apache Arrow IPC stream carry timeseries as typed columns (float64 prices, int64 volume) built
+directly from stored arrays. Both libraries are optional - formats are offered only when they are installed.
+"""
+import json
+from typing import Optional, Callable, Dict, List
+
+from flask import request
+
+from app.db.pricemodel import PriceHistory
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+ARROW = 'application/vnd.apache.arrow.stream'
+
+
+def encode_msgpack(metadata: dict, history: PriceHistory) -> bytes:
+    """
+    Encode stock representation as MessagePack map with columnar timeseries - ISO dates, float64 prices,
+    int64 volume.
+    :param metadata: Stock representation without timeseries.
+    :param history: Price history to include.
+    :return: Serialized body.
+    """
+    timeseries = {'date': history.dates.astype(str).tolist()}
+    for field in PriceHistory.price_fields + ('volume',):
+        timeseries[field] = getattr(history, field).tolist()
+    return msgpack.packb(dict(metadata, timeseries=timeseries))
+
+
+def encode_arrow(metadata: dict, history: PriceHistory) -> bytes:
+    """
+    Encode stock representation as Arrow IPC stream - timeseries is the table (date32, float64 prices,
+    int64 volume), the rest of the representation is JSON stored under 'stock' key of schema metadata.
+    :param metadata: Stock representation without timeseries.
+    :param history: Price history to include.
+    :return: Serialized body.
+    """
+    columns = {'date': pyarrow.array(history.dates, type=pyarrow.date32())}
+    for field in PriceHistory.price_fields + ('volume',):
+        columns[field] = pyarrow.array(getattr(history, field))
+    table = pyarrow.table(columns).replace_schema_metadata({'stock': json.dumps(metadata)})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encoders() -> Dict[str, Callable[[dict, PriceHistory], bytes]]:
+    """
+    :return: Encoders of binary formats available in this installation, by mimetype.
+    """
+    available = {}
+    if msgpack is not None:
+        available[MSGPACK] = encode_msgpack
+    if pyarrow is not None:
+        available[ARROW] = encode_arrow
+    return available
+
+
+def supported() -> List[str]:
+    """
+    :return: Mimetypes the stock endpoint can respond with, JSON first (preferred on ties & for */*).
+    """
+    return [JSON, *encoders()]
+
+
+def negotiate() -> Optional[str]:
+    """
+    Pick response mimetype by Accept header of current request. Needs request context.
+    :return: Best supported mimetype, JSON if Accept header is missing, None if nothing acceptable is supported.
+    """
+    if not request.accept_mimetypes:
+        return JSON
+    return request.accept_mimetypes.best_match(supported(), default=None)
@@ -0,0 +1,52 @@
+"""
+Opt-in cProfile hook for REST API requests.
+With PROFILER_ENABLED set, requests carrying the X-Profile header are profiled and their stats are written to
+PROFILE_DIR (instance/profiles by default) as <ticker or endpoint>_<status>_<timestamp>.pstats (inspect with
+python -m pstats or snakeviz).
+Hooks are registered only when enabled - the ordinary request path pays nothing otherwise.
+Only the request thread is profiled & streamed bodies are not included.
+"""
+import os
+import re
+import time
+import cProfile
+
+from flask import Flask, Response, current_app, g, request
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def init_app(app: Flask, blueprint: str = 'restapi') -> None:
+    """
+    Register profiling hooks for blueprint requests, if PROFILER_ENABLED.
+    :param app: Flask app instance.
+    :param blueprint: Name of profiled blueprint.
+    :return: None
+    """
+    if not app.config['PROFILER_ENABLED']:
+        return
+    app.config['PROFILE_DIR'] = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    app.before_request_funcs.setdefault(blueprint, []).insert(0, _start_profile)  # before other hooks
+    app.after_request_funcs.setdefault(blueprint, []).append(_save_profile)  # after_request runs in reverse
+
+
+def _start_profile() -> None:
+    if PROFILE_HEADER in request.headers:
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+
+def _save_profile(response: Response) -> Response:
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    subject = (request.view_args or {}).get('ticker') or request.endpoint or 'unmatched'
+    subject = re.sub(r'[^A-Za-z0-9_-]', '-', subject)  # ticker comes from URL - keep it a plain file name
+    timestamp = f'{time.strftime("%Y%m%d-%H%M%S")}-{time.perf_counter_ns() % 10 ** 6:06d}'
+    filename = f'{subject}_{response.status_code}_{timestamp}.pstats'
+    profile_dir = current_app.config['PROFILE_DIR']
+    os.makedirs(profile_dir, exist_ok=True)
+    profile.dump_stats(os.path.join(profile_dir, filename))
+    response.headers['X-Profile-File'] = filename
+    return response
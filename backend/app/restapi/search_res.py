@@ -0,0 +1,27 @@
+"""
+Search Resource for REST API.
+"""
+from flask import current_app
+from flask_restful import Resource, reqparse, inputs
+from app.search import symbol_index
+
+
+class SearchResource(Resource):
+    """
+    Represents /search API endpoint - ticker & company name type-ahead.
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument('q', type=str, location='args', required=True, help='Search query is mandatory')
+    parser.add_argument('limit', type=inputs.int_range(1, 50), location='args',
+                        help='Limit must be between 1 and 50')
+
+    @classmethod
+    def get(cls):
+        """
+        GET /search?q=<prefix>&limit=<n> endpoint.
+        Looks up stocks by ticker or company name prefix in the in-memory symbol index.
+        :return: JSON with list of matches (ticker, name, exchange & whether the stock is cached in DB).
+        """
+        args = cls.parser.parse_args()
+        limit = args['limit'] or current_app.config['SEARCH_RESULTS_LIMIT']
+        return {'results': symbol_index.search(args['q'], limit)}, 200
@@ -1,55 +1,312 @@
 """
 Definition of Stock Resource for REST API.
 """
-import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Iterator, Tuple
 
-from flask import current_app
-from flask_restful import Resource, reqparse
+from flask import current_app, Flask, Response, after_this_request, g, stream_with_context
+from flask_restful import Resource, reqparse, inputs
+from app.db import db
 from app.db.stockmodel import Stock
+from app.db.pricemodel import PriceHistory
+from app.marketdata.refresh import refresh_pool
+from app.marketdata.singleflight import fetch_missing_stock
+from app.restapi.cache import CachedResponse, response_cache, conditional_response
+from app.restapi import formats
+from app.indicators import parse_specs
+from app.metrics import observe_stock_response
+
+# timeseries query parameters, shared by single & bulk stock endpoints
+series_parser = reqparse.RequestParser()
+series_parser.add_argument('from', type=inputs.date, location='args', dest='start',
+                           help='Date must be in YYYY-MM-DD format')
+series_parser.add_argument('to', type=inputs.date, location='args', dest='end',
+                           help='Date must be in YYYY-MM-DD format')
+series_parser.add_argument('resolution', type=str, location='args', default='daily',
+                           choices=PriceHistory.resolutions, help='Resolution must be daily, weekly or monthly')
+series_parser.add_argument('indicators', type=parse_specs, location='args', default=(),
+                           help='Indicators must be comma separated specs, e.g. sma:50,rsi:14 - {error_msg}')
+
+
+def parse_series_args(args: dict) -> dict:
+    """
+    Convert parsed timeseries query parameters to Stock.json() keyword arguments.
+    :param args: Result of series_parser.parse_args().
+    :return: Dict with start, end, resolution & indicators keys.
+    """
+    return {
+        'start': args['start'].date() if args['start'] else None,
+        'end': args['end'].date() if args['end'] else None,
+        'resolution': args['resolution'],
+        'indicators': args['indicators']
+    }
+
+
+def cached_response(stock: Stock, series_args: dict, history: Optional[PriceHistory] = None) -> dict:
+    """
+    Build response for a stock found in DB. Stale stock is returned as is & refreshed in background.
+    :param stock: Stock instance.
+    :param series_args: Stock.json() keyword arguments.
+    :param history: Preloaded price history, optional.
+    :return: Stock representation with status.
+    """
+    # check for cache status - logic is implemented inside the class
+    if stock.is_cached():
+        current_app.logger.debug(f'Cached response for {stock.ticker}')
+        api_response = stock.json(**series_args, history=history)
+        api_response.update(status='cached-fresh')  # pass status to client
+    else:
+        # serve stale data immediately & refresh in background
+        current_app.logger.debug(f'Stale response for {stock.ticker}, refresh queued')
+        refresh_pool.submit(stock.ticker)
+        api_response = stock.json(**series_args, history=history)
+        api_response.update(status='cached-stale')
+    return api_response
+
+
+def is_entry_fresh(entry: CachedResponse) -> bool:
+    """
+    Validity of a cached response - both price history & company data it was built from must still be fresh.
+    Needs app context.
+    :param entry: CachedResponse instance.
+    :return: True if the entry can be served.
+    """
+    return entry.overview_modified is not None and Stock.is_fresh(entry.last_modified) and \
+        Stock.is_overview_fresh(entry.overview_modified)
+
+
+def _vary_accept(response: Response) -> Response:
+    """
+    Mark response as content-negotiated, so shared caches keep one variant per Accept header.
+    """
+    response.vary.add('Accept')
+    return response
+
+
+def fetched_response(ticker: str, series_args: dict) -> dict:
+    """
+    Build response for a stock missing in DB - query new data from AlphaVantage, concurrent misses share one fetch.
+    :param ticker: Ticker in string format.
+    :param series_args: Stock.json() keyword arguments.
+    :return: Stock representation with status, {'status': 'null'} if the stock could not be fetched.
+    """
+    api_response = {'status': 'null'}
+    try:
+        stock = fetch_missing_stock(ticker)
+        if stock:
+            current_app.logger.debug(f'Refreshed cache for {stock.ticker}')
+            api_response = stock.json(**series_args)
+            api_response.update(status='api-fresh')  # pass status to client
+    except ValueError as value_error:
+        # separately handle API overload case!
+        if value_error.args[0] == 'API call limit exceeded':  # todo this should not be hardcoded, refactor
+            stock = Stock.get_by_ticker(ticker)  # might have been saved by another worker meanwhile
+            if stock and stock.last_cache_time:
+                api_response = stock.json(**series_args)
+                api_response.update(status='cached-stale')
+        else:
+            current_app.logger.error(f'ValueError raised by /stock/{ticker} endpoint: {value_error.args}')
+            # todo implement fallback scenarios here - e.g. stale data when response empty etc.
+    return api_response
+
+
+def load_series(api_response: dict, series_args: dict) -> PriceHistory:
+    """
+    Load price history for a stock representation built without timeseries.
+    :param api_response: Stock representation.
+    :param series_args: Stock.json() keyword arguments.
+    :return: PriceHistory limited to the date range & resampled to the requested resolution.
+    """
+    history = PriceHistory.load(api_response['id'], series_args['start'], series_args['end'])
+    return history.resample(series_args['resolution'])
+
+
+def streamed_response(api_response: dict, series_args: dict) -> Response:
+    """
+    Stream stock representation as JSON - metadata first, then timeseries bars.
+    Daily bars are read from DB in chunks of STREAM_CHUNK_BARS as the client reads the body & resampled chunk
+    by chunk, so memory use does not grow with history length.
+    :param api_response: Stock representation with status, built without timeseries.
+    :param series_args: Stock.json() keyword arguments.
+    :return: Streamed response.
+    """
+    chunks = PriceHistory.stream(api_response['id'], series_args['start'], series_args['end'],
+                                 current_app.config['STREAM_CHUNK_BARS'])
+
+    def generate() -> Iterator[str]:
+        yield json.dumps(api_response)[:-1] + ', "timeseries": ['
+        separator = ''
+        for chunk in PriceHistory.resample_chunks(chunks, series_args['resolution']):
+            yield separator + json.dumps(chunk.records())[1:-1]
+            separator = ', '
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 
 class StockResource(Resource):
     """
     Represents the Stock API interface.
     """
+    parser = series_parser.copy()
+    parser.add_argument('stream', type=inputs.boolean, location='args', default=False,
+                        help='Stream must be true or false')
+
     def get(self, ticker: str):
         """
         GET /stock/<string:ticker> endpoint.
         Extracts the full stock representation in JSON format.
+        Optional query parameters: from & to (YYYY-MM-DD) limit the timeseries date range,
+        resolution (daily, weekly, monthly) aggregates it into OHLCV bars of given length,
+        indicators (comma separated specs, e.g. sma:50,rsi:14,macd) adds technical indicators aligned with the bars.
+        Fresh responses carry ETag & Last-Modified headers - conditional requests are answered with 304.
+        With stream=true, JSON response is streamed with timeseries bars serialized in chunks (not cached).
+        Accept header selects the format - JSON, MessagePack (application/msgpack) or Arrow IPC stream
+        (application/vnd.apache.arrow.stream), binary ones only if their libraries are installed, 406 otherwise.
         :param ticker: Ticker in string format.
-        :return: Response containing JSON.
+        :return: Response containing JSON or binary representation.
         """
+        after_this_request(_vary_accept)  # every response, cached or not, depends on negotiated format
+        args = self.parser.parse_args()
+        series_args = parse_series_args(args)
+        mimetype = formats.negotiate()
+        if mimetype is None:
+            return {'message': f'Supported formats: {", ".join(formats.supported())}'}, 406
+        if args['stream'] and mimetype == formats.JSON:
+            return self._stream(ticker, series_args)
+
+        # fresh responses are served from memory without touching DB
+        cache_key = (ticker, mimetype, *series_args.values())
+        entry = response_cache.get(cache_key, is_entry_fresh)
+        if entry:
+            g.cache_status = 'memory'  # reported in access log
+            return conditional_response(entry)
+
+        if mimetype != formats.JSON:
+            return self._encoded(ticker, series_args, mimetype, cache_key)
+
         stock = Stock.get_by_ticker(ticker)
-        api_response = {'status': 'null'}
 
         if stock:
-            # check for cache status - logic is implemented inside the class
-            if stock.is_cached():
-                current_app.logger.debug(f'Cached response for {stock.ticker}')
-                print(f'Cached response for {stock.ticker}')
-                api_response = stock.json()
-                api_response.update(status='cached-fresh')  # pass status to client
-            # todo improve caching logic - for now OK
+            api_response = cached_response(stock, series_args)
         else:
-            # stock not in database - query new data from AlphaVantage
-            stock = Stock(ticker)
-            try:
-                stock.get_timeseries_data()
-                stock.get_overview_data()
-                print(stock)
-                stock.save()
-                current_app.logger.debug(f'Refreshed cache for {stock.ticker}')
-                print(f'Refreshed cache for {stock.ticker}')
-                api_response = stock.json()
-                api_response.update(status='api-fresh')  # pass status to client
-            except ValueError as value_error:
-                # separately handle API overload case!
-                if value_error.args[0] == 'API call limit exceeded':  # todo this should not be hardcoded, refactor
-                    api_response = stock.json()
-                    api_response.update(status='cached-stale')
-                else:
-                    current_app.logger.error(f'ValueError raised by /stock/{ticker} endpoint')
-                    print(value_error.args)
-                    # todo implement fallback scenarios here - e.g. stale data when response empty etc.
+            api_response = fetched_response(ticker, series_args)
+        g.cache_status = api_response['status']
+
+        if api_response['status'] == 'cached-fresh':
+            body = json.dumps(api_response).encode()
+            return conditional_response(response_cache.put(cache_key, body, stock.last_cache_time,
+                                                           overview_modified=stock.overview_cache_time))
 
         return api_response, 200
+
+    @staticmethod
+    def _metadata(ticker: str, series_args: dict) -> Tuple[Optional[Stock], dict]:
+        """
+        Stock representation without timeseries, which is serialized separately.
+        :return: (Stock found in DB or None if it was fetched / is missing, representation with status) tuple.
+        """
+        stock = Stock.get_by_ticker(ticker)
+        metadata_args = dict(series_args, timeseries=False)
+        if stock:
+            api_response = cached_response(stock, metadata_args)
+        else:
+            api_response = fetched_response(ticker, metadata_args)
+        g.cache_status = api_response['status']
+        return stock, api_response
+
+    @classmethod
+    def _stream(cls, ticker: str, series_args: dict):
+        """
+        Streaming variant of get() - stock representation is built without timeseries, which is streamed after it.
+        """
+        _, api_response = cls._metadata(ticker, series_args)
+        if api_response['status'] == 'null':
+            return api_response, 200
+        return streamed_response(api_response, series_args)
+
+    @classmethod
+    def _encoded(cls, ticker: str, series_args: dict, mimetype: str, cache_key: tuple):
+        """
+        Binary variant of get() - timeseries columns are encoded straight from the loaded arrays.
+        """
+        stock, api_response = cls._metadata(ticker, series_args)
+        if api_response['status'] == 'null':
+            return api_response, 200
+        body = formats.encoders()[mimetype](api_response, load_series(api_response, series_args))
+        if api_response['status'] == 'cached-fresh':
+            return conditional_response(response_cache.put(cache_key, body, stock.last_cache_time, mimetype,
+                                                           stock.overview_cache_time))
+        return Response(body, mimetype=mimetype)
+
+
+class StockListResource(Resource):
+    """
+    Represents the bulk Stock API interface.
+    """
+    parser = series_parser.copy()
+    parser.add_argument('tickers', type=str, location='args', required=True,
+                        help='Comma separated list of tickers is mandatory')
+    parser.add_argument('stream', type=inputs.boolean, location='args', default=False,
+                        help='Stream must be true or false')
+
+    def get(self):
+        """
+        GET /stocks?tickers=<comma separated tickers> endpoint.
+        Cached stocks are resolved with a single DB query, missing ones are fetched from AlphaVantage in parallel.
+        Accepts the same timeseries parameters as /stock/<ticker>.
+        With stream=true, results are sent as newline delimited JSON objects ({"ticker": ..., "data": ...})
+        in order of completion.
+        :return: Response containing JSON map of stock representations (with status) by ticker.
+        """
+        args = self.parser.parse_args()
+        series_args = parse_series_args(args)
+        tickers = list(dict.fromkeys(ticker.strip() for ticker in args['tickers'].split(',') if ticker.strip()))
+        if not tickers or len(tickers) > current_app.config['STOCKS_BATCH_LIMIT']:
+            return {'message': f'Between 1 and {current_app.config["STOCKS_BATCH_LIMIT"]} tickers expected'}, 400
+
+        results = self._iter_results(tickers, series_args)
+        if args['stream']:
+            lines = (json.dumps({'ticker': ticker, 'data': data}) + '\n' for ticker, data in results)
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+        return dict(results), 200
+
+    @classmethod
+    def _iter_results(cls, tickers: list, series_args: dict) -> Iterator[Tuple[str, dict]]:
+        """
+        Yield (ticker, response) pairs - cached stocks first, then fetched ones as they complete.
+        Outcome of each stock is recorded in metrics.
+        :param tickers: Unique tickers.
+        :param series_args: Stock.json() keyword arguments.
+        """
+        stocks = Stock.get_by_tickers(tickers)
+        histories = PriceHistory.load_many([stock.id for stock in stocks.values()],
+                                           series_args['start'], series_args['end'])
+        for ticker, stock in stocks.items():
+            api_response = cached_response(stock, series_args, histories[stock.id])
+            observe_stock_response(api_response['status'])
+            yield ticker, api_response
+
+        misses = [ticker for ticker in tickers if ticker not in stocks]
+        if not misses:
+            return
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=min(len(misses), app.config['STOCKS_FETCH_WORKERS'])) as executor:
+            futures = {executor.submit(cls._fetch_in_app, app, ticker, series_args): ticker for ticker in misses}
+            for future in as_completed(futures):
+                api_response = future.result()
+                observe_stock_response(api_response['status'])
+                yield futures[future], api_response
+
+    @staticmethod
+    def _fetch_in_app(app: Flask, ticker: str, series_args: dict) -> dict:
+        """
+        Worker thread body - fetched_response() with pushed app context & own DB session.
+        """
+        with app.app_context():
+            try:
+                return fetched_response(ticker, series_args)
+            finally:
+                db.session.remove()
@@ -3,7 +3,7 @@ User Resources for REST API.
 """
 from flask import current_app
 from flask_restful import Resource, reqparse
-from flask_jwt_extended import create_access_token, create_refresh_token
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from app.restapi import api  # Api class instance
 from app.db.usermodel import User
 
@@ -28,11 +28,18 @@ class UserLogin(Resource):
         Request body must contain username & password.
         If credentials are correct, JWT is generated (status 200).
         If credentials are incorrect, returns 401.
-        :return: 200+JWT or 401.
+        If too many password checks are already in progress, returns 503 with Retry-After.
+        :return: 200+JWT, 401 or 503.
         """
         args = cls.parser.parse_args(strict=True)
         user = User.get_by_username(args['username'])
-        if user and user.password_correct(args['password']):
+        try:
+            authorized = user is not None and user.password_correct(args['password'])
+        except ValueError as value_error:
+            # hashing pool saturated - shed load instead of queueing more CPU work
+            current_app.logger.warning(f'Login rejected for user {args["username"]}: {value_error.args[0]}')
+            return {'message': 'Too many login attempts, try again later'}, 503, {'Retry-After': '1'}
+        if authorized:
             access_token = create_access_token(identity=user.id, fresh=True)
             refresh_token = create_refresh_token(user.id)
             return {  # fails at this point in pytest
@@ -43,3 +50,19 @@ class UserLogin(Resource):
         current_app.logger.warning(f'Login failed for user {args["username"]}')
         return {'message': 'Authorization failed'}, 401
 
+
+class TokenRefresh(Resource):
+    """
+    Represents /refresh API endpoint.
+    Renews access tokens without password check.
+    """
+    @classmethod
+    @jwt_required(refresh=True)
+    def post(cls):
+        """
+        Handles /refresh POST request.
+        Request must carry refresh token issued by /login in Authorization header (Bearer).
+        Issued access token is not fresh - endpoints requiring fresh login will still ask for password.
+        :return: 200+JWT, 401 or 422 if refresh token is missing or invalid.
+        """
+        return {'access_token': create_access_token(identity=get_jwt_identity(), fresh=False)}, 200
@@ -0,0 +1,220 @@
+"""
+In-memory ticker search index for type-ahead.
+Symbols & company names are kept in sorted lists searched with bisect, so lookups don't touch DB or AlphaVantage.
+The index is loaded at startup from a local listing file (AlphaVantage LISTING_STATUS CSV export) and the stocks
+table, then kept up to date incrementally - stocks committed by this process are indexed right away, stocks saved
+by other processes are picked up by a background thread polling for new rows & rows with updated company data.
+"""
+import csv
+import datetime
+import itertools
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Optional, Dict, List, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy import event, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db import db
+from app.db.stockmodel import Stock
+
+
+class SymbolIndex(object):
+    """
+    Prefix index over tickers & company names. Names are indexed from the start of each word, so 'mach' and
+    'business mach' both match 'International Business Machines'.
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        self.listing_file: Optional[str] = None
+        self.refresh_interval: Optional[float] = 60.0
+        self._entries: Dict[str, dict] = {}  # by ticker
+        self._symbols: List[str] = []  # sorted upper-case tickers
+        self._names: List[Tuple[str, str]] = []  # sorted (lower-case name suffix, ticker)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_id = 0
+        self._changed_since: Optional[datetime.datetime] = None  # naive UTC, see refresh()
+        self._stop: Optional[threading.Event] = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Load the listing file & stocks table, then start the background thread polling for stocks saved by other
+        processes every SEARCH_REFRESH_INTERVAL seconds (None disables polling).
+        :param app: Flask app instance.
+        :return: None
+        """
+        self.refresh_interval = app.config['SEARCH_REFRESH_INTERVAL']
+        self.clear()
+        self.listing_file = app.config['SYMBOL_LISTING_FILE']
+        if self.listing_file:
+            self.load_listing(self.listing_file)
+        with app.app_context():
+            self._try_refresh()
+        if self._stop:
+            self._stop.set()  # thread of previous app
+        self._stop = threading.Event()
+        if self.refresh_interval:
+            threading.Thread(target=self._poll, args=(app, self._stop), name='symbol-index', daemon=True).start()
+        app.extensions['symbol_index'] = self
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._symbols.clear()
+            self._names.clear()
+            self._last_id = 0
+            self._changed_since = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._entries
+
+    @staticmethod
+    def _name_keys(name: Optional[str]) -> List[str]:
+        """
+        :return: Lower-case suffixes of name starting at each word.
+        """
+        if not name:
+            return []
+        name = name.lower()
+        return [name[match.start():] for match in re.finditer(r'\w+', name)]
+
+    def add(self, ticker: str, name: Optional[str] = None, exchange: Optional[str] = None,
+            cached: bool = False) -> None:
+        """
+        Add or update an index entry. Missing name & exchange keep their previously indexed values.
+        :param ticker: Ticker in string format.
+        :param name: Company name.
+        :param exchange: Exchange code.
+        :param cached: Whether the stock is stored in DB.
+        """
+        symbol = ticker.upper()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                entry = self._entries[symbol] = {'ticker': ticker, 'name': None, 'exchange': None, 'cached': False}
+                insort(self._symbols, symbol)
+            if name and name != entry['name']:
+                for key in self._name_keys(entry['name']):
+                    del self._names[bisect_left(self._names, (key, symbol))]
+                for key in self._name_keys(name):
+                    insort(self._names, (key, symbol))
+                entry['name'] = name
+            entry['exchange'] = exchange or entry['exchange']
+            entry['cached'] = cached or entry['cached']
+            if cached:
+                entry['ticker'] = ticker  # stored spelling wins over listing
+
+    def search(self, query: str, limit: int = 10) -> List[dict]:
+        """
+        Find stocks by ticker or company name prefix (case-insensitive). Never touches DB.
+        Ticker matches come first - the exact one at the top, followed by name matches.
+        :param query: Prefix to look up.
+        :param limit: Max number of results.
+        :return: List of entries with ticker, name, exchange & cached keys.
+        """
+        symbol_prefix, name_prefix = query.strip().upper(), query.strip().lower()
+        if not symbol_prefix:
+            return []
+        results: Dict[str, dict] = {}
+        with self._lock:
+            position = bisect_left(self._symbols, symbol_prefix)
+            while position < len(self._symbols) and len(results) < limit and \
+                    self._symbols[position].startswith(symbol_prefix):
+                results[self._symbols[position]] = self._entries[self._symbols[position]]
+                position += 1
+            position = bisect_left(self._names, (name_prefix, ''))
+            while position < len(self._names) and len(results) < limit and \
+                    self._names[position][0].startswith(name_prefix):
+                symbol = self._names[position][1]
+                results.setdefault(symbol, self._entries[symbol])
+                position += 1
+            return [dict(entry) for entry in results.values()]
+
+    def refresh(self) -> None:
+        """
+        Index stocks inserted since the last refresh & stocks whose company data was updated since then, so name
+        changes made by other processes are picked up too. Needs app context.
+        Company data updates are looked up with an overlap of FETCH_LEASE_TTL, as a fetch may commit that long after
+        setting overview_cache_time.
+        :return: None
+        """
+        with self._refresh_lock:
+            started = datetime.datetime.utcnow()
+            query = db.session.query(Stock.id, Stock.ticker, Stock.name, Stock.exchange)
+            if self._changed_since is None:
+                query = query.filter(Stock.id > self._last_id)
+            else:
+                query = query.filter(or_(Stock.id > self._last_id, Stock.overview_cache_time > self._changed_since))
+            for stock_id, ticker, name, exchange in query.order_by(Stock.id).all():
+                self.add(ticker, name, exchange, cached=True)
+                self._last_id = max(self._last_id, stock_id)
+            self._changed_since = started - datetime.timedelta(seconds=current_app.config['FETCH_LEASE_TTL'])
+
+    def load_listing(self, path: str) -> None:
+        """
+        Index active symbols from a LISTING_STATUS CSV export (symbol, name, exchange, ..., status columns).
+        :param path: Path of the CSV file.
+        :return: None
+        """
+        self.listing_file = path
+        with open(path, newline='') as file:
+            for row in csv.DictReader(file):
+                if row.get('symbol') and row.get('status', 'Active') == 'Active':
+                    self.add(row['symbol'], row.get('name'), row.get('exchange'))
+
+    def _try_refresh(self) -> None:
+        """
+        refresh() with DB errors logged, e.g. before tables are created. Needs app context.
+        """
+        try:
+            self.refresh()
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f'Symbol index refresh failed ({e.__class__.__name__})')
+        finally:
+            db.session.remove()
+
+    def _poll(self, app: Flask, stop: threading.Event) -> None:
+        """
+        Background thread body - refresh every refresh_interval seconds until stop is set.
+        """
+        while not stop.wait(self.refresh_interval):
+            with app.app_context():
+                self._try_refresh()
+
+
+symbol_index = SymbolIndex()
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_saved_stocks(session, flush_context) -> None:
+    """
+    Remember stocks written by a flush - they are indexed once the transaction commits.
+    """
+    saved = session.info.setdefault('saved_stocks', {})
+    for target in itertools.chain(session.new, session.dirty):
+        if isinstance(target, Stock):
+            saved[target.ticker] = (target.name, target.exchange)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _index_committed_stocks(session) -> None:
+    """
+    Keep the index current with stocks committed by this process.
+    """
+    for ticker, (name, exchange) in session.info.pop('saved_stocks', {}).items():
+        symbol_index.add(ticker, name, exchange, cached=True)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back_stocks(session) -> None:
+    """
+    Rolled back stocks are never indexed.
+    """
+    session.info.pop('saved_stocks', None)
@@ -0,0 +1,63 @@
+"""
+Password hashing off the request path.
+PBKDF2 checks run on a small dedicated thread pool (hashlib releases the GIL while hashing), so a login burst
+occupies at most PASSWORD_HASH_WORKERS cores. Checks waiting beyond PASSWORD_HASH_QUEUE are rejected right away
+instead of piling up - callers get ValueError('Password check capacity exceeded') and can answer 503.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from flask import Flask
+from werkzeug.security import check_password_hash
+
+
+class PasswordHasher(object):
+    """
+    Bounded executor for password hash checks.
+    """
+    def __init__(self, app: Optional[Flask] = None) -> None:
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self.timeout = 10.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Create hashing pool configured by PASSWORD_HASH_* config settings.
+        :param app: Flask app instance.
+        :return: None
+        """
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE'])
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        app.extensions['password_hasher'] = self
+
+    def check(self, password_hash: str, password: str) -> bool:
+        """
+        Check plaintext password against its hash on the hashing pool.
+        :param password_hash: Stored hash.
+        :param password: Password string.
+        :return: Boolean value.
+        Raises ValueError if all pool & queue slots are taken or the check does not finish within timeout.
+        """
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise ValueError('Password check capacity exceeded')
+        try:
+            future = self._executor.submit(check_password_hash, password_hash, password)
+        except RuntimeError:  # pool shut down
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())  # slot is held until hashing really ends
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise ValueError('Password check capacity exceeded')
+
+
+password_hasher = PasswordHasher()
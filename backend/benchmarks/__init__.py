@@ -0,0 +1,4 @@
+"""
+Performance benchmarks - run from backend directory, e.g. FLASK_ENV=testing python -m benchmarks.stock_path
+Results of stock_path are appended to benchmarks/results - commit them to track regressions between commits.
+"""
@@ -0,0 +1,64 @@
+"""
+Login throughput benchmark.
+Fires concurrent POST /login requests while a probe thread measures latency of a cheap request (404 route),
+showing how much a login burst slows down the rest of the app. Uses the app config selected by FLASK_ENV.
+Usage: FLASK_ENV=testing TEST_DATABASE_URL=sqlite:///:memory: python -m benchmarks.login_throughput --logins 200
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from app.db import db
+from app.db.usermodel import User
+
+
+def login(app, username: str, password: str) -> int:
+    with app.test_client() as client:
+        return client.post('/login', json={'username': username, 'password': password}).status_code
+
+
+def probe(app, stop: threading.Event, latencies: list) -> None:
+    with app.test_client() as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get('/benchmark-probe')
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=100, help='total login requests')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent login requests')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not User.get_by_username('benchmark'):
+            User('benchmark', 'benchmark@example.com', 'benchmark-password').save()
+
+    stop, latencies = threading.Event(), []
+    probe_thread = threading.Thread(target=probe, args=(app, stop, latencies))
+    probe_thread.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        statuses = list(executor.map(lambda _: login(app, 'benchmark', 'benchmark-password'), range(args.logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe_thread.join()
+
+    print(f'{args.logins} logins with concurrency {args.concurrency} in {elapsed:.2f}s '
+          f'({args.logins / elapsed:.1f}/s), statuses: '
+          + ', '.join(f'{status}: {statuses.count(status)}' for status in sorted(set(statuses))))
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=20)
+        print(f'probe latency during burst: p50 {statistics.median(latencies) * 1000:.1f}ms, '
+              f'p95 {quantiles[-1] * 1000:.1f}ms, max {max(latencies) * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
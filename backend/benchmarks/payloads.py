@@ -0,0 +1,60 @@
+"""
+Realistic AlphaVantage payloads for benchmarks & load tests - mock_responses.py scaled up to long histories.
+"""
+import copy
+import datetime
+
+import numpy as np
+
+from tests.mock_responses import timeseries_response, overview_response
+
+
+def daily_series(symbol: str, years: float = 20, end: datetime.date = None, seed: int = 0) -> dict:
+    """
+    TIME_SERIES_DAILY response with a random walk over business days, formatted like the real API.
+    :param symbol: Ticker reported in metadata.
+    :param years: Length of history.
+    :param end: Last bar date, defaults to yesterday.
+    :param seed: Random seed - same seed, same prices.
+    :return: Deserialized API response.
+    """
+    end = end or datetime.date.today() - datetime.timedelta(days=1)
+    dates = np.arange(np.datetime64(end - datetime.timedelta(days=int(365.25 * years))), np.datetime64(end) + 1)
+    dates = dates[np.is_busday(dates)]
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+    open_ = close * (1 + rng.normal(0, 0.005, len(dates)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, len(dates))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, len(dates))))
+    volume = rng.integers(10 ** 6, 10 ** 7, len(dates))
+
+    payload = copy.deepcopy(timeseries_response)
+    payload['Meta Data'].update({
+        '2. Symbol': symbol, '3. Last Refreshed': str(dates[-1]), '4. Output Size': 'Full size'
+    })
+    payload['Time Series (Daily)'] = {
+        str(date): {'1. open': f'{o:.4f}', '2. high': f'{h:.4f}', '3. low': f'{l:.4f}', '4. close': f'{c:.4f}',
+                    '5. volume': str(v)}
+        for date, o, h, l, c, v in zip(dates[::-1], open_[::-1], high[::-1], low[::-1], close[::-1], volume[::-1])
+    }
+    return payload
+
+
+def compact_series(payload: dict, bars: int = 100) -> dict:
+    """
+    Compact variant (latest bars only) of a TIME_SERIES_DAILY response.
+    """
+    compact = copy.deepcopy(payload)
+    compact['Meta Data']['4. Output Size'] = 'Compact'
+    compact['Time Series (Daily)'] = dict(list(payload['Time Series (Daily)'].items())[:bars])
+    return compact
+
+
+def overview(symbol: str, name: str = None) -> dict:
+    """
+    OVERVIEW response for symbol, based on mock_responses.overview_response.
+    """
+    payload = dict(overview_response, Symbol=symbol)
+    if name:
+        payload['Name'] = name
+    return payload
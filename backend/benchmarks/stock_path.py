@@ -0,0 +1,186 @@
+"""
+Stock request path benchmark.
+Times GET /stock/<ticker> end to end - in-memory response cache hit, DB hit, stale row & cold miss (upstream
+mocked with the test suite's response classes & a 20-year series) - and separately Stock.json(), price history
+decode from DB, AlphaVantage payload parsing & login.
+Each run is appended to benchmarks/results/stock_path.jsonl with the current commit & compared with the
+previous run of the same scenario.
+Usage: FLASK_ENV=testing TEST_DATABASE_URL=sqlite:///:memory: python -m benchmarks.stock_path --repeat 30
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Callable, Optional, List
+
+from app import create_app
+from app.db import db
+from app.db.stockmodel import Stock
+from app.db.pricemodel import PriceBar, PriceHistory
+from app.db.usermodel import User
+from app.indicators import memo as indicator_memo
+from app.marketdata.client import av_client
+from app.marketdata.refresh import refresh_pool
+from app.restapi.cache import response_cache
+
+from benchmarks.payloads import daily_series
+from tests.test_vantageapi import MockSuccessTimeSeriesResponse, MockSuccessOverviewResponse
+
+TICKER = 'BENCH'
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), 'results', 'stock_path.jsonl')
+
+
+def measure(run: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """
+    :return: Durations of repeat runs in seconds, setup excluded.
+    """
+    durations = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def summarize(durations: List[float]) -> dict:
+    ordered = sorted(durations)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'min_ms': round(ordered[0] * 1000, 3)
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def previous_results() -> dict:
+    """
+    :return: Last stored result by scenario.
+    """
+    results = {}
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE) as file:
+            for line in file:
+                record = json.loads(line)
+                results[record['scenario']] = record
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=30, help='runs per scenario')
+    parser.add_argument('--years', type=float, default=20, help='length of mocked price history')
+    parser.add_argument('--no-save', action='store_true', help='do not append results to the results file')
+    args = parser.parse_args()
+
+    payload = daily_series(TICKER, args.years)
+    payload_text = json.dumps(payload)
+
+    class ScaledTimeSeriesResponse(MockSuccessTimeSeriesResponse):
+        @classmethod
+        def read(cls) -> str:
+            return payload_text
+
+    def mock_urlopen(url: str):
+        if 'function=OVERVIEW' in url:
+            return MockSuccessOverviewResponse(url)
+        return ScaledTimeSeriesResponse(url)
+
+    app = create_app()
+    app.config['ALPHA_VANTAGE_API_KEY'] = app.config['ALPHA_VANTAGE_API_KEY'] or 'benchmark'
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'minute': (10 ** 9, 60, 0), 'day': (10 ** 9, 24 * 60 * 60, 0)}
+    av_client.open = mock_urlopen
+    refresh_pool.submit = lambda ticker: None  # stale scenario measures the request, not the background refresh
+
+    with app.app_context():
+        db.create_all()
+        if not User.get_by_username('benchmark'):
+            User('benchmark', 'benchmark@example.com', 'benchmark-password').save()
+        client = app.test_client()
+
+        def remove_stock() -> None:
+            stock = Stock.get_by_ticker(TICKER)
+            if stock:
+                PriceBar.query.filter_by(stock_id=stock.id).delete()
+                db.session.delete(stock)
+                db.session.commit()
+            response_cache.clear()
+            indicator_memo.clear()
+
+        def clear_caches() -> None:
+            db.session.expire_all()
+            response_cache.clear()
+
+        def make_stale() -> None:
+            clear_caches()
+            stock = Stock.get_by_ticker(TICKER)
+            stock.last_cache_time = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+            db.session.commit()
+
+        def make_fresh() -> None:
+            clear_caches()
+            stock = Stock.get_by_ticker(TICKER)
+            stock.last_cache_time = stock.overview_cache_time = datetime.datetime.utcnow()
+            db.session.commit()
+
+        def get_stock() -> None:
+            response = client.get(f'/stock/{TICKER}')
+            assert response.status_code == 200, response.status_code
+
+        scenarios = {}
+        scenarios['get_cold_miss'] = measure(get_stock, args.repeat, setup=remove_stock)
+        make_fresh()
+        scenarios['get_db_hit'] = measure(get_stock, args.repeat, setup=clear_caches)
+        get_stock()
+        scenarios['get_memory_hit'] = measure(get_stock, args.repeat)
+        scenarios['get_stale'] = measure(get_stock, args.repeat, setup=make_stale)
+        make_fresh()
+        stock = Stock.get_by_ticker(TICKER)
+        scenarios['stock_json'] = measure(stock.json, args.repeat)
+        scenarios['history_decode'] = measure(lambda: PriceHistory.load(stock.id), args.repeat)
+        scenarios['payload_parse'] = measure(
+            lambda: PriceHistory.from_alphavantage(json.loads(payload_text)), args.repeat
+        )
+        scenarios['login'] = measure(
+            lambda: client.post('/login', json={'username': 'benchmark', 'password': 'benchmark-password'}),
+            args.repeat
+        )
+        bars = len(stock.history())
+
+    previous = previous_results()
+    records = []
+    commit = current_commit()
+    print(f'{bars} bars, {args.repeat} runs per scenario, commit {commit}')
+    for scenario, durations in scenarios.items():
+        record = {'scenario': scenario, **summarize(durations), 'bars': bars, 'commit': commit,
+                  'time': datetime.datetime.utcnow().isoformat(timespec='seconds'),
+                  'python': platform.python_version()}
+        records.append(record)
+        line = f'{scenario:16} p50 {record["p50_ms"]:9.3f}ms  p95 {record["p95_ms"]:9.3f}ms'
+        if scenario in previous and previous[scenario]['p50_ms']:
+            change = record['p50_ms'] / previous[scenario]['p50_ms'] - 1
+            line += f'  p50 {change:+.1%} vs {previous[scenario]["commit"]}'
+        print(line)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, 'a') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,49 @@ class Config(object):
     SECRET_KEY = os.urandom(128)
     JWT_SECRET_KEY = os.urandom(128)
     LOGLEVEL = 'critical'
+    LOG_MAX_BYTES = 10 * 2 ** 20  # log file size before rotation
+    LOG_BACKUP_COUNT = 5  # rotated log files kept
+    LOG_DIR = os.environ.get('LOG_DIR')  # directory of log files, instance/logs if None
+    PROFILER_ENABLED = False  # profile REST requests sent with X-Profile header into PROFILE_DIR
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')  # directory of request profiles, instance/profiles if None
+    METRICS_ENABLED = True  # GET /metrics in Prometheus format, set PROMETHEUS_MULTIPROC_DIR for multiple workers
+    ACCESS_LOG = True  # one JSON line per request in access_<env>.log in LOG_DIR
+    PROPAGATE_EXCEPTIONS = True  # lets JWT errors reach Flask-JWT-Extended handlers instead of Flask-RESTful 500
+    PASSWORD_HASH_WORKERS = 2  # threads checking password hashes on login
+    PASSWORD_HASH_QUEUE = 8  # password checks waiting for a hashing thread, logins above it get 503
+    PASSWORD_HASH_TIMEOUT = 10  # seconds - max wait for a password check
+    OVERVIEW_TTL = 7 * 24 * 60 * 60  # seconds - company data (OVERVIEW) cache lifetime, price history follows sessions
+    MARKET_DATA_DELAY = 15 * 60  # seconds - session close to availability of its daily bar upstream
+    REFRESH_WORKERS = 2  # background threads refreshing stale stocks
+    FETCH_LEASE_TTL = None  # seconds - upstream fetch lease shared by worker processes, derived from timeouts if None
+    FETCH_WAIT_TIMEOUT = None  # seconds - max wait for a fetch running in another request, derived if None
+    FETCH_POLL_INTERVAL = 0.25  # seconds - lease polling interval
+    WARM_CACHE_TICKERS = []  # tickers pre-fetched by flask warm-cache, all stocks in DB if empty
+    WARM_CACHE_WORKERS = 2  # concurrent refreshes in flask warm-cache
+    RESPONSE_CACHE_MAX_BYTES = 64 * 2 ** 20  # in-process cache of serialized /stock responses
+    RESPONSE_CACHE_MAX_AGE = 60  # seconds a cached response is served without checking DB, None for no limit
+    STREAM_CHUNK_BARS = 500  # timeseries bars serialized at once by streamed /stock responses
+    INDICATOR_MEMO_SIZE = 256  # memoized indicator series (per ticker, resolution & spec)
+    SYMBOL_LISTING_FILE = os.environ.get('SYMBOL_LISTING_FILE')  # LISTING_STATUS CSV export indexed by /search
+    SEARCH_REFRESH_INTERVAL = 60  # seconds - background polling of stocks saved by other processes, None disables
+    SEARCH_RESULTS_LIMIT = 10  # default number of /search results
+    UNKNOWN_TICKER_TTL = 24 * 60 * 60  # seconds - tickers without upstream data are not requested again meanwhile
+    UNKNOWN_TICKER_MEMORY_SIZE = 10000  # unknown tickers kept in memory in front of unknown_tickers table
+    TICKER_LISTING_VALIDATION = False  # reject tickers missing in SYMBOL_LISTING_FILE & DB without upstream calls
+    STOCKS_BATCH_LIMIT = 50  # max tickers per /stocks request
+    STOCKS_FETCH_WORKERS = 4  # parallel upstream fetches per /stocks request
+    ALPHA_VANTAGE_POOL_SIZE = 4  # persistent connections kept per host
+    ALPHA_VANTAGE_CONNECT_TIMEOUT = 3.05  # seconds
+    ALPHA_VANTAGE_READ_TIMEOUT = 15  # seconds
+    ALPHA_VANTAGE_RETRIES = 3  # retries of failed connections & 429/5xx responses
+    ALPHA_VANTAGE_BACKOFF = 0.5  # seconds - retry n waits backoff * 2 ** (n - 1)
+    ALPHA_VANTAGE_QUOTA = {  # bucket: (calls, period in seconds, calls reserved for user-facing requests)
+        'minute': (5, 60, 1),
+        'day': (500, 24 * 60 * 60, 50)
+    }
+    ALPHA_VANTAGE_QUOTA_MAX_WAIT = 120  # seconds - max wait of background calls for quota
+    ALPHA_VANTAGE_OVERLOAD_MESSAGE = 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls ' \
+                                     'per minute and 500 calls per day.'
 
 
 class ProductionConfig(Config):
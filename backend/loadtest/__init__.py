@@ -0,0 +1,6 @@
+"""
+Load testing tools - fake AlphaVantage server & load driver. Run from backend directory:
+    python -m loadtest.fake_alphavantage --port 8765 --latency 200
+    ALPHA_VANTAGE_URL_BASE='http://127.0.0.1:8765/query?' ALPHA_VANTAGE_API_KEY=load flask run
+    python -m loadtest.driver --url http://127.0.0.1:5000 --universe 200 --concurrency 16 --duration 60
+"""
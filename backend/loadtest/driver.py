@@ -0,0 +1,104 @@
+"""
+Load driver for GET /stock/<ticker>.
+Keeps --concurrency requests in flight over a ticker mix for --duration seconds (or --requests in total) and
+reports throughput, latency percentiles, HTTP statuses & response statuses (cached-fresh, api-fresh, ...).
+The mix is either given by --tickers or a synthetic universe of --universe tickers with Zipf-like popularity,
+so a few hot tickers get most of the traffic while the tail keeps causing misses.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import urllib3
+
+
+def ticker_mix(tickers: Optional[str], universe: int, skew: float) -> tuple:
+    """
+    :return: (tickers, weights) tuple.
+    """
+    if tickers:
+        names = [ticker.strip() for ticker in tickers.split(',') if ticker.strip()]
+        return names, [1.0] * len(names)
+    names = [f'T{number:04d}' for number in range(universe)]
+    return names, [1 / (rank + 1) ** skew for rank in range(universe)]
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='app base URL')
+    parser.add_argument('--tickers', help='comma separated tickers, requested uniformly')
+    parser.add_argument('--universe', type=int, default=100, help='synthetic tickers if --tickers is not given')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of synthetic ticker popularity')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--requests', type=int, help='total requests, overrides --duration')
+    parser.add_argument('--query', default='', help='query string appended to each request, e.g. resolution=weekly')
+    parser.add_argument('--timeout', type=float, default=60, help='request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='random seed of the ticker sequence')
+    args = parser.parse_args()
+
+    names, weights = ticker_mix(args.tickers, args.universe, args.skew)
+    rng = random.Random(args.seed)
+    pool = urllib3.PoolManager(maxsize=args.concurrency, timeout=args.timeout, retries=False)
+    lock = threading.Lock()
+    latencies, statuses, outcomes = [], Counter(), Counter()
+    issued = 0
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    def next_ticker() -> Optional[str]:
+        nonlocal issued
+        with lock:
+            if (args.requests and issued >= args.requests) or (not args.requests and time.perf_counter() > deadline):
+                return None
+            issued += 1
+            return rng.choices(names, weights)[0]
+
+    def worker() -> None:
+        while (ticker := next_ticker()) is not None:
+            request_started = time.perf_counter()
+            try:
+                response = pool.request('GET', f'{args.url}/stock/{ticker}' + (f'?{args.query}' if args.query else ''))
+                status, body = str(response.status), response.data
+            except urllib3.exceptions.HTTPError as e:
+                status, body = type(e).__name__, b''
+            latency = time.perf_counter() - request_started
+            try:
+                outcome = json.loads(body).get('status', '-') if body else '-'
+            except (ValueError, AttributeError):
+                outcome = 'non-json'
+            with lock:
+                latencies.append(latency)
+                statuses[status] += 1
+                outcomes[outcome] += 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for _ in range(args.concurrency):
+            executor.submit(worker)
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        print('No requests completed.')
+        return
+    ordered = sorted(latencies)
+    print(f'{len(ordered)} requests in {elapsed:.1f}s with concurrency {args.concurrency}: '
+          f'{len(ordered) / elapsed:.1f} req/s over {len(set(names))} tickers')
+    print(f'latency: mean {statistics.fmean(ordered) * 1000:.1f}ms, p50 {percentile(ordered, 0.5) * 1000:.1f}ms, '
+          f'p90 {percentile(ordered, 0.9) * 1000:.1f}ms, p99 {percentile(ordered, 0.99) * 1000:.1f}ms, '
+          f'max {ordered[-1] * 1000:.1f}ms')
+    print('HTTP status: ' + ', '.join(f'{status} {count}' for status, count in statuses.most_common()))
+    print('response status: ' + ', '.join(f'{outcome} {count}' for outcome, count in outcomes.most_common()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Local AlphaVantage stand-in.
+Serves TIME_SERIES_DAILY (compact & full), OVERVIEW and SYMBOL_SEARCH in the real API format, with configurable
+latency, history length, error rates & quota. Point the app at it with
+ALPHA_VANTAGE_URL_BASE='http://127.0.0.1:<port>/query?'.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.payloads import daily_series, compact_series, overview
+from config import Config
+
+
+class FakeAlphaVantage(object):
+    """
+    Response generator & failure injection settings shared by request handler threads.
+    Payloads are generated once per symbol (deterministic by symbol) and kept serialized.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, years: float = 20, error_rate: float = 0.0,
+                 note_rate: float = 0.0, http_error_rate: float = 0.0, calls_per_minute: Optional[int] = None,
+                 seed: Optional[int] = None) -> None:
+        self.latency = latency  # seconds
+        self.jitter = jitter  # seconds, uniform +-
+        self.years = years
+        self.error_rate = error_rate  # 'Error Message' responses (unknown symbol)
+        self.note_rate = note_rate  # call frequency 'Note' responses
+        self.http_error_rate = http_error_rate  # HTTP 503 responses
+        self.calls_per_minute = calls_per_minute  # real quota - calls above it get 'Note' responses
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._bodies = {}
+        self._recent_calls = deque()
+        self._lock = threading.Lock()
+
+    def respond(self, params: dict) -> tuple:
+        """
+        :param params: Query parameters (single values).
+        :return: (HTTP status, JSON body bytes) tuple.
+        """
+        with self._lock:
+            self.calls += 1
+            draw = self._random.random()
+            over_quota = self._over_quota()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+
+        if draw < self.http_error_rate:
+            return 503, b'{}'
+        draw -= self.http_error_rate
+        if over_quota or draw < self.note_rate:
+            return 200, json.dumps({'Note': Config.ALPHA_VANTAGE_OVERLOAD_MESSAGE}).encode()
+        draw -= self.note_rate
+        if draw < self.error_rate:
+            return 200, json.dumps({'Error Message': 'Invalid API call. Please retry or visit the documentation.'}) \
+                .encode()
+
+        function, symbol = params.get('function'), params.get('symbol', '').upper()
+        if function == 'TIME_SERIES_DAILY' and symbol:
+            return 200, self._body((function, symbol, params.get('outputsize', 'compact')))
+        if function == 'OVERVIEW' and symbol:
+            return 200, self._body((function, symbol))
+        if function == 'SYMBOL_SEARCH':
+            return 200, json.dumps(self._search(params.get('keywords', ''))).encode()
+        return 200, json.dumps({'Error Message': f'Unsupported function {function}'}).encode()
+
+    def _over_quota(self) -> bool:
+        if not self.calls_per_minute:
+            return False
+        now = time.monotonic()
+        while self._recent_calls and now - self._recent_calls[0] > 60:
+            self._recent_calls.popleft()
+        if len(self._recent_calls) >= self.calls_per_minute:
+            return True
+        self._recent_calls.append(now)
+        return False
+
+    def _body(self, key: tuple) -> bytes:
+        body = self._bodies.get(key)
+        if body is None:
+            function, symbol = key[:2]
+            if function == 'OVERVIEW':
+                payload = overview(symbol, name=f'{symbol} Holdings Inc')
+            else:
+                payload = daily_series(symbol, self.years, seed=zlib.crc32(symbol.encode()))
+                if key[2] != 'full':
+                    payload = compact_series(payload)
+            body = self._bodies.setdefault(key, json.dumps(payload).encode())
+        return body
+
+    @staticmethod
+    def _search(keywords: str) -> dict:
+        keywords = keywords.strip().upper()
+        matches = [f'{keywords}{suffix}' for suffix in ('', 'A', 'B', 'X')] if keywords else []
+        return {'bestMatches': [
+            {'1. symbol': symbol, '2. name': f'{symbol} Holdings Inc', '3. type': 'Equity',
+             '4. region': 'United States', '5. marketOpen': '09:30', '6. marketClose': '16:00',
+             '7. timezone': 'UTC-04', '8. currency': 'USD', '9. matchScore': f'{len(keywords) / len(symbol):.4f}'}
+            for symbol in matches
+        ]}
+
+
+def make_server(host: str = '127.0.0.1', port: int = 8765, **settings) -> ThreadingHTTPServer:
+    """
+    Create (not started) fake API server - serve with server.serve_forever(), possibly in a thread.
+    :param host: Bind address.
+    :param port: Bind port, 0 picks a free one (see server.server_address).
+    :param settings: FakeAlphaVantage settings.
+    :return: Server instance, its FakeAlphaVantage is available as server.fake.
+    """
+    fake = FakeAlphaVantage(**settings)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            if url.path != '/query':
+                status, body = 404, b'{}'
+            else:
+                status, body = fake.respond({key: values[0] for key, values in parse_qs(url.query).items()})
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass  # request logging would dominate under load
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.fake = fake
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0, help='mean response latency in ms')
+    parser.add_argument('--jitter', type=float, default=0, help='latency jitter in ms (uniform +-)')
+    parser.add_argument('--years', type=float, default=20, help='length of full price history')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of Error Message responses')
+    parser.add_argument('--note-rate', type=float, default=0, help='fraction of call frequency Note responses')
+    parser.add_argument('--http-error-rate', type=float, default=0, help='fraction of HTTP 503 responses')
+    parser.add_argument('--calls-per-minute', type=int, help='enforce quota like the real API (free tier: 5)')
+    parser.add_argument('--seed', type=int, help='random seed of latency & failure injection')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                         years=args.years, error_rate=args.error_rate, note_rate=args.note_rate,
+                         http_error_rate=args.http_error_rate, calls_per_minute=args.calls_per_minute, seed=args.seed)
+    print(f'Fake AlphaVantage listening on http://{args.host}:{server.server_address[1]}/query?')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'{server.fake.calls} calls served')
+
+
+if __name__ == '__main__':
+    main()
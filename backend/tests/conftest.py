@@ -4,21 +4,23 @@ Use python -m pytest -vv to avoid cross-import issues.
 """
 import pytest
 import os
+import config
 from app import create_app
 from app.db import db
 from app.db.usermodel import User
 
 
 @pytest.fixture(scope='function')
-def app():
+def app(monkeypatch, tmp_path):
     """
-    Provides a Flask app instance for testing.
+    Provides a Flask app instance for testing, logging into a temporary directory.
     :return: Flask app.
     """
     # safety check
     if os.environ.get('FLASK_ENV') != 'testing':
         raise Exception('Not in testing environment! Please verify FLASK_ENV setting.')
 
+    monkeypatch.setattr(config.TestingConfig, 'LOG_DIR', str(tmp_path / 'logs'))
     app = create_app()
 
     # rebuild test database with mock data
@@ -0,0 +1,62 @@
+"""
+Tests for exchange trading calendar & calendar-aware freshness.
+"""
+import datetime
+
+from app.db.stockmodel import Stock
+from app.marketdata.calendar import TradingCalendar, holidays
+
+
+def test_holiday_rules():
+    """
+    Given exchange holiday rules.
+    When holidays & sessions of selected years are computed.
+    Then observed, floating & Easter-based holidays fall on known dates.
+    """
+    calendar = TradingCalendar(first_year=2020, last_year=2023)
+
+    assert holidays(2022) == {
+        datetime.date(2022, 1, 17), datetime.date(2022, 2, 21), datetime.date(2022, 4, 15),
+        datetime.date(2022, 5, 30), datetime.date(2022, 6, 20), datetime.date(2022, 7, 4),
+        datetime.date(2022, 9, 5), datetime.date(2022, 11, 24), datetime.date(2022, 12, 26)
+    }  # New Year 2022 was Saturday - not observed
+    assert datetime.date(2021, 12, 24) in holidays(2021)  # Christmas on Saturday
+    assert datetime.date(2023, 1, 2) in holidays(2023)  # New Year on Sunday
+    assert not calendar.is_session(datetime.date(2022, 4, 15))  # Good Friday
+    assert not calendar.is_session(datetime.date(2022, 6, 25))  # Saturday
+    assert calendar.is_session(datetime.date(2022, 6, 24))
+
+
+def test_latest_close():
+    """
+    Given a trading calendar.
+    When latest session close is looked up around weekends, holidays, DST changes & early closes.
+    Then closes are at 16:00 New York time (13:00 on early close days) in UTC.
+    """
+    calendar = TradingCalendar(first_year=2020, last_year=2023)
+
+    assert calendar.latest_close(datetime.datetime(2022, 7, 1, 19, 59)) == datetime.datetime(2022, 6, 30, 20, 0)
+    assert calendar.latest_close(datetime.datetime(2022, 7, 1, 20, 0)) == datetime.datetime(2022, 7, 1, 20, 0)
+    # Independence Day Monday - Friday close is the latest until Tuesday close
+    assert calendar.latest_close(datetime.datetime(2022, 7, 5, 12, 0)) == datetime.datetime(2022, 7, 1, 20, 0)
+    # winter time
+    assert calendar.latest_close(datetime.datetime(2022, 12, 1, 23, 0)) == datetime.datetime(2022, 12, 1, 21, 0)
+    # day after Thanksgiving
+    assert calendar.latest_close(datetime.datetime(2022, 11, 26, 0, 0)) == datetime.datetime(2022, 11, 25, 18, 0)
+    aware = datetime.datetime(2022, 7, 1, 17, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=-4)))
+    assert calendar.latest_close(aware) == datetime.datetime(2022, 7, 1, 20, 0)
+
+
+def test_is_fresh_over_weekend_and_holiday():
+    """
+    Given stock data fetched after Friday close, before the July 4th long weekend.
+    When freshness is checked over the weekend, the holiday & after Tuesday close.
+    Then data stays fresh until the next session close plus data delay.
+    """
+    fetched = datetime.datetime(2022, 7, 1, 20, 30)
+
+    assert Stock.is_fresh(fetched, now=datetime.datetime(2022, 7, 2, 12, 0))
+    assert Stock.is_fresh(fetched, now=datetime.datetime(2022, 7, 4, 22, 0))
+    assert Stock.is_fresh(fetched, now=datetime.datetime(2022, 7, 5, 20, 14))
+    assert not Stock.is_fresh(fetched, now=datetime.datetime(2022, 7, 5, 20, 16))
+    assert not Stock.is_fresh(datetime.datetime(2022, 7, 1, 20, 10), now=datetime.datetime(2022, 7, 2, 12, 0))
@@ -0,0 +1,67 @@
+"""
+Tests for Flask CLI commands.
+"""
+import datetime
+import json
+
+from app.db.stockmodel import Stock
+from app.marketdata.client import av_client
+
+from tests.mock_responses import timeseries_response
+from tests.test_stock_res import mock_http_urlopen, seed_stock
+
+
+def test_warm_cache(monkeypatch, app):
+    """
+    Given a stale Stock & a fresh Stock cached in DB.
+    When flask warm-cache is run for both of them & a missing ticker.
+    Then stale & missing stocks are fetched, the fresh one is skipped & progress is reported.
+    """
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    with app.app_context():
+        seed_stock('IBM', cache_time=datetime.datetime.utcnow() - datetime.timedelta(days=10))
+        seed_stock('MSFT')
+
+    result = app.test_cli_runner().invoke(args=['warm-cache', '--tickers', 'IBM,MSFT,AAPL', '--workers', '1'])
+
+    assert result.exit_code == 0
+    assert '[3/3]' in result.output
+    assert 'MSFT: skipped' in result.output
+    assert '2 refreshed' in result.output
+    with app.app_context():
+        assert Stock.get_by_ticker('IBM').is_cached()
+        assert Stock.get_by_ticker('AAPL').is_cached()
+
+
+def test_import_history(app, tmp_path):
+    """
+    Given a JSON dump of a stock cached in DB, a CSV dump of a new stock, an unreadable file & a too long ticker.
+    When flask import-history is run for their directory.
+    Then bars are imported in batches, the new stock is created as stale, the cached one gets a later cache time
+    & bad files are reported.
+    """
+    with app.app_context():
+        cache_time = seed_stock('IBM').last_cache_time
+    (tmp_path / 'IBM.json').write_text(json.dumps(timeseries_response))
+    (tmp_path / 'msft.csv').write_text('timestamp,open,high,low,close,volume\n'
+                                       '2022-06-30,257.05,259.53,252.9,256.83,31730900\n'
+                                       '2022-06-29,257.59,260.8,256.35,260.26,20069800\n'
+                                       '2022-06-28,263.98,266.91,256.32,256.48,27200000\n')
+    (tmp_path / 'broken.json').write_text('[]')
+    (tmp_path / 'ABCDEFGHIJK.csv').write_text('timestamp,open,high,low,close,volume\n'
+                                              '2022-06-30,257.05,259.53,252.9,256.83,31730900\n')
+
+    result = app.test_cli_runner().invoke(args=['import-history', str(tmp_path), '--batch-size', '2'])
+
+    assert result.exit_code == 0
+    assert 'broken.json: failed' in result.output
+    assert 'ABCDEFGHIJK.csv: failed (Incorrect ticker format)' in result.output
+    assert '5 bars of 2 stocks' in result.output
+    with app.app_context():
+        msft = Stock.get_by_ticker('MSFT')
+        assert msft.history().close.tolist() == [256.48, 260.26, 256.83]
+        assert not msft.is_cached()
+        ibm = Stock.get_by_ticker('IBM')
+        assert len(ibm.history()) == 2
+        assert ibm.last_cache_time >= cache_time + datetime.timedelta(seconds=1)
+        assert ibm.is_cached()
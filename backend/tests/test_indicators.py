@@ -0,0 +1,118 @@
+"""
+Tests for technical indicators - values, spec parsing & memoization.
+"""
+import datetime
+
+import numpy as np
+import pytest
+
+from app import indicators
+from app.db.pricemodel import PriceHistory
+
+
+def make_history(closes) -> PriceHistory:
+    """
+    Build daily history with given closes on consecutive business days.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    dates = np.busday_offset(np.datetime64('2022-06-01'), np.arange(len(closes)), roll='forward')
+    return PriceHistory(dates, closes, closes, closes, closes, np.full(len(closes), 100, dtype=np.int64))
+
+
+def test_moving_averages():
+    """
+    Given a series of closes.
+    When SMA & EMA are computed.
+    Then values before the window is filled are NaN & the rest match reference formulas.
+    """
+    closes = np.array([1, 2, 3, 4, 5, 6], dtype=np.float64)
+
+    simple = indicators.sma(closes, 3)
+    exponential = indicators.ema(closes, 3)
+
+    assert np.isnan(simple[:2]).all()
+    assert simple[2:].tolist() == [2, 3, 4, 5]
+    assert np.isnan(exponential[:2]).all()
+    assert exponential[2:].tolist() == [2, 3, 4, 5]  # linear series - EMA lags by a constant
+    assert np.isnan(indicators.sma(closes, 10)).all()
+
+
+def test_rsi_macd_bbands():
+    """
+    Given a monotonically rising & a constant series.
+    When RSI, MACD & Bollinger bands are computed.
+    Then RSI saturates (is neutral for constant series), MACD of constant series is zero & bands collapse to the mean.
+    """
+    rising = make_history(np.arange(1, 41))
+    constant = make_history(np.full(40, 10))
+
+    assert indicators.rsi(rising, 14)[14:].tolist() == [100.0] * 26
+    assert np.isnan(indicators.rsi(rising, 14)[:14]).all()
+    assert indicators.rsi(constant, 14)[14:].tolist() == [50.0] * 26
+    assert np.nanmax(np.abs(indicators.macd(constant)['histogram'])) == 0
+    assert np.isnan(indicators.macd(constant)['signal'][:33]).all()
+    bands = indicators.bbands(constant, 20, 2)
+    assert bands['upper'][19:].tolist() == bands['lower'][19:].tolist() == [10.0] * 21
+
+
+def test_parse_specs():
+    """
+    Given indicator specs with and without parameters.
+    When they are parsed.
+    Then duplicates are dropped & invalid specs raise ValueError.
+    """
+    assert indicators.parse_specs('sma:50, RSI,sma:50,bbands:20:2.5') == (
+        ('sma', (50,)), ('rsi', ()), ('bbands', (20, 2.5))
+    )
+    assert indicators.spec_label(('bbands', (20, 2.5))) == 'bbands:20:2.5'
+    for spec in ('foo', 'sma:0', 'sma:2.5', 'sma:1:2', 'returns:1', 'ema:x'):
+        with pytest.raises(ValueError):
+            indicators.parse_specs(spec)
+
+
+def test_compute_memoized(monkeypatch):
+    """
+    Given a memo of indicator results.
+    When indicators are computed twice for the same stock version & once after it is updated.
+    Then history is loaded only on misses & results are limited to the requested date range.
+    """
+    monkeypatch.setattr(indicators, 'memo', indicators.IndicatorMemo())
+    history = make_history([1, 2, 4])
+    loads = []
+
+    def load():
+        loads.append(1)
+        return history
+
+    cache_time = datetime.datetime(2022, 6, 30)
+    specs = indicators.parse_specs('returns,sma:2')
+    first = indicators.compute('IBM', cache_time, load, specs, start=datetime.date(2022, 6, 2))
+    second = indicators.compute('IBM', cache_time, load, specs, start=datetime.date(2022, 6, 2))
+    indicators.compute('IBM', cache_time + datetime.timedelta(days=1), load, specs)
+
+    assert first == second == {'returns': [1.0, 1.0], 'sma:2': [1.5, 3.0]}
+    assert indicators.compute('IBM', cache_time, load, specs)['returns'] == [None, 1.0, 1.0]
+    assert len(loads) == 2
+
+
+def test_compute_aligned_with_resampled_range(monkeypatch):
+    """
+    Given daily history from Wednesday 2022-06-01 with closes 1, 2, 3, ...
+    When weekly & monthly indicators are computed for ranges starting & ending mid-period.
+    Then there is one value per bar of the resampled range & the partial last bar uses the close at range end.
+    """
+    monkeypatch.setattr(indicators, 'memo', indicators.IndicatorMemo())
+    history = make_history(np.arange(1, 41))
+    cache_time = datetime.datetime(2022, 7, 30)
+    specs = indicators.parse_specs('sma:2')
+
+    for resolution, start, end, expected in (
+        ('weekly', datetime.date(2022, 6, 8), datetime.date(2022, 6, 15), [5.5, 9.5]),
+        ('weekly', None, datetime.date(2022, 6, 15), [None, 5.5, 9.5]),
+        ('monthly', None, datetime.date(2022, 7, 13), [None, 26.5])
+    ):
+        bars = history.slice(start, end).resample(resolution)
+        result = indicators.compute('IBM', cache_time, lambda: history, specs, resolution, start, end)['sma:2']
+
+        assert len(result) == len(bars)
+        assert result == expected
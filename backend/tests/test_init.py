@@ -1,6 +1,13 @@
 """
 General testing - proper app init & config.
 """
+import json
+import os
+from logging.handlers import QueueHandler
+
+from app import logs
+
+from tests.test_stock_res import seed_stock
 
 
 def test_app_factory(app):
@@ -14,3 +21,23 @@ def test_client_sanity(app, client):
     response = client.get('/thisisincorrect')
     assert response.status_code == 404
 
+
+def test_logging_queued_with_access_log(app, client):
+    """
+    Given an app with queued logging.
+    When a stock is requested twice & the log listener is flushed.
+    Then app logger only enqueues records & each request has an access log line with duration & cache status.
+    """
+    seed_stock()
+    client.get('/stock/IBM')
+    client.get('/stock/IBM?from=2022-06-30')
+    client.get('/stock/IBM')
+    access_log = os.path.join(app.config['LOG_DIR'], 'access_testing.log')
+    logs._stop_listener()  # flushes queued records
+
+    assert all(isinstance(handler, QueueHandler) for handler in app.logger.handlers)
+    with open(access_log) as file:
+        lines = [json.loads(line) for line in file.readlines()[-3:]]
+    assert [line['cache'] for line in lines] == ['cached-fresh', 'cached-fresh', 'memory']
+    assert lines[1]['query'] == 'from=2022-06-30'
+    assert all(line['status'] == 200 and line['duration_ms'] >= 0 for line in lines)
@@ -0,0 +1,52 @@
+"""
+Tests for fake AlphaVantage server used by load tests.
+"""
+import threading
+
+import pytest
+
+from loadtest.fake_alphavantage import make_server
+
+
+@pytest.fixture()
+def fake_api(app):
+    """
+    Fake AlphaVantage server running in a thread, app configured to query it.
+    :return: FakeAlphaVantage settings object - adjustable by tests.
+    """
+    server = make_server(port=0, years=1, seed=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    app.config['ALPHA_VANTAGE_URL_BASE'] = f'http://127.0.0.1:{server.server_address[1]}/query?'
+    yield server.fake
+    server.shutdown()
+    server.server_close()
+
+
+def test_stock_fetched_from_fake_api(app, client, fake_api):
+    """
+    Given the app pointed at fake AlphaVantage server.
+    When a missing stock is requested.
+    Then a year of daily bars & company overview are fetched over HTTP with one call per API function.
+    """
+    response = client.get('/stock/FAKE')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'api-fresh'
+    assert response.json['name'] == 'FAKE Holdings Inc'
+    assert 250 <= len(response.json['timeseries']) <= 262
+    assert fake_api.calls == 2
+
+
+def test_fake_api_injects_quota_notes(app, client, fake_api):
+    """
+    Given fake AlphaVantage server answering every call with the call frequency note.
+    When a missing stock is requested.
+    Then the app reports the stock as unavailable.
+    """
+    fake_api.note_rate = 1.0
+
+    response = client.get('/stock/FAKE')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'null'
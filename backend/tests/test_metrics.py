@@ -0,0 +1,67 @@
+"""
+Tests for Prometheus metrics endpoint.
+"""
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.db import db
+from app.marketdata.client import av_client
+
+from tests.test_stock_res import mock_http_urlopen, seed_stock
+
+
+def sample_value(text: str, name: str, **labels) -> float:
+    """
+    Find sample value in Prometheus text output, 0 if missing.
+    """
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(key) == value for key, value in labels.items()):
+                return sample.value
+    return 0.0
+
+
+def test_metrics_endpoint(monkeypatch, app, client):
+    """
+    Given one Stock cached in DB & one available from mocked AlphaVantage.
+    When both are requested one by one & in bulk, and GET /metrics is scraped before & after.
+    Then cache outcomes (also per stock of bulk requests), upstream calls, route latency, DB query time & quota
+    are reported.
+    """
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    seed_stock()
+    before = client.get('/metrics').data.decode()
+
+    client.get('/stock/IBM')
+    client.get('/stock/MSFT')
+    client.get('/stocks?tickers=IBM,MSFT')
+    response = client.get('/metrics')
+    after = response.data.decode()
+
+    def delta(name: str, **labels) -> float:
+        return sample_value(after, name, **labels) - sample_value(before, name, **labels)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert delta('stockdash_stock_responses_total', outcome='cached-fresh') == 3
+    assert delta('stockdash_stock_responses_total', outcome='api-fresh') == 1
+    assert delta('stockdash_upstream_calls_total', function='OVERVIEW', result='ok') == 1
+    assert delta('stockdash_upstream_duration_seconds_count', function='TIME_SERIES_DAILY') == 1
+    assert delta('stockdash_request_duration_seconds_count', route='/stock/<string:ticker>', status='200') == 2
+    assert delta('stockdash_db_query_duration_seconds_count') > 0
+    assert int(sample_value(after, 'stockdash_quota_remaining', bucket='minute')) == 3
+
+
+def test_db_timing_registered_on_app_engine(app):
+    """
+    Given an app with metrics enabled.
+    When its engine is inspected.
+    Then DB query timing listens on the app engine only, not on all engines.
+    """
+    engine = db.get_engine(app)
+    metrics.instrument_engine(engine)  # already done by init_app - no-op
+
+    assert event.contains(engine, 'before_cursor_execute', metrics._start_query_timer)
+    assert not event.contains(Engine, 'before_cursor_execute', metrics._start_query_timer)
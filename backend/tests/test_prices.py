@@ -0,0 +1,141 @@
+"""
+Tests for price history storage - parsing, slicing & DB round trip.
+"""
+import datetime
+
+import numpy as np
+
+from app.db import db
+from app.db.stockmodel import Stock
+from app.db.pricemodel import PriceBar, PriceHistory
+
+from tests.mock_responses import timeseries_response
+
+
+def test_price_history_from_alphavantage():
+    """
+    Given a TIME_SERIES_DAILY response.
+    When it is parsed into PriceHistory.
+    Then bars are sorted ascending & values are typed.
+    """
+    history = PriceHistory.from_alphavantage(timeseries_response)
+
+    assert len(history) == 2
+    assert history.dates.dtype == np.dtype('datetime64[D]')
+    assert history.close.dtype == np.float64
+    assert history.volume.dtype == np.int64
+    assert history.dates.astype(str).tolist() == ['2022-06-29', '2022-06-30']
+    assert history.open.tolist() == [142.74, 139.58]
+    assert history.last_date == datetime.date(2022, 6, 30)
+
+
+def test_price_history_slice():
+    """
+    Given a parsed PriceHistory.
+    When it is sliced by date range.
+    Then only bars within the inclusive range are returned.
+    """
+    history = PriceHistory.from_alphavantage(timeseries_response)
+
+    assert len(history.slice(start=datetime.date(2022, 6, 30))) == 1
+    assert len(history.slice(end=datetime.date(2022, 6, 29))) == 1
+    assert len(history.slice(datetime.date(2022, 6, 29), datetime.date(2022, 6, 30))) == 2
+    assert len(history.slice(start=datetime.date(2022, 7, 1))) == 0
+
+
+def test_price_history_db_round_trip(app):
+    """
+    Given a saved Stock.
+    When its bars are stored & loaded back with a date range.
+    Then loaded arrays match the stored ones & repeated storage replaces old bars.
+    """
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.last_cache_time = datetime.datetime.utcnow()
+        stock.save()
+        history = PriceHistory.from_alphavantage(timeseries_response)
+        PriceBar.replace_history(stock.id, history)
+        PriceBar.replace_history(stock.id, history)
+        db.session.commit()
+
+        loaded = stock.history()
+        ranged = stock.history(start=datetime.date(2022, 6, 30))
+
+        assert PriceBar.query.filter_by(stock_id=stock.id).count() == 2
+        assert loaded.close.tolist() == history.close.tolist()
+        assert loaded.volume.tolist() == history.volume.tolist()
+        assert ranged.dates.astype(str).tolist() == ['2022-06-30']
+        assert stock.json()['timeseries'][-1] == {
+            'date': '2022-06-30', 'open': 139.58, 'high': 142.46, 'low': 139.28, 'close': 141.19, 'volume': 4878020
+        }
+
+
+def test_price_history_resample():
+    """
+    Given daily bars spanning several weeks & two months.
+    When history is resampled to weekly & monthly resolution.
+    Then each period holds first open, max high, min low, last close & summed volume.
+    """
+    dates = np.arange(np.datetime64('2022-06-27'), np.datetime64('2022-07-09'))  # Mon 27.06 - Fri 08.07
+    dates = dates[np.is_busday(dates)]
+    values = np.arange(len(dates), dtype=np.float64)
+    history = PriceHistory(dates, values, values + 10, values - 10, values + 1, np.full(len(dates), 100))
+
+    weekly = history.resample('weekly')
+    monthly = history.resample('monthly')
+
+    assert weekly.dates.astype(str).tolist() == ['2022-07-01', '2022-07-08']
+    assert weekly.open.tolist() == [0, 5]
+    assert weekly.high.tolist() == [14, 19]
+    assert weekly.low.tolist() == [-10, -5]
+    assert weekly.close.tolist() == [5, 10]
+    assert weekly.volume.tolist() == [500, 500]
+    assert monthly.dates.astype(str).tolist() == ['2022-06-30', '2022-07-08']
+    assert monthly.open.tolist() == [0, 4]
+    assert monthly.close.tolist() == [4, 10]
+    assert monthly.volume.tolist() == [400, 600]
+    assert history.resample('daily') is history
+
+
+def test_price_history_load_many(app):
+    """
+    Given two saved Stocks, only one of them with price bars.
+    When histories of both are loaded with a single query.
+    Then each stock gets its own bars & the other one an empty history.
+    """
+    with app.app_context():
+        with_bars, without_bars = Stock('IBM'), Stock('MSFT')
+        db.session.add_all([with_bars, without_bars])
+        db.session.flush()
+        PriceBar.replace_history(with_bars.id, PriceHistory.from_alphavantage(timeseries_response))
+        db.session.commit()
+
+        histories = PriceHistory.load_many([with_bars.id, without_bars.id], end=datetime.date(2022, 6, 29))
+
+        assert histories[with_bars.id].dates.astype(str).tolist() == ['2022-06-29']
+        assert len(histories[without_bars.id]) == 0
+
+
+def test_price_history_streamed_and_resampled_in_chunks(app):
+    """
+    Given a saved Stock with daily bars spanning several weeks & two months.
+    When its bars are streamed from DB in chunks of 3 & resampled chunk by chunk.
+    Then the result matches loading & resampling the whole history at once.
+    """
+    dates = np.arange(np.datetime64('2022-06-20'), np.datetime64('2022-07-16'))
+    dates = dates[np.is_busday(dates)]
+    values = np.arange(len(dates), dtype=np.float64)
+    history = PriceHistory(dates, values, values + 10, values - 10, values + 1, np.full(len(dates), 100))
+
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.save()
+        PriceBar.replace_history(stock.id, history)
+        db.session.commit()
+
+        assert [len(chunk) for chunk in PriceHistory.stream(stock.id, size=3)] == [3] * 6 + [2]
+        for resolution in PriceHistory.resolutions:
+            chunks = PriceHistory.resample_chunks(PriceHistory.stream(stock.id, size=3), resolution)
+            expected = history.resample(resolution).records()
+            assert [record for chunk in chunks for record in chunk.records()] == expected
+        assert list(PriceHistory.stream(None)) == []
@@ -0,0 +1,40 @@
+"""
+Tests for opt-in request profiler.
+"""
+import os
+import pstats
+
+from app.restapi import profiling
+
+from tests.test_stock_res import seed_stock
+
+
+def test_profiler_disabled_by_default(app):
+    """
+    Given default config.
+    When the app is created.
+    Then no profiling hooks are registered.
+    """
+    assert profiling._start_profile not in app.before_request_funcs.get('restapi', [])
+    assert profiling._save_profile not in app.after_request_funcs.get('restapi', [])
+
+
+def test_profiler_writes_stats(app, client, tmp_path):
+    """
+    Given profiler enabled in config, writing into a temporary directory.
+    When a stock is requested with & without X-Profile header.
+    Then only the marked request is profiled into a pstats file named by ticker & status.
+    """
+    app.config['PROFILER_ENABLED'] = True
+    app.config['PROFILE_DIR'] = str(tmp_path / 'profiles')
+    profiling.init_app(app)
+    seed_stock()
+
+    plain = client.get('/stock/IBM')
+    profiled = client.get('/stock/IBM', headers={'X-Profile': '1'})
+    path = os.path.join(app.config['PROFILE_DIR'], profiled.headers['X-Profile-File'])
+
+    assert 'X-Profile-File' not in plain.headers
+    assert profiled.headers['X-Profile-File'].startswith('IBM_200_')
+    assert pstats.Stats(path).total_calls > 0
+    assert os.listdir(app.config['PROFILE_DIR']) == [profiled.headers['X-Profile-File']]
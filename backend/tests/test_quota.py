@@ -0,0 +1,111 @@
+"""
+Tests for quota-aware scheduling of AlphaVantage calls.
+"""
+import datetime
+import time
+
+import pytest
+
+from app.db.leasemodel import FetchLease
+from app.db.stockmodel import Stock
+from app.marketdata import quota as quota_module
+from app.marketdata.client import av_client
+from app.marketdata.quota import quota, background_priority
+from app.marketdata.refresh import refresh_stock
+
+from tests.test_stock_res import mock_http_urlopen, seed_stock
+
+
+def test_quota_interactive_rejected_when_exhausted(app):
+    """
+    Given a per-minute budget of 2 calls.
+    When 3 interactive calls are scheduled at once.
+    Then the first two are admitted & the third one is rejected without waiting.
+    """
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'minute': (2, 60, 1)}
+
+    with app.app_context():
+        assert quota.acquire()
+        assert quota.acquire()
+        assert not quota.acquire()
+        assert quota.remaining()['minute'] < 1
+
+
+def test_quota_background_keeps_reserve(app):
+    """
+    Given a per-minute budget of 2 calls with 1 call reserved for interactive priority.
+    When background calls are scheduled without allowed waiting.
+    Then only one background call is admitted & the reserved call is still available to interactive priority.
+    """
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'minute': (2, 60, 1)}
+    app.config['ALPHA_VANTAGE_QUOTA_MAX_WAIT'] = 0
+
+    with app.app_context():
+        with background_priority():
+            assert quota.acquire()
+            assert not quota.acquire()
+        assert quota.acquire()
+
+
+def test_quota_background_waits_for_refill(app):
+    """
+    Given an exhausted budget refilling quickly.
+    When a background call is scheduled.
+    Then it waits for refill & is admitted.
+    """
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'minute': (1, 0.2, 0)}
+
+    with app.app_context():
+        assert quota.acquire()
+        with background_priority():
+            assert quota.acquire()
+
+
+def test_quota_rejection_skips_upstream_call(monkeypatch, app):
+    """
+    Given an exhausted budget.
+    When Stock data is requested from AlphaVantage.
+    Then no request is sent & ValueError with limit message is raised to be handled by caller.
+    """
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'day': (0, 60, 0)}
+
+    def mock_http_urlopen(url: str):
+        raise AssertionError('Upstream call not admitted by scheduler')
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with pytest.raises(ValueError) as value_error:
+        with app.app_context():
+            Stock('IBM').get_timeseries_data()
+
+    assert value_error.value.args[0] == 'API call limit exceeded'
+
+
+def test_quota_admitted_before_lease_and_unused_returned(monkeypatch, app):
+    """
+    Given an exhausted budget refilling quickly & a stale stock.
+    When the stock is refreshed with background priority & calls are admitted up front but not all of them made.
+    Then the wait for quota happens without holding the fetch lease & unused calls are returned to the bucket.
+    """
+    app.config['ALPHA_VANTAGE_QUOTA'] = {'minute': (2, 0.4, 0)}
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    lease_held = []
+    sleep = time.sleep
+    monkeypatch.setattr(quota_module.time, 'sleep',
+                        lambda seconds: lease_held.append(FetchLease.is_held('IBM')) or sleep(seconds))
+
+    with app.app_context():
+        seed_stock('IBM', cache_time=datetime.datetime.utcnow() - datetime.timedelta(days=10))
+        assert quota.acquire(2)
+        with background_priority():
+            outcome = refresh_stock('IBM')
+
+        app.config['ALPHA_VANTAGE_QUOTA'] = {'day': (5, 24 * 60 * 60, 0)}
+        with quota.admitted(3) as admitted:
+            assert admitted
+            assert quota.acquire()
+        remaining = quota.remaining()['day']
+
+    assert outcome == 'refreshed'
+    assert lease_held and not any(lease_held)
+    assert int(remaining) == 4
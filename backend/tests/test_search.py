@@ -0,0 +1,88 @@
+"""
+Tests for ticker search - prefix index & /search endpoint.
+"""
+import datetime
+
+from app.db import db
+from app.db.stockmodel import Stock
+from app.search import SymbolIndex, symbol_index
+
+from tests.test_stock_res import seed_stock
+
+
+def test_symbol_index_prefix_lookup():
+    """
+    Given an index of several symbols.
+    When it is searched by ticker & company name prefixes.
+    Then exact ticker comes first, name matches follow & renamed entries are re-indexed.
+    """
+    index = SymbolIndex()
+    index.add('IBM', 'International Business Machines', 'NYSE')
+    index.add('IBMX', 'Some Other Company')
+    index.add('MSFT', 'Microsoft Corporation', 'NASDAQ')
+    index.add('BIZ', 'Business First')
+
+    assert [entry['ticker'] for entry in index.search('ibm')] == ['IBM', 'IBMX']
+    assert [entry['ticker'] for entry in index.search('busi')] == ['BIZ', 'IBM']
+    assert [entry['ticker'] for entry in index.search('business mach')] == ['IBM']
+    assert [entry['ticker'] for entry in index.search('m', limit=2)] == ['MSFT', 'IBM']
+    assert index.search('  ') == []
+
+    index.add('IBMX', 'Renamed Inc')
+    assert index.search('some') == []
+    assert index.search('renamed')[0] == {'ticker': 'IBMX', 'name': 'Renamed Inc', 'exchange': None, 'cached': False}
+
+
+def test_search_endpoint(app, client, tmp_path):
+    """
+    Given a listing file & a Stock cached in DB.
+    When GET /search is called before & after another stock is saved.
+    Then matches come from both sources, newly saved stocks are found & missing query yields 400.
+    """
+    listing = tmp_path / 'listing_status.csv'
+    listing.write_text('symbol,name,exchange,assetType,ipoDate,delistingDate,status\n'
+                       'AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active\n'
+                       'AAPX,Delisted Corp,NYSE,Stock,1990-01-01,2000-01-01,Delisted\n'
+                       'IBM,International Business Machines Corp,NYSE,Stock,1962-01-02,null,Active\n')
+    symbol_index.clear()
+    symbol_index.load_listing(str(listing))
+    seed_stock('IBM')
+
+    first = client.get('/search?q=aap')
+    ibm = client.get('/search?q=IBM')
+    seed_stock('AAPB')
+    second = client.get('/search?q=aap&limit=5')
+
+    assert first.status_code == 200
+    assert first.json['results'] == [{'ticker': 'AAPL', 'name': 'Apple Inc', 'exchange': 'NASDAQ', 'cached': False}]
+    assert ibm.json['results'][0]['cached']
+    assert ibm.json['results'][0]['name'] == 'International Business Machines'
+    assert [entry['ticker'] for entry in second.json['results']] == ['AAPB', 'AAPL']
+    assert client.get('/search').status_code == 400
+    assert client.get('/search?q=a&limit=0').status_code == 400
+
+
+def test_symbol_index_follows_committed_stocks(app):
+    """
+    Given an empty symbol index.
+    When a stock is rolled back, another one committed & renamed by another process (not through this session).
+    Then only the committed stock is indexed & the new name is picked up by refresh.
+    """
+    with app.app_context():
+        symbol_index.clear()
+        db.session.add(Stock('ROLL'))
+        db.session.flush()
+        db.session.rollback()
+        seed_stock('IBM')
+        flushed = symbol_index.search('roll')
+        symbol_index.refresh()
+        db.session.execute(Stock.__table__.update().where(Stock.__table__.c.ticker == 'IBM')
+                           .values(name='Big Blue', overview_cache_time=datetime.datetime.utcnow()))
+        db.session.commit()
+        before_refresh = symbol_index.search('big')
+        symbol_index.refresh()
+
+        assert flushed == []
+        assert before_refresh == []
+        assert symbol_index.search('big')[0]['ticker'] == 'IBM'
+        assert symbol_index.search('international') == []
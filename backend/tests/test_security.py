@@ -2,6 +2,9 @@
 Security-related testing - JWT configuration and responses.
 Recommended to independently test endpoints with Postman.
 """
+import threading
+
+from app.security import password_hasher
 
 
 def test_login_correct_credentials(app, client):
@@ -56,3 +59,41 @@ def test_login_incorrect_password(app, client):
     assert 'refresh_token' not in response.json
     assert 'message' in response.json
     assert response.json['message'] == 'Authorization failed'
+
+
+def test_login_rejected_when_hashing_saturated(app, client):
+    """
+    Given a password hashing pool with all slots taken.
+    When POST /login body contains correct login credentials.
+    Then REST endpoint returns 503 with Retry-After instead of waiting for a slot.
+    """
+    password_hasher._slots = threading.BoundedSemaphore(1)
+    password_hasher._slots.acquire()
+
+    response = client.post('/login', json={
+        'username': 'testuser',
+        'password': 'password'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'access_token' not in response.json
+
+
+def test_refresh_token(app, client):
+    """
+    Given tokens issued by POST /login.
+    When POST /refresh is called with the refresh token & with the access token.
+    Then a new access token is issued for the refresh token only.
+    """
+    tokens = client.post('/login', json={
+        'username': 'testuser',
+        'password': 'password'
+    }).json
+
+    response = client.post('/refresh', headers={'Authorization': f'Bearer {tokens["refresh_token"]}'})
+    rejected = client.post('/refresh', headers={'Authorization': f'Bearer {tokens["access_token"]}'})
+
+    assert response.status_code == 200
+    assert response.json['access_token'] != ''
+    assert rejected.status_code == 422
+    assert client.post('/refresh').status_code == 401
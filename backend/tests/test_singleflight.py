@@ -0,0 +1,99 @@
+"""
+Tests for coalescing of concurrent upstream fetches - in-process & across workers.
+"""
+import threading
+import time
+
+import pytest
+
+from app.db.leasemodel import FetchLease
+from app.marketdata.singleflight import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """
+    Given several threads calling SingleFlight.do() with the same key at once.
+    When the first call is still running.
+    Then the function runs only once & all callers receive its result.
+    """
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'IBM data'
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('IBM', slow_fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['IBM data'] * 5
+
+
+def test_single_flight_shares_exception():
+    """
+    Given a leader call which raises ValueError.
+    When another caller waits for it.
+    Then the waiting caller receives the same exception & the key can be retried afterwards.
+    """
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing_fetch():
+        started.set()
+        time.sleep(0.2)
+        raise ValueError('API call limit exceeded')
+
+    def follower():
+        started.wait()
+        try:
+            flight.do('IBM', lambda: 'not called')
+        except ValueError as e:
+            errors.append(e.args[0])
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(ValueError):
+        flight.do('IBM', failing_fetch)
+    thread.join()
+
+    assert errors == ['API call limit exceeded']
+    assert flight.do('IBM', lambda: 'retried') == 'retried'
+
+
+def test_fetch_lease_exclusive(app):
+    """
+    Given a lease acquired by one worker.
+    When another worker tries to acquire it before & after release.
+    Then it fails while the lease is held & succeeds after release.
+    """
+    with app.app_context():
+        assert FetchLease.acquire('IBM', 'worker-1', ttl=30)
+        assert not FetchLease.acquire('IBM', 'worker-2', ttl=30)
+        assert FetchLease.is_held('IBM')
+
+        FetchLease.release('IBM', 'worker-2')  # not an owner - no effect
+        assert FetchLease.is_held('IBM')
+
+        FetchLease.release('IBM', 'worker-1')
+        assert not FetchLease.is_held('IBM')
+        assert FetchLease.acquire('IBM', 'worker-2', ttl=30)
+
+
+def test_fetch_lease_expired_taken_over(app):
+    """
+    Given a lease whose owner crashed (lease expired).
+    When another worker tries to acquire it.
+    Then the expired lease is taken over.
+    """
+    with app.app_context():
+        assert FetchLease.acquire('IBM', 'worker-1', ttl=-1)
+        assert not FetchLease.is_held('IBM')
+        assert FetchLease.acquire('IBM', 'worker-2', ttl=30)
+        assert FetchLease.query.get('IBM').owner == 'worker-2'
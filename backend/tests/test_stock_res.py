@@ -0,0 +1,333 @@
+"""
+Tests for /stock REST endpoint - query parameters & response content.
+"""
+import datetime
+import json
+
+import pytest
+
+from app.db import db
+from app.db.stockmodel import Stock
+from app.marketdata.client import av_client
+from app.db.pricemodel import PriceBar, PriceHistory
+from app.marketdata.refresh import refresh_pool
+from app.restapi.cache import ResponseCache
+
+from tests.mock_responses import timeseries_response
+from tests.test_vantageapi import MockSuccessTimeSeriesResponse, MockSuccessOverviewResponse
+
+
+def mock_http_urlopen(url: str):
+    """
+    Successful AlphaVantage response matching the requested API function.
+    """
+    if 'function=OVERVIEW' in url:
+        return MockSuccessOverviewResponse(url)
+    return MockSuccessTimeSeriesResponse(url)
+
+
+def seed_stock(ticker: str = 'IBM', cache_time: datetime.datetime = None) -> Stock:
+    """
+    Save a Stock with mock price bars in test DB. Needs app context.
+    :param ticker: Stock ticker.
+    :param cache_time: Value of last_cache_time & overview_cache_time, defaults to now (fresh cache).
+    :return: Saved Stock instance.
+    """
+    stock = Stock(ticker)
+    stock.name = 'International Business Machines'
+    stock.last_cache_time = cache_time or datetime.datetime.utcnow()
+    stock.overview_cache_time = cache_time or datetime.datetime.utcnow()
+    stock.save()
+    PriceBar.replace_history(stock.id, PriceHistory.from_alphavantage(timeseries_response))
+    db.session.commit()
+    return stock
+
+
+def test_get_stock_date_range(app, client):
+    """
+    Given a fresh Stock cached in DB.
+    When GET /stock/<ticker> is called with from & to parameters.
+    Then only bars within the date range are returned.
+    """
+    seed_stock()
+    response = client.get('/stock/IBM?from=2022-06-30&to=2022-06-30')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'cached-fresh'
+    assert [bar['date'] for bar in response.json['timeseries']] == ['2022-06-30']
+
+
+def test_get_stock_weekly_resolution(app, client):
+    """
+    Given a fresh Stock cached in DB.
+    When GET /stock/<ticker> is called with weekly resolution.
+    Then daily bars are aggregated into a single weekly bar.
+    """
+    seed_stock()
+    response = client.get('/stock/IBM?resolution=weekly')
+
+    assert response.status_code == 200
+    assert response.json['timeseries'] == [{
+        'date': '2022-06-30', 'open': 142.74, 'high': 143.5213, 'low': 139.28, 'close': 141.19, 'volume': 9039511
+    }]
+
+
+def test_get_stock_invalid_parameters(app, client):
+    """
+    Given a fresh Stock cached in DB.
+    When GET /stock/<ticker> is called with malformed date or unknown resolution.
+    Then endpoint returns 400.
+    """
+    seed_stock()
+
+    assert client.get('/stock/IBM?from=30-06-2022').status_code == 400
+    assert client.get('/stock/IBM?resolution=hourly').status_code == 400
+
+
+def test_get_stock_indicators(app, client):
+    """
+    Given a fresh Stock cached in DB.
+    When GET /stock/<ticker> is called with indicators parameter.
+    Then indicator values aligned with timeseries bars are returned & unknown indicators yield 400.
+    """
+    seed_stock()
+    response = client.get('/stock/IBM?indicators=sma:2,returns&from=2022-06-30')
+
+    assert response.status_code == 200
+    assert response.json['indicators']['sma:2'] == pytest.approx([(140.71 + 141.19) / 2])
+    assert response.json['indicators']['returns'] == pytest.approx([141.19 / 140.71 - 1])
+    assert 'indicators' not in client.get('/stock/IBM').json
+    assert client.get('/stock/IBM?indicators=foo').status_code == 400
+
+
+def test_get_stock_streamed(app, client):
+    """
+    Given a fresh Stock cached in DB & streaming chunk of a single bar.
+    When GET /stock/<ticker> is called with stream=true.
+    Then the streamed body parses into the same representation as the regular response, also when resampled.
+    """
+    app.config['STREAM_CHUNK_BARS'] = 1
+    seed_stock()
+    regular = client.get('/stock/IBM?indicators=sma:2')
+    streamed = client.get('/stock/IBM?indicators=sma:2&stream=true')
+
+    assert streamed.status_code == 200
+    assert streamed.is_streamed
+    assert json.loads(streamed.data) == regular.json
+    assert len(json.loads(streamed.data)['timeseries']) == 2
+    assert json.loads(client.get('/stock/IBM?stream=true&resolution=weekly').data) == \
+        client.get('/stock/IBM?resolution=weekly').json
+    assert json.loads(client.get('/stock/IBM?stream=true&from=2023-01-01').data)['timeseries'] == []
+
+
+def test_get_stock_stale_refreshed_in_background(monkeypatch, app, client):
+    """
+    Given a Stock cached in DB before the last market close.
+    When GET /stock/<ticker> is called.
+    Then stale data is returned immediately & the stock is refreshed in background.
+    """
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    stale_time = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+    seed_stock(cache_time=stale_time)
+
+    response = client.get('/stock/IBM')
+    refresh = refresh_pool.pending('IBM')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'cached-stale'
+    assert response.json['name'] == 'International Business Machines'
+    assert refresh is None or refresh.result(timeout=5)
+    db.session.expire_all()
+    assert Stock.get_by_ticker('IBM').is_cached()
+
+
+def test_get_stock_missing_fetched_from_api(monkeypatch, app, client):
+    """
+    Given an empty DB.
+    When GET /stock/<ticker> is called.
+    Then data is fetched from AlphaVantage with one call per API function & returned as api-fresh.
+    """
+    calls = []
+
+    def counting_urlopen(url: str):
+        calls.append(url)
+        return mock_http_urlopen(url)
+
+    monkeypatch.setattr(av_client, 'open', counting_urlopen)
+    response = client.get('/stock/IBM')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'api-fresh'
+    assert response.json['name'] == 'International Business Machines'
+    assert len(response.json['timeseries']) == 2
+    assert len(calls) == 2
+
+
+def test_get_stocks_bulk(monkeypatch, app, client):
+    """
+    Given one fresh Stock cached in DB.
+    When GET /stocks is called for the cached ticker & a missing one.
+    Then a status map is returned - cached stock from DB, missing one fetched from AlphaVantage.
+    """
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    seed_stock()
+    response = client.get('/stocks?tickers=IBM,MSFT,IBM&resolution=weekly')
+
+    assert response.status_code == 200
+    assert set(response.json) == {'IBM', 'MSFT'}
+    assert response.json['IBM']['status'] == 'cached-fresh'
+    assert response.json['MSFT']['status'] == 'api-fresh'
+    assert len(response.json['IBM']['timeseries']) == 1
+    assert Stock.get_by_ticker('MSFT') is not None
+
+
+def test_get_stocks_bulk_stream(app, client):
+    """
+    Given two fresh Stocks cached in DB.
+    When GET /stocks is called with stream=true.
+    Then each stock is sent as a separate JSON line.
+    """
+    seed_stock('IBM')
+    seed_stock('MSFT')
+    response = client.get('/stocks?tickers=IBM,MSFT&stream=true')
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert {line['ticker'] for line in lines} == {'IBM', 'MSFT'}
+    assert all(line['data']['status'] == 'cached-fresh' for line in lines)
+    assert all(len(line['data']['timeseries']) == 2 for line in lines)
+
+
+def test_get_stocks_bulk_limit(app, client):
+    """
+    Given the configured batch limit.
+    When GET /stocks is called with no tickers or too many of them.
+    Then endpoint returns 400.
+    """
+    tickers = ','.join(f'T{number}' for number in range(app.config['STOCKS_BATCH_LIMIT'] + 1))
+
+    assert client.get('/stocks?tickers=,').status_code == 400
+    assert client.get(f'/stocks?tickers={tickers}').status_code == 400
+    assert client.get('/stocks').status_code == 400
+
+
+def test_get_stock_served_from_response_cache(monkeypatch, app, client):
+    """
+    Given a fresh Stock requested once.
+    When the same request is repeated - plain & with validators.
+    Then the response comes from memory without DB access & conditional requests get 304.
+    """
+    seed_stock()
+    first = client.get('/stock/IBM?resolution=weekly')
+
+    def no_db_access(*args, **kwargs):
+        raise AssertionError('DB accessed on cache hit')
+
+    monkeypatch.setattr(Stock, 'get_by_ticker', no_db_access)
+    second = client.get('/stock/IBM?resolution=weekly')
+    by_etag = client.get('/stock/IBM?resolution=weekly', headers={'If-None-Match': first.headers['ETag']})
+    by_date = client.get('/stock/IBM?resolution=weekly', headers={'If-Modified-Since': first.headers['Last-Modified']})
+
+    assert first.status_code == 200
+    assert first.json['status'] == 'cached-fresh'
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+
+
+def test_response_cache_invalidated_by_stale_overview(monkeypatch, app, client):
+    """
+    Given a fresh Stock requested once.
+    When company data gets older than OVERVIEW_TTL while price history stays fresh.
+    Then the cached response is no longer served & the stock is read from DB as stale.
+    """
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    seed_stock()
+    first = client.get('/stock/IBM')
+    app.config['OVERVIEW_TTL'] = 0
+    second = client.get('/stock/IBM')
+    refresh = refresh_pool.pending('IBM')
+
+    assert first.json['status'] == 'cached-fresh'
+    assert second.json['status'] == 'cached-stale'
+    assert 'ETag' not in second.headers
+    assert refresh is None or refresh.result(timeout=5)
+
+
+def test_response_cache_bounded_by_size(app):
+    """
+    Given a response cache limited to 10 bytes.
+    When entries totalling more than 10 bytes are stored.
+    Then least recently used entries are evicted, invalid & expired entries are dropped on access.
+    """
+    cache = ResponseCache()
+    cache.max_bytes = 10
+    now = datetime.datetime.utcnow()
+
+    cache.put('a', b'12345', now)
+    cache.put('b', b'12345', now)
+    assert cache.get('a', lambda modified: True)  # a becomes most recently used
+    cache.put('c', b'12345', now)
+
+    assert len(cache) == 2
+    assert cache.get('b', lambda modified: True) is None
+    assert cache.get('c', lambda modified: False) is None
+    assert cache.get('a', lambda modified: True).body == b'12345'
+    cache.put('d', b'12345678901', now)
+    assert cache.get('d', lambda modified: True) is None
+    cache.max_age = 0
+    assert cache.get('a', lambda modified: True) is None
+
+
+def test_get_stock_binary_formats(app, client):
+    """
+    Given a fresh Stock cached in DB.
+    When GET /stock/<ticker> is called accepting MessagePack, Arrow IPC stream or an unsupported format.
+    Then typed timeseries columns are returned in the negotiated format & unsupported formats yield 406.
+    """
+    msgpack = pytest.importorskip('msgpack')
+    pyarrow = pytest.importorskip('pyarrow')
+    seed_stock()
+
+    packed = client.get('/stock/IBM', headers={'Accept': 'application/msgpack'})
+    arrow = client.get('/stock/IBM', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+    unpacked = msgpack.unpackb(packed.data)
+    table = pyarrow.ipc.open_stream(arrow.data).read_all()
+
+    assert packed.mimetype == 'application/msgpack'
+    assert unpacked['status'] == 'cached-fresh'
+    assert unpacked['timeseries']['close'] == [140.71, 141.19]
+    assert unpacked['timeseries']['volume'] == [4161491, 4878020]
+    assert arrow.mimetype == 'application/vnd.apache.arrow.stream'
+    assert str(table.schema.field('close').type) == 'double'
+    assert str(table.schema.field('volume').type) == 'int64'
+    assert table.column('date').to_pylist() == [datetime.date(2022, 6, 29), datetime.date(2022, 6, 30)]
+    assert json.loads(table.schema.metadata[b'stock'])['ticker'] == 'IBM'
+    assert client.get('/stock/IBM', headers={'Accept': 'text/csv'}).status_code == 406
+    assert client.get('/stock/IBM', headers={'Accept': '*/*'}).mimetype == 'application/json'
+
+
+def test_get_stock_uncached_responses_vary_by_accept(monkeypatch, app, client):
+    """
+    Given a stale Stock cached in DB, so its responses are not kept in the response cache.
+    When GET /stock/<ticker> is called as JSON, MessagePack, streamed JSON & with an unsupported format.
+    Then every response carries Vary: Accept.
+    """
+    pytest.importorskip('msgpack')
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+    seed_stock(cache_time=datetime.datetime.utcnow() - datetime.timedelta(days=10))
+    monkeypatch.setattr(refresh_pool, 'submit', lambda ticker: None)  # stays stale
+
+    packed = client.get('/stock/IBM', headers={'Accept': 'application/msgpack'})
+    responses = [
+        packed,
+        client.get('/stock/IBM'),
+        client.get('/stock/IBM?stream=true'),
+        client.get('/stock/IBM', headers={'Accept': 'text/csv'})
+    ]
+
+    assert packed.mimetype == 'application/msgpack'
+    assert 'ETag' not in packed.headers
+    assert all('Accept' in response.vary for response in responses)
@@ -0,0 +1,105 @@
+"""
+Tests for negative caching of unknown tickers.
+"""
+import datetime
+
+from app.db import db
+from app.db.unknowntickermodel import UnknownTicker
+from app.marketdata.client import av_client
+from app.marketdata.unknown import unknown_tickers
+from app.search import symbol_index
+
+from tests.test_stock_res import mock_http_urlopen
+from tests.test_vantageapi import MockErrorResponse
+
+
+def test_unknown_ticker_not_requested_again(monkeypatch, app, client):
+    """
+    Given AlphaVantage answering an error message for an invalid symbol.
+    When GET /stock/<ticker> is called repeatedly, also after the in-memory front is lost & after the entry expires.
+    Then the API is queried on the first call only until the DB entry expires.
+    """
+    urls = []
+
+    def mock_error_urlopen(url: str) -> MockErrorResponse:
+        urls.append(url)
+        return MockErrorResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_error_urlopen)
+
+    first = client.get('/stock/XXXX')
+    first_calls = len(urls)
+    second = client.get('/stock/xxxx')
+    unknown_tickers.clear()  # e.g. another worker process
+    third = client.get('/stock/XXXX')
+    calls_before_expiry = len(urls)
+    UnknownTicker.query.filter_by(ticker='XXXX').update({'expires_at': datetime.datetime.utcnow()})
+    db.session.commit()
+    unknown_tickers.clear()
+    client.get('/stock/XXXX')
+
+    assert first.json == second.json == third.json == {'status': 'null'}
+    assert first_calls > 0
+    assert calls_before_expiry == first_calls
+    assert len(urls) > calls_before_expiry
+    assert 'Invalid API call' in UnknownTicker.query.get('XXXX').reason
+
+
+def test_listing_validation(monkeypatch, app, client, tmp_path):
+    """
+    Given listing validation enabled with a local listing file.
+    When GET /stock/<ticker> is called for listed, unlisted & malformed tickers.
+    Then only the listed ticker is requested from the API.
+    """
+    urls = []
+
+    def mock_counting_urlopen(url: str):
+        urls.append(url)
+        return mock_http_urlopen(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_counting_urlopen)
+    listing = tmp_path / 'listing_status.csv'
+    listing.write_text('symbol,name,exchange,assetType,ipoDate,delistingDate,status\n'
+                       'IBM,International Business Machines Corp,NYSE,Stock,1962-01-02,null,Active\n')
+    symbol_index.clear()
+    symbol_index.load_listing(str(listing))
+    unknown_tickers.validate_listing = True
+
+    unlisted = client.get('/stock/NOPE')
+    malformed = client.get('/stock/ABCDEFGHIJKL')
+    assert urls == []
+
+    listed = client.get('/stock/IBM')
+
+    assert unlisted.json == malformed.json == {'status': 'null'}
+    assert listed.json['status'] == 'api-fresh'
+    assert len(urls) == 2
+
+
+def test_warm_cache_skips_unknown_tickers(monkeypatch, app):
+    """
+    Given AlphaVantage answering an error message for an invalid symbol.
+    When flask warm-cache is run for it twice.
+    Then the symbol is remembered as unknown on the first run & not requested on the second one.
+    """
+    urls = []
+
+    def mock_error_urlopen(url: str) -> MockErrorResponse:
+        urls.append(url)
+        return MockErrorResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_error_urlopen)
+    runner = app.test_cli_runner()
+
+    first = runner.invoke(args=['warm-cache', '--tickers', 'XXXX', '--workers', '1'])
+    first_calls = len(urls)
+    with app.app_context():
+        unknown_tickers.clear()  # DB entry is enough
+    second = runner.invoke(args=['warm-cache', '--tickers', 'XXXX', '--workers', '1'])
+
+    assert 'XXXX: unknown' in first.output
+    assert 'XXXX: unknown' in second.output
+    assert first_calls > 0
+    assert len(urls) == first_calls
+    with app.app_context():
+        assert 'Invalid API call' in UnknownTicker.query.get('XXXX').reason
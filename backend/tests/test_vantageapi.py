@@ -5,11 +5,19 @@ Mainly proper handling of various responses and errors.
 import datetime
 import random
 import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
 
+import numpy as np
 import pytest
+from urllib3.exceptions import MaxRetryError
+from sqlalchemy import event
 
+from app.db import db
 from app.db.stockmodel import Stock
-from urllib import request
+from app.db.pricemodel import PriceBar, PriceHistory
+from app.marketdata.client import av_client
 from urllib.error import HTTPError
 
 from flask import abort
@@ -118,39 +126,61 @@ class MockErrorResponse(object):
         })
 
 
+class MockInformationResponse(object):
+    """
+    Represents an informational notice instead of data, e.g. about premium plans.
+    In this case, status is 200 but response JSON contains neither data nor a recognized error.
+    """
+    def __init__(self, url: str) -> None:
+        self.status_code = 200
+        self.url = url
+        self.headers = {'Content-Type': 'application/json'}
+
+    @classmethod
+    def read(cls) -> str:
+        """
+        Generate mock response content containing an information message body.
+        :return: Dictionary containing deserialized response data.
+        """
+        return json.dumps({"Information": "Please consider upgrading your plan."})
+
+
 def test_monkeypatch_get_time_series_daily_success(monkeypatch, app, client):
     """
-    Given a monkeypatched version of urllib.request.urlopen() and Stock.get_timeseries_data() method.
+    Given a monkeypatched version of AlphaVantageClient.open() and Stock.get_timeseries_data() method.
     When HTTP response is received as OK (200).
     Then response content conforms with ORM definition && is properly saved in DB.
     """
     def mock_http_urlopen(url: str) -> MockSuccessTimeSeriesResponse:
         return MockSuccessTimeSeriesResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with app.app_context():
         stock = Stock('IBM')
         stock.get_timeseries_data()  # written to test database
 
         db_response = Stock.query.filter_by(ticker='IBM').first()
+        history = db_response.history()
 
     assert db_response
     assert db_response.ticker == 'IBM'
-    assert db_response.timeseries['Meta Data']['2. Symbol'] == 'IBM'
-    assert db_response.timeseries['Time Series (Daily)']['2022-06-30']['4. close'] == '141.1900'
+    assert len(history) == 2
+    assert str(history.dates[-1]) == '2022-06-30'
+    assert history.close[-1] == 141.19
+    assert history.volume[-1] == 4878020
 
 
 def test_monkeypatch_get_time_series_daily_api_overloaded(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When HTTP response is received as OK (200) but API limit is exceeded.
     Then response content contains error message & app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockLimitExceededResponse:
         return MockLimitExceededResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
@@ -160,14 +190,14 @@ def test_monkeypatch_get_time_series_daily_api_overloaded(monkeypatch, app):
 
 def test_monkeypatch_get_time_series_daily_api_empty_response(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When HTTP response is received as OK (200) but message body is empty.
     Then app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockEmptyResponse:
         return MockEmptyResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
@@ -177,14 +207,14 @@ def test_monkeypatch_get_time_series_daily_api_empty_response(monkeypatch, app):
 
 def test_monkeypatch_get_time_series_daily_api_generic_error(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When API returns status 200 but with error message (generic error e.g. due to invalid ticker).
     Then app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockErrorResponse:
         return MockErrorResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
@@ -194,14 +224,14 @@ def test_monkeypatch_get_time_series_daily_api_generic_error(monkeypatch, app):
 
 def test_monkeypatch_get_overview_success(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen() and Stock.get_overview_data() method.
+    Given a monkeypatched version of AlphaVantageClient.open() and Stock.get_overview_data() method.
     When HTTP response is received as OK (200).
     Then response content conforms with ORM definition && is properly saved in DB.
     """
     def mock_http_urlopen(url: str) -> MockSuccessOverviewResponse:
         return MockSuccessOverviewResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with app.app_context():
         stock = Stock('IBM')
@@ -224,19 +254,20 @@ def test_monkeypatch_get_overview_success(monkeypatch, app):
     assert db_response.high_52w == 144.73
     assert db_response.low_52w == 111.84
     assert db_response.eps == {'eps': 'eps'}
-    assert datetime.datetime.now() - db_response.last_cache_time < datetime.timedelta(seconds=5)
+    assert datetime.datetime.now() - db_response.overview_cache_time < datetime.timedelta(seconds=5)
+    assert db_response.last_cache_time is None  # price history not fetched
 
 
 def test_monkeypatch_get_overview_api_overloaded(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When HTTP response is received as OK (200) but API limit is exceeded.
     Then response content contains error message & app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockLimitExceededResponse:
         return MockLimitExceededResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
@@ -246,14 +277,14 @@ def test_monkeypatch_get_overview_api_overloaded(monkeypatch, app):
 
 def test_monkeypatch_get_overview_api_empty_response(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When HTTP response is received as OK (200) but message body is empty.
     Then app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockEmptyResponse:
         return MockEmptyResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
@@ -263,16 +294,325 @@ def test_monkeypatch_get_overview_api_empty_response(monkeypatch, app):
 
 def test_monkeypatch_get_overview_api_generic_error(monkeypatch, app):
     """
-    Given a monkeypatched version of urllib.request.urlopen()
+    Given a monkeypatched version of AlphaVantageClient.open()
     When API returns status 200 but with error message (generic error e.g. due to invalid ticker).
     Then app raises ValueError to be handled by caller.
     """
     def mock_http_urlopen(url: str) -> MockErrorResponse:
         return MockErrorResponse(url)
 
-    monkeypatch.setattr(request, 'urlopen', mock_http_urlopen)
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
 
     with pytest.raises(ValueError) as value_error:
         with app.app_context():
             stock = Stock('IBM')
             stock.get_overview_data()
+
+
+def test_client_query_string(monkeypatch, app):
+    """
+    Given a monkeypatched version of AlphaVantageClient.open().
+    When API function is queried with additional parameters.
+    Then request URL is built from configured base, encoded parameters & API key.
+    """
+    urls = []
+
+    def mock_http_urlopen(url: str) -> MockSuccessOverviewResponse:
+        urls.append(url)
+        return MockSuccessOverviewResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with app.app_context():
+        response = av_client.query('TIME_SERIES_DAILY', 'BRK.B', outputsize='compact')
+        base = app.config['ALPHA_VANTAGE_URL_BASE']
+
+    assert response['Symbol'] == 'IBM'
+    assert urls[0].startswith(base)
+    assert parse_qs(urls[0][len(base):]) == {
+        'function': ['TIME_SERIES_DAILY'], 'symbol': ['BRK.B'], 'outputsize': ['compact'],
+        'apikey': [app.config['ALPHA_VANTAGE_API_KEY']]
+    }
+
+
+def test_client_request_failed(monkeypatch, app):
+    """
+    Given a monkeypatched version of AlphaVantageClient.open() failing on network level.
+    When API is queried.
+    Then app raises ValueError to be handled by caller.
+    """
+    def mock_http_urlopen(url: str):
+        raise MaxRetryError(None, url, reason='Connection refused')
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with pytest.raises(ValueError) as value_error:
+        with app.app_context():
+            Stock('IBM').get_timeseries_data()
+
+    assert value_error.value.args[0] == 'API request failed'
+
+
+def test_client_retries_server_error(app):
+    """
+    Given a local HTTP server answering first request with 503.
+    When API is queried through the pooled client.
+    Then request is retried & successful response is returned.
+    """
+    statuses = [503, 200]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = json.dumps(overview_response).encode()
+            self.send_response(statuses.pop(0))
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config['ALPHA_VANTAGE_URL_BASE'] = f'http://127.0.0.1:{server.server_port}/query?'
+    app.config['ALPHA_VANTAGE_BACKOFF'] = 0
+    av_client.init_app(app)
+
+    try:
+        with app.app_context():
+            response = av_client.query('OVERVIEW', 'IBM')
+    finally:
+        server.shutdown()
+
+    assert response['Name'] == 'International Business Machines'
+    assert statuses == []
+
+
+def test_fetch_lease_covers_call_budget(app):
+    """
+    Given default client timeouts, retries & backoff.
+    When fetch lease TTL & wait timeout are derived.
+    Then both cover two sequential calls exhausting all retries.
+    """
+    budget = 4 * (3.05 + 15) + 0.5 + 1 + 2
+
+    assert av_client.call_budget(app.config) == pytest.approx(budget)
+    assert app.config['FETCH_LEASE_TTL'] >= 2 * budget
+    assert app.config['FETCH_WAIT_TIMEOUT'] >= 2 * budget
+
+
+def test_refresh_concurrent_single_commit(monkeypatch, app):
+    """
+    Given a monkeypatched version of AlphaVantageClient.open() which only answers once both API calls are in flight.
+    When Stock.refresh() is called.
+    Then TIME_SERIES_DAILY & OVERVIEW are requested concurrently & saved with a single commit.
+    """
+    barrier = threading.Barrier(2, timeout=5)
+    commits = []
+
+    def mock_http_urlopen(url: str):
+        barrier.wait()  # BrokenBarrierError if calls are sequential
+        if 'function=OVERVIEW' in url:
+            return MockSuccessOverviewResponse(url)
+        return MockSuccessTimeSeriesResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with app.app_context():
+        event.listen(db.session, 'after_commit', lambda session: commits.append(session))
+        stock = Stock('IBM')
+        stock.refresh()
+
+        db_response = Stock.query.filter_by(ticker='IBM').first()
+        history = db_response.history()
+        assert db_response.is_cached()
+
+    assert len(commits) == 1
+    assert db_response.name == 'International Business Machines'
+    assert len(history) == 2
+
+
+def test_refresh_nothing_saved_on_error(monkeypatch, app):
+    """
+    Given a monkeypatched version of AlphaVantageClient.open() returning error for OVERVIEW only.
+    When Stock.refresh() is called.
+    Then ValueError is raised & no data is saved.
+    """
+    def mock_http_urlopen(url: str):
+        if 'function=OVERVIEW' in url:
+            return MockErrorResponse(url)
+        return MockSuccessTimeSeriesResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with pytest.raises(ValueError) as value_error:
+        with app.app_context():
+            Stock('IBM').refresh()
+
+    with app.app_context():
+        assert Stock.get_by_ticker('IBM') is None
+    assert value_error.value.args[0] == 'Generic API error'
+
+
+def test_refresh_keeps_bars_on_response_without_series(monkeypatch, app):
+    """
+    Given a stale Stock with stored bars & AlphaVantage answering an unrecognized notice instead of the time series.
+    When Stock.refresh() is called, with incremental & full refresh.
+    Then ValueError is raised, stored bars are kept & the stock stays stale.
+    """
+    monkeypatch.setattr(av_client, 'open', MockInformationResponse)
+
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.last_cache_time = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+        stock.overview_cache_time = datetime.datetime.utcnow()
+        stock.save()
+        PriceBar.replace_history(stock.id, PriceHistory.from_alphavantage(timeseries_response))
+        db.session.commit()
+
+        for full in (False, True):
+            with pytest.raises(ValueError) as value_error:
+                stock.refresh(full=full)
+            db.session.rollback()
+            assert value_error.value.args == ('Time series missing in API response', 'Information')
+
+        stock = Stock.get_by_ticker('IBM')
+        assert len(stock.history()) == 2
+        assert not stock.is_timeseries_cached()
+
+
+def test_refresh_incremental_appends_new_bars(monkeypatch, app):
+    """
+    Given a Stock with bars stored up to 2022-06-29.
+    When Stock.refresh() is called.
+    Then only the compact window is requested & only the newer bar is appended.
+    """
+    urls = []
+
+    def mock_http_urlopen(url: str):
+        urls.append(url)
+        if 'function=OVERVIEW' in url:
+            return MockSuccessOverviewResponse(url)
+        return MockSuccessTimeSeriesResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.last_cache_time = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+        stock.save()
+        stored = PriceHistory.from_alphavantage(timeseries_response).slice(end=datetime.date(2022, 6, 29))
+        PriceBar.replace_history(stock.id, stored)
+        db.session.commit()
+        inserted = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: inserted.append(statement)
+                     if statement.startswith('INSERT INTO price_bars') else None)
+
+        stock.refresh()
+        history = stock.history()
+
+    assert any('outputsize=compact' in url for url in urls)
+    assert not any('outputsize=full' in url for url in urls)
+    assert len(inserted) == 1
+    assert history.dates.astype(str).tolist() == ['2022-06-29', '2022-06-30']
+
+
+def test_refresh_incremental_overwrites_last_stored_bar(monkeypatch, app):
+    """
+    Given a Stock whose last stored bar (2022-06-30) was saved unfinished, during its trading session.
+    When Stock.refresh() is called & the compact window has the final bar of that day.
+    Then the stored bar is replaced by the final one.
+    """
+    monkeypatch.setattr(av_client, 'open', MockSuccessTimeSeriesResponse)
+
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.last_cache_time = datetime.datetime.utcnow() - datetime.timedelta(days=10)
+        stock.overview_cache_time = datetime.datetime.utcnow()
+        stock.save()
+        stored = PriceHistory.from_alphavantage(timeseries_response)
+        stored.close = stored.close.copy()
+        stored.close[-1] = 100.0  # partial session
+        PriceBar.replace_history(stock.id, stored)
+        db.session.commit()
+
+        stock.refresh()
+        history = stock.history()
+
+    assert history.dates.astype(str).tolist() == ['2022-06-29', '2022-06-30']
+    assert history.close.tolist() == [140.71, 141.19]
+
+
+def test_refresh_requests_stale_datasets_only(monkeypatch, app):
+    """
+    Given a Stock with fresh company data & stale price history, and another one with the opposite.
+    When Stock.refresh() is called on both.
+    Then only the stale dataset of each is requested & its cache time updated.
+    """
+    urls = []
+
+    def mock_http_urlopen(url: str):
+        urls.append(url)
+        if 'function=OVERVIEW' in url:
+            return MockSuccessOverviewResponse(url)
+        return MockSuccessTimeSeriesResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with app.app_context():
+        now = datetime.datetime.utcnow()
+        stale_prices = Stock('IBM')
+        stale_prices.last_cache_time = now - datetime.timedelta(days=10)
+        stale_prices.overview_cache_time = now
+        stale_company = Stock('MSFT')
+        stale_company.last_cache_time = now
+        stale_company.overview_cache_time = now - datetime.timedelta(seconds=app.config['OVERVIEW_TTL'] + 1)
+        db.session.add_all([stale_prices, stale_company])
+        db.session.commit()
+
+        stale_prices.refresh()
+        prices_urls, urls[:] = list(urls), []
+        stale_company.refresh()
+
+        assert stale_prices.is_cached() and stale_company.is_cached()
+        assert stale_prices.name is None
+        assert stale_company.history().close.size == 0
+
+    assert len(prices_urls) == 1 and 'function=TIME_SERIES_DAILY' in prices_urls[0]
+    assert len(urls) == 1 and 'function=OVERVIEW' in urls[0]
+
+
+def test_refresh_gap_requests_full_history(monkeypatch, app):
+    """
+    Given a Stock whose last stored bar is older than the compact window.
+    When Stock.refresh() is called.
+    Then the gap is detected & full history is requested to replace stored bars.
+    """
+    urls = []
+
+    def mock_http_urlopen(url: str):
+        urls.append(url)
+        if 'function=OVERVIEW' in url:
+            return MockSuccessOverviewResponse(url)
+        return MockSuccessTimeSeriesResponse(url)
+
+    monkeypatch.setattr(av_client, 'open', mock_http_urlopen)
+
+    with app.app_context():
+        stock = Stock('IBM')
+        stock.last_cache_time = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+        stock.save()
+        old_bar = PriceHistory(np.array(['2022-05-02'], dtype='datetime64[D]'), *[np.array([1.0])] * 4,
+                               np.array([1]))
+        PriceBar.replace_history(stock.id, old_bar)
+        db.session.commit()
+
+        stock.refresh()
+        history = stock.history()
+
+    assert any('outputsize=full' in url for url in urls)
+    assert history.dates.astype(str).tolist() == ['2022-06-29', '2022-06-30']